@@ -0,0 +1,256 @@
+"""Offline end-to-end benchmark of LinkedInPostAutomation.create_and_post_content.
+
+Starts the local stand-ins (see standins.py) in a separate process, points
+LinkedInManager, OAuthHandler and ContentGenerator at them through
+LINKEDIN_API_BASE_URL, LINKEDIN_OAUTH_BASE_URL and HF_BASE_URL, and runs each
+scenario in a scratch directory so caches, queues and indexes start empty.
+
+Reports throughput, p50/p99 latency per stage (from the metrics spans) and
+peak memory. Results can be appended to a JSON-lines file and compared against
+an earlier run, e.g. one recorded on another commit:
+
+    python benchmarks/e2e.py --output bench.jsonl                 # on the baseline commit
+    python benchmarks/e2e.py --compare bench.jsonl                # on the candidate commit
+
+Usage:
+    python benchmarks/e2e.py [--scenario NAME ...] [--posts 20] [--concurrency 4]
+                             [--seed 1] [--output FILE] [--compare FILE]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import platform
+import resource
+import tempfile
+import tracemalloc
+import subprocess
+import multiprocessing
+from typing import Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, '..', 'src')
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, SRC_DIR)
+
+import standins  # noqa: E402
+
+SCENARIOS = {
+    "baseline": {},
+    "throttled": {"p429": 0.1},
+    "auth-churn": {"p401": 0.05},
+    "malformed": {"p_malformed": 0.3},
+    "lossy": {"p_drop": 0.2},
+    # Heavy-tailed model latency, e.g. to compare runs with and without HF_HEDGE=true
+    "slow-tail": {"hf_ttft_median_ms": 400, "hf_ttft_p99_ms": 6000},
+    "mixed": {"p429": 0.05, "p401": 0.02, "p_malformed": 0.2, "p_drop": 0.05},
+}
+
+# Keep client-side waits short and deterministic enough to compare runs
+BENCH_ENV = {
+    "HF_TOKEN": "bench",
+    "HF_CACHE_BYPASS": "true",
+    "LINKEDIN_CLIENT_ID": "bench", "LINKEDIN_CLIENT_SECRET": "bench",
+    "LINKEDIN_USERNAME": "bench", "LINKEDIN_PASSWORD": "bench",
+    "RETRY_BASE_DELAY": "0.2", "RETRY_MAX_DELAY": "2",
+    "RATE_LIMIT_DEFAULT_RETRY_AFTER": "1",
+    "DEDUP_MAX_REGENERATIONS": "0",
+}
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = q * (len(ordered) - 1)
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_standins(config: Dict):
+    context = multiprocessing.get_context('spawn')
+    ready = context.Queue()
+    process = context.Process(target=standins.serve, args=(config, ready), daemon=True)
+    process.start()
+    return process, ready.get(timeout=30)
+
+
+async def fetch_server_stats(base_url: str) -> Dict:
+    import aiohttp
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{base_url}/_stats") as response:
+            return await response.json()
+
+
+async def run_posts(posts: int) -> Dict:
+    """Publish `posts` topics through the real pipeline; returns timings"""
+    from main import LinkedInPostAutomation
+    automation = LinkedInPostAutomation()
+    async with automation:
+        await automation.oauth_handler.save_tokens(automation.oauth_handler._stamp_expiry({
+            "access_token": standins.INITIAL_TOKEN, "expires_in": 5184000, "refresh_token": "bench-refresh"
+        }))
+        topics = [f"Benchmark topic {i}" for i in range(posts)]
+        started = time.perf_counter()
+        published = await automation.create_and_post_content(topics)
+        elapsed = time.perf_counter() - started
+    return {"published": published, "elapsed_s": elapsed}
+
+
+def run_scenario(name: str, overrides: Dict, posts: int, concurrency: int, seed: int) -> Dict:
+    from metrics import registry
+    import resilience
+    import structured_output
+
+    config = {**overrides, "seed": seed}
+    process, base_url = start_standins(config)
+    previous_dir = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            os.environ.update(BENCH_ENV)
+            os.environ.update({
+                "LINKEDIN_API_BASE_URL": f"{base_url}/v2",
+                "LINKEDIN_OAUTH_BASE_URL": f"{base_url}/oauth/v2",
+                "HF_BASE_URL": f"{base_url}/hf",
+                "CONTENT_CONCURRENCY": str(concurrency),
+            })
+            # Process-wide state must not leak between scenarios
+            registry.reset()
+            registry.keep_samples = True
+            resilience._backends.clear()
+
+            # Import the pipeline and its lazily loaded client up front so the first
+            # scenario isn't charged for it in either time or memory
+            import main  # noqa: F401
+            import huggingface_hub  # noqa: F401
+            import analytics_store, dedup_index, hashtag_engine  # noqa: F401,E401
+
+            tracemalloc.start()
+            timings = asyncio.run(run_posts(posts))
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            server = asyncio.run(fetch_server_stats(base_url))
+    finally:
+        os.chdir(previous_dir)
+        process.terminate()
+        process.join()
+
+    stages = {}
+    for (metric, labels), samples in sorted(registry.samples.items()):
+        labels = dict(labels)
+        if metric != "stage_duration_seconds" or labels.get("status") != "ok":
+            continue
+        stage = labels["stage"] + "".join(f"[{labels[k]}]" for k in ("stop", "endpoint") if k in labels)
+        stages.setdefault(stage, []).extend(samples)
+    counters = {}
+    for (metric, labels), value in registry.counters.items():
+        key = metric + "".join(f"[{v}]" for _, v in labels)
+        counters[key] = value
+
+    return {
+        "scenario": name,
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "config": config,
+        "posts_requested": posts,
+        "concurrency": concurrency,
+        "posts_published": timings["published"],
+        "elapsed_s": round(timings["elapsed_s"], 3),
+        "throughput_per_min": round(60 * timings["published"] / timings["elapsed_s"], 2) if timings["elapsed_s"] else 0,
+        "peak_traced_mb": round(peak / 2 ** 20, 2),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "stages": {stage: {"count": len(samples),
+                           "p50_ms": round(percentile(samples, 0.5) * 1000, 1),
+                           "p99_ms": round(percentile(samples, 0.99) * 1000, 1)}
+                   for stage, samples in stages.items()},
+        "counters": counters,
+        "parsing": structured_output.parse_stats(),
+        "server": server,
+    }
+
+
+def print_result(result: Dict, baseline: Optional[Dict] = None) -> None:
+    def delta(current, previous, higher_is_better=False):
+        if previous in (None, 0) or current is None:
+            return ""
+        change = (current - previous) / previous * 100
+        better = change > 0 if higher_is_better else change < 0
+        return f"  ({change:+.1f}% {'better' if better else 'worse'} vs {baseline.get('commit')})"
+
+    if baseline and any(baseline.get(key) != result[key] for key in ("posts_requested", "concurrency", "config")):
+        print(f"\n(not comparing {result['scenario']}: baseline used different posts, concurrency or config)")
+        baseline = None
+    base_stages = (baseline or {}).get("stages", {})
+    print(f"\n== {result['scenario']} ({result['posts_published']}/{result['posts_requested']} posts, "
+          f"concurrency {result['concurrency']}, commit {result['commit']})")
+    print(f"throughput   {result['throughput_per_min']:8.2f} posts/min"
+          f"{delta(result['throughput_per_min'], (baseline or {}).get('throughput_per_min'), True)}")
+    print(f"elapsed      {result['elapsed_s']:8.2f} s")
+    print(f"peak memory  {result['peak_traced_mb']:8.2f} MB traced, {result['max_rss_mb']:.1f} MB max RSS")
+    print(f"{'stage':<42} {'count':>6} {'p50 ms':>9} {'p99 ms':>9}")
+    for stage, stats in result["stages"].items():
+        previous = base_stages.get(stage, {})
+        print(f"{stage:<42} {stats['count']:>6} {stats['p50_ms']:>9.1f} {stats['p99_ms']:>9.1f}"
+              f"{delta(stats['p99_ms'], previous.get('p99_ms'))}")
+    server = result["server"]
+    print(f"server: {server['posts']} posts, {server['throttled']} x 429, {server['unauthorized']} x 401, "
+          f"{server['malformed']} malformed, {server['dropped_responses']} dropped, "
+          f"{server['duplicate_posts']} duplicate posts, {server['tokens_sent']} tokens sent, "
+          f"{server['streams_closed_early']} streams stopped early")
+    print(f"parsing: {result['parsing']}")
+    hedges = {key.split('[')[1].rstrip(']'): value for key, value in result["counters"].items()
+              if key.startswith("llm_hedges_total")}
+    if hedges:
+        print(f"hedges: {hedges}")
+
+
+def load_baselines(path: str) -> Dict[str, Dict]:
+    """Latest recorded result per scenario"""
+    baselines = {}
+    with open(path, 'r') as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                baselines[entry["scenario"]] = entry
+    return baselines
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='Scenario to run (repeatable; default: all)')
+    parser.add_argument('--posts', type=int, default=20, help='Topics per scenario')
+    parser.add_argument('--concurrency', type=int, default=4, help='Topics generated concurrently')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for latencies and injected faults')
+    parser.add_argument('--output', help='Append results to this JSON-lines file')
+    parser.add_argument('--compare', help='Compare against the latest results per scenario in this file')
+    args = parser.parse_args()
+
+    # The pipeline logs at DEBUG to a file in the scratch directory; keep the console readable
+    logging.disable(logging.WARNING)
+    baselines = load_baselines(args.compare) if args.compare else {}
+    for name in args.scenario or list(SCENARIOS):
+        result = run_scenario(name, SCENARIOS[name], args.posts, args.concurrency, args.seed)
+        print_result(result, baselines.get(name))
+        if args.output:
+            with open(args.output, 'a') as f:
+                f.write(json.dumps(result) + "\n")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
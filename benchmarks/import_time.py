@@ -0,0 +1,95 @@
+"""Cold-start import benchmark for the posting entry point.
+
+Runs ``python -X importtime -c "import main, topic_scheduler"`` (the modules
+every CLI run imports) in a fresh interpreter several times, reports the
+cumulative import time and the slowest modules, and exits non-zero if the
+median exceeds the budget or if any of the heavy, lazily imported stacks
+(browser automation, callback server, Hugging Face client, numpy) were pulled
+in at import time.
+
+Usage:
+    python benchmarks/import_time.py [--runs 5] [--budget-ms 800] [--top 10]
+"""
+import os
+import sys
+import argparse
+import tempfile
+import statistics
+import subprocess
+from typing import Dict, List, Tuple
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# Modules that must only be imported when authorization or generation needs them
+LAZY_MODULES = ['selenium', 'webdriver_manager', 'fastapi', 'uvicorn', 'huggingface_hub', 'numpy']
+
+
+def measure_once(module: str) -> Tuple[float, Dict[str, float]]:
+    """Import `module` in a fresh interpreter; return total ms and cumulative ms per direct import"""
+    env = dict(os.environ, PYTHONPATH=SRC_DIR)
+    # Run from a scratch directory so side effects (e.g. the log file) stay out of the tree
+    with tempfile.TemporaryDirectory() as workdir:
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=workdir, env=env, capture_output=True, text=True
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    packages: Dict[str, float] = {}
+    total = 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nesting is shown as two spaces of indentation after the separator space
+        name = name.rstrip()[1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+        top = name.strip().split('.')[0]
+        cumulative_ms = int(cumulative) / 1000
+        if depth == 0:
+            # Top-level entries add up to the total import time
+            total += cumulative_ms
+        if depth == 1:
+            # Attribute time to what the target module imports directly
+            packages[top] = packages.get(top, 0.0) + cumulative_ms
+        else:
+            packages.setdefault(top, 0.0)
+    return total, packages
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Measure cold-start import time')
+    parser.add_argument('--module', default='main, topic_scheduler',
+                        help='Comma-separated modules to import (default: main, topic_scheduler)')
+    parser.add_argument('--runs', type=int, default=5, help='Number of fresh interpreters to time')
+    parser.add_argument('--budget-ms', type=float, default=800.0, help='Fail if the median exceeds this')
+    parser.add_argument('--top', type=int, default=10, help='Number of slowest packages to list')
+    args = parser.parse_args()
+
+    totals: List[float] = []
+    packages: Dict[str, float] = {}
+    for _ in range(args.runs):
+        total, packages = measure_once(args.module)
+        totals.append(total)
+
+    median = statistics.median(totals)
+    print(f"import {args.module}: median {median:.1f} ms, min {min(totals):.1f} ms, "
+          f"max {max(totals):.1f} ms over {args.runs} runs")
+    print(f"Slowest direct imports of {args.module} (last run):")
+    for name, ms in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {name:<30} {ms:8.1f} ms")
+
+    failed = False
+    eager = [name for name in LAZY_MODULES if name in packages]
+    if eager:
+        print(f"FAIL: lazily loaded modules imported at startup: {', '.join(eager)}")
+        failed = True
+    if median > args.budget_ms:
+        print(f"FAIL: median import time {median:.1f} ms exceeds budget {args.budget_ms:.1f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
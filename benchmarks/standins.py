@@ -0,0 +1,198 @@
+"""Local stand-ins for the LinkedIn REST API, LinkedIn OAuth and a Hugging Face
+text-generation endpoint, used by the end-to-end benchmark.
+
+One aiohttp server answers on three prefixes:
+
+    /v2/...                 userinfo and ugcPosts (LinkedIn REST)
+    /oauth/v2/accessToken   authorization-code and refresh-token grants
+    /hf                     TGI-style text generation, streamed or not
+
+Latencies are drawn from a log-normal fitted to a median and a p99, and faults
+(429s with Retry-After, revoked tokens answered with 401, posts whose response
+is lost after they were stored, malformed model output) are injected with fixed probabilities from a seeded RNG, so a scenario
+replays the same way on every commit.
+"""
+import re
+import json
+import math
+import random
+import asyncio
+import itertools
+from typing import Dict, Optional
+
+from aiohttp import web
+
+DEFAULT_CONFIG = {
+    "seed": 1,
+    "linkedin_median_ms": 120, "linkedin_p99_ms": 600,
+    "oauth_median_ms": 150, "oauth_p99_ms": 500,
+    "hf_ttft_median_ms": 300, "hf_ttft_p99_ms": 1500,
+    "hf_token_ms": 4,
+    "p429": 0.0, "retry_after_s": 1,
+    "p401": 0.0,
+    "p_drop": 0.0,
+    "p_malformed": 0.0,
+    "trailing_tokens": 120,
+}
+
+WORDS = ("team product customer growth data platform strategy market insight pipeline leader "
+         "launch quarter model feedback experiment hiring culture remote cloud security revenue "
+         "roadmap partner design metric workflow automation learning mentor network brand story "
+         "community budget risk compliance scale latency quality release support trust vision").split()
+
+INITIAL_TOKEN = "bench-token-0"
+
+
+class StandIns:
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = {**DEFAULT_CONFIG, **(config or {})}
+        self.rng = random.Random(self.config["seed"])
+        self.valid_tokens = {INITIAL_TOKEN}
+        self.token_ids = itertools.count(1)
+        self.post_ids = itertools.count(1)
+        self.posts = []
+        self.stats = {"linkedin_requests": 0, "posts": 0, "throttled": 0, "unauthorized": 0,
+                      "token_grants": 0, "hf_requests": 0, "hf_streams": 0, "tokens_sent": 0,
+                      "streams_closed_early": 0, "malformed": 0, "dropped_responses": 0,
+                      "duplicate_posts": 0}
+
+    async def _latency(self, median_ms: float, p99_ms: float) -> None:
+        # Log-normal: p99 sits 2.326 standard deviations above the median in log space
+        sigma = math.log(max(p99_ms, median_ms) / median_ms) / 2.326 if median_ms else 0.0
+        await asyncio.sleep(median_ms * math.exp(self.rng.gauss(0, sigma)) / 1000 if median_ms else 0)
+
+    # LinkedIn REST
+
+    async def linkedin(self, request: web.Request) -> web.Response:
+        self.stats["linkedin_requests"] += 1
+        await self._latency(self.config["linkedin_median_ms"], self.config["linkedin_p99_ms"])
+        token = request.headers.get("Authorization", "").partition(" ")[2]
+        if token not in self.valid_tokens or self.rng.random() < self.config["p401"]:
+            # Revoke the presented token so the client has to refresh
+            self.valid_tokens.discard(token)
+            self.stats["unauthorized"] += 1
+            return web.json_response({"message": "Invalid access token"}, status=401)
+        if self.rng.random() < self.config["p429"]:
+            self.stats["throttled"] += 1
+            return web.json_response({"message": "Too many requests"}, status=429,
+                                     headers={"Retry-After": str(self.config["retry_after_s"])})
+
+        resource = request.match_info["tail"]
+        if resource == "userinfo":
+            return web.json_response({"sub": "bench-member", "localizedFirstName": "Bench",
+                                      "localizedLastName": "User"})
+        if resource == "ugcPosts" and request.method == "POST":
+            body = await request.json()
+            text = body["specificContent"]["com.linkedin.ugc.ShareContent"]["shareCommentary"]["text"]
+            if any(post["specificContent"]["com.linkedin.ugc.ShareContent"]["shareCommentary"]["text"] == text
+                   for post in self.posts):
+                self.stats["duplicate_posts"] += 1
+            post_id = f"urn:li:share:{next(self.post_ids)}"
+            self.posts.append({**body, "id": post_id})
+            self.stats["posts"] += 1
+            if self.rng.random() < self.config["p_drop"]:
+                # The post is live but the client never hears back
+                self.stats["dropped_responses"] += 1
+                request.transport.close()
+            return web.json_response({"id": post_id}, status=201, headers={"X-RestLi-Id": post_id})
+        if resource == "ugcPosts" and request.query.get("q") == "authors":
+            count = int(request.query.get("count", 20))
+            return web.json_response({"elements": self.posts[::-1][:count]})
+        return web.json_response({"message": f"Unknown resource {resource}"}, status=404)
+
+    async def access_token(self, request: web.Request) -> web.Response:
+        await self._latency(self.config["oauth_median_ms"], self.config["oauth_p99_ms"])
+        form = await request.post()
+        if form.get("grant_type") not in ("authorization_code", "refresh_token"):
+            return web.json_response({"error": "unsupported_grant_type"}, status=400)
+        token = f"bench-token-{next(self.token_ids)}"
+        self.valid_tokens.add(token)
+        self.stats["token_grants"] += 1
+        return web.json_response({"access_token": token, "expires_in": 5184000,
+                                  "refresh_token": "bench-refresh", "refresh_token_expires_in": 31536000})
+
+    # Hugging Face text generation
+
+    def _words(self, count: int) -> str:
+        return " ".join(self.rng.choice(WORDS) for _ in range(count))
+
+    def _completion(self, prompt: str) -> str:
+        """Build a plausible answer for each of the generator's prompts"""
+        topic_match = re.search(r"about (.+?)\.\s*$", prompt, re.MULTILINE)
+        topic = topic_match.group(1) if topic_match else "work"
+        content = f"{topic}: {self._words(60)}.\n\n{self._words(60)}?\n\n{self._words(40)}."
+        tags = ["#Leadership", "#Innovation", "#Technology", "#Growth", "#Teams"]
+        trailing = "\n\n" + self._words(self.config["trailing_tokens"])
+
+        if "hashtags" in prompt and "Generate" in prompt:
+            return " ".join(tags) + trailing
+        if "Optimize this LinkedIn post" in prompt:
+            return content + trailing
+        if self.rng.random() < self.config["p_malformed"]:
+            self.stats["malformed"] += 1
+            body = json.dumps({"content": content, "hashtags": tags})
+            return self.rng.choice([
+                f"Here is your post:\n\n{content}\n\n{' '.join(tags)}",
+                f"```json\n{body}\n```",
+                body[:len(body) * 2 // 3],
+                json.dumps({"post": content, "tags": tags}),
+            ])
+        return json.dumps({"content": content, "hashtags": tags}) + trailing
+
+    async def generate(self, request: web.Request) -> web.StreamResponse:
+        self.stats["hf_requests"] += 1
+        body = await request.json()
+        text = self._completion(body.get("inputs", ""))
+        # Roughly four characters per token, like real tokenizers on English prose
+        tokens = [text[i:i + 4] for i in range(0, len(text), 4)]
+        await self._latency(self.config["hf_ttft_median_ms"], self.config["hf_ttft_p99_ms"])
+        delay = self.config["hf_token_ms"] / 1000
+
+        if not body.get("stream"):
+            await asyncio.sleep(delay * len(tokens))
+            self.stats["tokens_sent"] += len(tokens)
+            return web.json_response([{"generated_text": text}])
+
+        self.stats["hf_streams"] += 1
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        try:
+            for i, token in enumerate(tokens):
+                event = {"index": i, "token": {"id": i, "text": token, "logprob": 0.0, "special": False},
+                         "generated_text": text if i == len(tokens) - 1 else None, "details": None}
+                await response.write(f"data: {json.dumps(event)}\n\n".encode())
+                self.stats["tokens_sent"] += 1
+                await asyncio.sleep(delay)
+                if request.transport is None or request.transport.is_closing():
+                    raise ConnectionResetError
+            await response.write_eof()
+        except (ConnectionResetError, asyncio.CancelledError):
+            # The client stopped reading: it terminated generation early
+            self.stats["streams_closed_early"] += 1
+        return response
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/oauth/v2/accessToken", self.access_token)
+        app.router.add_post("/hf", self.generate)
+        app.router.add_get("/_stats", self.get_stats)
+        app.router.add_route("*", "/v2/{tail:.*}", self.linkedin)
+        return app
+
+
+async def _serve(config: Dict, ready) -> None:
+    runner = web.AppRunner(StandIns(config).app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    ready.put(f"http://127.0.0.1:{port}")
+    await asyncio.Event().wait()
+
+
+def serve(config: Dict, ready) -> None:
+    """Process entry point: run the stand-ins until terminated, reporting the base URL on `ready`"""
+    asyncio.run(_serve(config, ready))
@@ -1,7 +1,37 @@
-from .oauth_handler import OAuthHandler
-from .content_generator import ContentGenerator
-from .linkedin_manager import LinkedInManager
-from .main import LinkedInPostAutomation
+import importlib
 
 __version__ = "1.0.0"
-__all__ = ['OAuthHandler', 'ContentGenerator', 'LinkedInManager', 'LinkedInPostAutomation']
\ No newline at end of file
+
+# Public names and the modules defining them; each module is imported on first access so
+# importing the package doesn't pay for numpy, the model client or the storage layers
+_EXPORTS = {
+    'OAuthHandler': 'oauth_handler',
+    'ContentGenerator': 'content_generator',
+    'LinkedInManager': 'linkedin_manager',
+    'LinkedInPostAutomation': 'main',
+    'ResponseCache': 'response_cache',
+    'PostingDaemon': 'daemon',
+    'ScheduleStore': 'schedule_store',
+    'ScheduleDispatcher': 'schedule_store',
+    'RateLimiter': 'rate_limiter',
+    'AnalyticsStore': 'analytics_store',
+    'TopicLibrary': 'topic_scheduler',
+    'TopicScheduler': 'topic_scheduler',
+    'DedupIndex': 'dedup_index',
+    'HashtagEngine': 'hashtag_engine',
+    'TokenVault': 'token_vault',
+    'AccountFanout': 'multi_account',
+    'Outbox': 'outbox',
+    'OutboxPublisher': 'outbox',
+    'ContentBuffer': 'content_buffer',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# One append-only binary file per column; rows are analytics samples
+COLUMNS = {
+    "post_idx": np.int32,
+    "topic_idx": np.int32,
+    "published_at": np.float64,
+    "sampled_at": np.float64,
+    "impressions": np.int64,
+    "likes": np.int64,
+    "comments": np.int64,
+    "shares": np.int64,
+    "clicks": np.int64,
+    "engagement": np.float64,
+}
+
+
+class AnalyticsStore:
+    """Local columnar store of post analytics with vectorized aggregations"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or os.getenv('ANALYTICS_STORE_DIR', '.analytics')
+        os.makedirs(self.directory, exist_ok=True)
+        self._dictionary_path = os.path.join(self.directory, 'dictionary.json')
+        self.topics: List[str] = []
+        self.posts: List[Dict] = []
+        if os.path.exists(self._dictionary_path):
+            with open(self._dictionary_path, 'r') as f:
+                saved = json.load(f)
+            self.topics = saved.get("topics", [])
+            self.posts = saved.get("posts", [])
+        self._topic_index = {topic: i for i, topic in enumerate(self.topics)}
+        self._post_index = {post["id"]: i for i, post in enumerate(self.posts)}
+        self._columns: Optional[Dict[str, np.ndarray]] = None
+
+    def _column_path(self, name: str) -> str:
+        return os.path.join(self.directory, f'{name}.bin')
+
+    def _save_dictionary(self) -> None:
+        tmp_path = self._dictionary_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({"topics": self.topics, "posts": self.posts}, f)
+        os.replace(tmp_path, self._dictionary_path)
+
+    def _topic_id(self, topic: str) -> int:
+        if topic not in self._topic_index:
+            self._topic_index[topic] = len(self.topics)
+            self.topics.append(topic)
+        return self._topic_index[topic]
+
+    def register_post(self, post_id: str, topic: str, published_at: Optional[float] = None,
+                      hashtags: Optional[List[str]] = None) -> int:
+        """Remember which topic (and hashtags) a published post belongs to"""
+        if post_id in self._post_index:
+            return self._post_index[post_id]
+        self._post_index[post_id] = len(self.posts)
+        self.posts.append({
+            "id": post_id,
+            "topic": self._topic_id(topic),
+            "published_at": published_at or time.time(),
+            "hashtags": list(hashtags or [])
+        })
+        self._save_dictionary()
+        return self._post_index[post_id]
+
+    def post_ids(self, since: Optional[float] = None) -> List[str]:
+        """Registered post URNs, optionally only those published after `since`"""
+        return [post["id"] for post in self.posts if since is None or post["published_at"] >= since]
+
+    def append(self, samples: Iterable[Tuple[str, Dict]], sampled_at: Optional[float] = None) -> int:
+        """Append (post_id, totalShareStatistics) samples for registered posts"""
+        sampled_at = sampled_at or time.time()
+        rows = {name: [] for name in COLUMNS}
+        for post_id, stats in samples:
+            if post_id not in self._post_index or stats is None:
+                continue
+            post = self.posts[self._post_index[post_id]]
+            impressions = int(stats.get("impressionCount", 0))
+            likes = int(stats.get("likeCount", 0))
+            comments = int(stats.get("commentCount", 0))
+            shares = int(stats.get("shareCount", 0))
+            clicks = int(stats.get("clickCount", 0))
+            engagement = stats.get("engagement")
+            if engagement is None:
+                engagement = (likes + comments + shares + clicks) / impressions if impressions else 0.0
+            for name, value in (("post_idx", self._post_index[post_id]), ("topic_idx", post["topic"]),
+                                ("published_at", post["published_at"]), ("sampled_at", sampled_at),
+                                ("impressions", impressions), ("likes", likes), ("comments", comments),
+                                ("shares", shares), ("clicks", clicks), ("engagement", float(engagement))):
+                rows[name].append(value)
+
+        count = len(rows["post_idx"])
+        if count:
+            for name, dtype in COLUMNS.items():
+                with open(self._column_path(name), 'ab') as f:
+                    f.write(np.asarray(rows[name], dtype=dtype).tobytes())
+            self._columns = None
+        return count
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Memory-map every column; arrays share one row count"""
+        if self._columns is None:
+            columns = {}
+            for name, dtype in COLUMNS.items():
+                path = self._column_path(name)
+                size = os.path.getsize(path) if os.path.exists(path) else 0
+                rows = size // np.dtype(dtype).itemsize
+                columns[name] = np.memmap(path, dtype=dtype, mode='r', shape=(rows,)) if rows else np.empty(0, dtype)
+            # A crash mid-append can leave columns ragged; only trust complete rows
+            rows = min(len(column) for column in columns.values())
+            self._columns = {name: column[:rows] for name, column in columns.items()}
+        return self._columns
+
+    def latest(self) -> Dict[str, np.ndarray]:
+        """Most recent sample for each post, so repeated sweeps aren't double counted"""
+        columns = self.columns()
+        if not len(columns["post_idx"]):
+            return columns
+        order = np.lexsort((columns["sampled_at"], columns["post_idx"]))
+        post_idx = columns["post_idx"][order]
+        # The last row of each post group is its latest sample
+        last = np.r_[post_idx[1:] != post_idx[:-1], True]
+        selected = order[last]
+        return {name: column[selected] for name, column in columns.items()}
+
+    def topic_stats(self, metric: str = "engagement") -> Dict[str, Tuple[float, int]]:
+        """(mean `metric`, post count) per topic over each post's latest sample"""
+        latest = self.latest()
+        if not len(latest["topic_idx"]):
+            return {}
+        counts = np.bincount(latest["topic_idx"], minlength=len(self.topics))
+        sums = np.bincount(latest["topic_idx"], weights=latest[metric].astype(np.float64), minlength=len(self.topics))
+        return {self.topics[i]: (float(sums[i] / counts[i]), int(counts[i])) for i in np.nonzero(counts)[0]}
+
+    def topic_mean_engagement(self, metric: str = "engagement") -> Dict[str, float]:
+        """Mean of `metric` per topic over each post's latest sample"""
+        return {topic: mean for topic, (mean, _) in self.topic_stats(metric).items()}
+
+    def hashtag_stats(self, metric: str = "engagement") -> Dict[str, Tuple[float, int]]:
+        """(mean `metric`, post count) per hashtag (lower-cased, without '#') over each post's latest sample"""
+        latest = self.latest()
+        tags: Dict[str, int] = {}
+        rows, tag_ids = [], []
+        for row, post_idx in enumerate(latest["post_idx"]):
+            for tag in self.posts[post_idx].get("hashtags", []):
+                rows.append(row)
+                tag_ids.append(tags.setdefault(tag.lstrip('#').lower(), len(tags)))
+        if not rows:
+            return {}
+        tag_ids = np.asarray(tag_ids, dtype=np.int64)
+        values = latest[metric].astype(np.float64)[np.asarray(rows, dtype=np.int64)]
+        counts = np.bincount(tag_ids, minlength=len(tags))
+        sums = np.bincount(tag_ids, weights=values, minlength=len(tags))
+        return {tag: (float(sums[i] / counts[i]), int(counts[i])) for tag, i in tags.items()}
+
+    def hour_of_day_histogram(self, metric: str = "engagement", utc_offset_hours: float = 0.0) -> np.ndarray:
+        """Mean `metric` by hour of day the post was published (24 buckets, NaN where empty)"""
+        latest = self.latest()
+        hours = (((latest["published_at"] + utc_offset_hours * 3600) // 3600) % 24).astype(np.int64)
+        counts = np.bincount(hours, minlength=24)
+        sums = np.bincount(hours, weights=latest[metric].astype(np.float64), minlength=24)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return sums / counts
+
+    def rolling_engagement(self, window_days: int = 7, metric: str = "engagement",
+                           since: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Rolling mean of `metric` by publish day; returns (day start epochs, values)"""
+        latest = self.latest()
+        published = latest["published_at"]
+        values = latest[metric].astype(np.float64)
+        if since is not None:
+            mask = published >= since
+            published, values = published[mask], values[mask]
+        if not len(published):
+            return np.empty(0), np.empty(0)
+
+        days = (published // 86400).astype(np.int64)
+        first = days.min()
+        offsets = days - first
+        sums = np.bincount(offsets, weights=values)
+        counts = np.bincount(offsets).astype(np.float64)
+        kernel = np.ones(window_days)
+        window_sums = np.convolve(sums, kernel)[:len(sums)]
+        window_counts = np.convolve(counts, kernel)[:len(counts)]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rolling = window_sums / window_counts
+        return (first + np.arange(len(sums))) * 86400.0, rolling
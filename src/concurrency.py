@@ -0,0 +1,50 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Iterable, TypeVar
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+class _Raised:
+    """Carries a worker's exception to the consumer"""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+async def bounded_map(func: Callable[[T], Awaitable[R]], items: Iterable[T], limit: int) -> AsyncIterator[R]:
+    """Await `func` over `items` with at most `limit` calls in flight, yielding results as they complete
+
+    An exception from `func` propagates to the consumer; closing the generator early
+    cancels the calls still in flight.
+    """
+    pending = iter(items)
+    limit = max(1, limit)
+    # Bounded, so workers wait for a slow consumer instead of running through every item
+    results: asyncio.Queue = asyncio.Queue(maxsize=limit)
+    done = object()
+
+    async def worker():
+        # Workers share one iterator, so at most `limit` items are in flight
+        try:
+            for item in pending:
+                await results.put(await func(item))
+        except Exception as e:
+            await results.put(_Raised(e))
+        await results.put(done)
+
+    workers = [asyncio.create_task(worker()) for _ in range(limit)]
+    try:
+        remaining = len(workers)
+        while remaining:
+            item = await results.get()
+            if item is done:
+                remaining -= 1
+                continue
+            if isinstance(item, _Raised):
+                raise item.error
+            yield item
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
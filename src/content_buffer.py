@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from metrics import inc, span
+
+logger = logging.getLogger(__name__)
+
+
+class ContentBuffer:
+    """Look-ahead store of ready-to-publish posts for one topic pool, refilled between low and high watermarks"""
+
+    def __init__(self, scheduler, pool: str = 'default',
+                 path: Optional[str] = None, low: Optional[int] = None, high: Optional[int] = None,
+                 batch_size: Optional[int] = None, max_age_hours: Optional[float] = None):
+        # A TopicScheduler: fills pick without starting a cooldown, which starts once a post is taken
+        self.scheduler = scheduler
+        self.pool = pool
+        self.path = path or os.getenv('CONTENT_BUFFER_PATH', '.content_buffer.db')
+        self.high = high if high is not None else int(os.getenv('CONTENT_BUFFER_HIGH', '3'))
+        self.low = min(self.high, low if low is not None else int(os.getenv('CONTENT_BUFFER_LOW', '1')))
+        self.batch_size = batch_size or int(os.getenv('CONTENT_BUFFER_BATCH', '4'))
+        # Posts written long ago may reference news that has moved on
+        self.max_age = (max_age_hours if max_age_hours is not None
+                        else float(os.getenv('CONTENT_BUFFER_MAX_AGE_HOURS', '72'))) * 3600
+        self.hits = 0
+        self.misses = 0
+
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buffered_posts ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, pool TEXT NOT NULL, topic TEXT NOT NULL, "
+            "post TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_pool_topic ON buffered_posts (pool, topic, id)")
+        self._conn.commit()
+
+        # Filling only proceeds while no publish is in progress
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._publishing = 0
+        self._wakeup = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._fill_lock = asyncio.Lock()
+
+    def _expire(self) -> None:
+        with self._conn:
+            expired = self._conn.execute(
+                "DELETE FROM buffered_posts WHERE pool = ? AND created_at < ?",
+                (self.pool, time.time() - self.max_age)
+            ).rowcount
+        if expired:
+            logger.info(f"Dropped {expired} stale buffered posts from pool '{self.pool}'")
+
+    def level(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM buffered_posts WHERE pool = ?", (self.pool,)).fetchone()[0]
+
+    def topics(self) -> List[str]:
+        return [row[0] for row in self._conn.execute(
+            "SELECT DISTINCT topic FROM buffered_posts WHERE pool = ?", (self.pool,)
+        )]
+
+    def add(self, posts: List[Dict]) -> None:
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO buffered_posts (pool, topic, post, created_at) VALUES (?, ?, ?, ?)",
+                [(self.pool, post['topic'], json.dumps(post), now) for post in posts]
+            )
+
+    def pick(self, count: int = 1) -> List[str]:
+        """Topics for the next posts: buffered ones first (oldest first), then fresh picks"""
+        self._expire()
+        topics = [row[0] for row in self._conn.execute(
+            "SELECT topic FROM buffered_posts WHERE pool = ? ORDER BY id LIMIT ?", (self.pool, count)
+        )]
+        if len(topics) < count:
+            topics += self.scheduler.pick(count - len(topics), exclude=topics)
+        return topics
+
+    def take(self, topics: List[str]) -> Tuple[List[Dict], List[str]]:
+        """Remove buffered posts for `topics`; returns them and the topics that need live generation"""
+        self._expire()
+        posts, missing = [], []
+        with self._conn:
+            for topic in topics:
+                row = self._conn.execute(
+                    "SELECT id, post FROM buffered_posts WHERE pool = ? AND topic = ? ORDER BY id LIMIT 1",
+                    (self.pool, topic)
+                ).fetchone()
+                if row is None:
+                    missing.append(topic)
+                    continue
+                self._conn.execute("DELETE FROM buffered_posts WHERE id = ?", (row[0],))
+                posts.append(json.loads(row[1]))
+        if posts:
+            self.scheduler.history.record([post['topic'] for post in posts])
+        self.hits += len(posts)
+        self.misses += len(missing)
+        if posts:
+            inc("content_buffer_total", len(posts), result="hit")
+        if missing:
+            inc("content_buffer_total", len(missing), result="miss")
+        if self.level() <= self.low:
+            self._wakeup.set()
+        return posts, missing
+
+    @asynccontextmanager
+    async def publishing(self) -> AsyncIterator[None]:
+        """Hold off refills while a publish slot generates live, so it gets the model to itself"""
+        self._publishing += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self._publishing -= 1
+            if not self._publishing:
+                self._idle.set()
+
+    async def fill(self, generator, force: bool = False) -> int:
+        """Top the pool up to the high watermark in batches once it is at or below the low one"""
+        async with self._fill_lock:
+            self._expire()
+            if not force and self.level() > self.low:
+                return 0
+            added = 0
+            while self.level() < self.high and not self._stop.is_set():
+                await self._idle.wait()
+                if self._stop.is_set():
+                    break
+                topics = self.scheduler.pick(min(self.batch_size, self.high - self.level()),
+                                             record=False, exclude=self.topics())
+                if not topics:
+                    break
+                with span("buffer_fill"):
+                    # Store each post as it completes, so an interrupted batch keeps its finished work
+                    generated = 0
+                    async for post in generator.stream_content_batch(topics):
+                        self.add([post])
+                        generated += 1
+                added += generated
+                if not generated:
+                    logger.warning(f"Buffer fill for pool '{self.pool}' generated nothing; retrying later")
+                    break
+            if added:
+                logger.info(f"Buffered {added} posts for pool '{self.pool}' (level {self.level()}/{self.high})")
+            return added
+
+    async def run(self, generator, interval: Optional[float] = None) -> None:
+        """Keep the pool filled in the background until stopped"""
+        interval = interval if interval is not None else float(os.getenv('CONTENT_BUFFER_CHECK_INTERVAL', '300'))
+        while not self._stop.is_set():
+            try:
+                await self.fill(generator)
+            except Exception as e:
+                logger.error(f"Buffer fill for pool '{self.pool}' failed: {e}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        self._idle.set()
+
+    def stats(self) -> Dict:
+        return {"pool": self.pool, "level": self.level(), "low": self.low, "high": self.high,
+                "hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        self._conn.close()
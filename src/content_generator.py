@@ -1,11 +1,15 @@
 import os
 import logging
-import json
 import asyncio
-from typing import List, Dict, Optional
-from time import sleep
-import aiohttp
-from huggingface_hub import InferenceClient
+import time
+from typing import List, Dict, Optional, Iterable, AsyncIterator, Callable
+from response_cache import ResponseCache
+from resilience import get_backend
+from streaming import StopCondition, AnyOf, JsonObjectComplete, WordBudget, HashtagBlockComplete
+from structured_output import StructuredOutputParser, record_parse
+from metrics import span, observe
+from hedging import HedgePolicy
+from concurrency import bounded_map
 
 class ContentGenerator:
     def __init__(self):
@@ -19,36 +23,206 @@ class ContentGenerator:
         
         self.logger.info("Initializing ContentGenerator with Hugging Face")
         
-        # Initialize the inference client
+        # Per-call timeout in seconds; a call that exceeds it is cancelled and retried
+        self.timeout = float(os.getenv('HF_TIMEOUT', '30'))
+
+        # Maximum number of topics processed concurrently by batch generation
+        self.concurrency = int(os.getenv('CONTENT_CONCURRENCY', '4'))
+
+        # Fused mode asks for optimized content and hashtags in a single call,
+        # falling back to the draft -> optimize -> hashtags chain on bad output
+        self.fused = os.getenv('CONTENT_FUSED_MODE', 'true').lower() == 'true'
+
+        # Streaming lets each stage stop as soon as its output is usable instead of
+        # waiting for max_new_tokens; the word budget caps free-text stages
+        self.streaming = os.getenv('CONTENT_STREAMING', 'true').lower() == 'true'
+        self.word_budget = int(os.getenv('CONTENT_WORD_BUDGET', '300'))
+
+        # Hashtags come from the local engine; the LLM is only asked when it has too few
+        self.hashtag_source = os.getenv('HASHTAG_SOURCE', 'local').lower()
+        self.hashtag_llm_fallback = os.getenv('HASHTAG_LLM_FALLBACK', 'true').lower() == 'true'
+        self._hashtag_engine = None
+
+        # The async inference client is created on first use so that importing and
+        # constructing the generator stays cheap when no generation is needed
         self.model = "mistralai/Mixtral-8x7B-Instruct-v0.1"  # Using Mixtral, a powerful open source model
-        self.client = InferenceClient(
-            model=self.model,
-            token=self.hf_token
-        )
+        # A dedicated endpoint (or a local stand-in) can serve the model instead of the HF router
+        self.base_url = os.getenv('HF_BASE_URL') or None
+        self._client = None
         self.logger.info(f"Initialized with model: {self.model}")
 
-    async def _generate_text(self, prompt: str, retries: int = 3) -> Optional[str]:
-        """Generate text using Hugging Face's API with retry logic"""
-        while retries > 0:
+        # Hedging sends a duplicate request, optionally to another model or endpoint, once a
+        # call is slower than most recent ones; whichever answers first is used
+        self.hedge = HedgePolicy.from_env() if os.getenv('HF_HEDGE', 'false').lower() == 'true' else None
+        self.hedge_target = os.getenv('HF_HEDGE_BASE_URL') or os.getenv('HF_HEDGE_MODEL') or None
+        self._hedge_client = None
+
+        # Sampling parameters are part of the cache key, so keep them in one place
+        self.generation_params = {
+            "max_new_tokens": 500,
+            "temperature": 0.7,
+            "top_p": 0.95,
+            "repetition_penalty": 1.1
+        }
+        self.cache = ResponseCache.from_env()
+
+        # Retries, backoff and the circuit breaker are shared by every generator in the process
+        self.resilience = get_backend("huggingface")
+
+    @property
+    def client(self):
+        """Async Hugging Face inference client, so generation never blocks the event loop"""
+        if self._client is None:
+            from huggingface_hub import AsyncInferenceClient
+            self._client = AsyncInferenceClient(
+                model=self.base_url or self.model,
+                token=self.hf_token,
+                timeout=self.timeout
+            )
+        return self._client
+
+    @property
+    def hedge_client(self):
+        """Client for hedged requests: the alternate model or endpoint, else the primary client"""
+        if self.hedge_target is None:
+            return self.client
+        if self._hedge_client is None:
+            from huggingface_hub import AsyncInferenceClient
+            self._hedge_client = AsyncInferenceClient(
+                model=self.hedge_target,
+                token=self.hf_token,
+                timeout=self.timeout
+            )
+        return self._hedge_client
+
+    async def _open_stream(self, client, prompt: str, timeout: float):
+        """Start a streamed generation and wait for its first token; returns (stream, first chunk or None)"""
+        stream = await asyncio.wait_for(
+            client.text_generation(prompt, stream=True, **self.generation_params),
+            timeout=timeout
+        )
+        try:
+            return stream, await asyncio.wait_for(stream.__anext__(), timeout=timeout)
+        except StopAsyncIteration:
+            return stream, None
+        except BaseException:
+            await self._close_stream((stream, None))
+            raise
+
+    @staticmethod
+    async def _close_stream(opened) -> None:
+        # Closing the stream drops the connection, so the server stops generating
+        aclose = getattr(opened[0], "aclose", None)
+        if aclose:
+            await aclose()
+
+    async def stream_text(self, prompt: str, stop: Optional[StopCondition] = None,
+                          timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """Yield generated tokens as they arrive, ending the request early once `stop` is met"""
+        timeout = timeout if timeout is not None else self.timeout
+        if stop:
+            stop.reset()
+        started = time.perf_counter()
+        # A hedged stream races on time to first token; once tokens flow the winner is kept
+        if self.hedge:
+            opened = await self.hedge.run(
+                "stream",
+                lambda: self._open_stream(self.client, prompt, timeout),
+                lambda: self._open_stream(self.hedge_client, prompt, timeout),
+                discard=self._close_stream
+            )
+        else:
+            opened = await self._open_stream(self.client, prompt, timeout)
+        stream, chunk = opened
+        if chunk is not None:
+            observe("generate_first_token_seconds", time.perf_counter() - started)
+        text = ""
+        try:
+            while chunk is not None:
+                text += chunk
+                yield chunk
+                if stop and stop.feed(chunk, text):
+                    break
+                # The timeout bounds the gap between tokens rather than the whole response
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), timeout=timeout)
+                except StopAsyncIteration:
+                    break
+        finally:
+            await self._close_stream(opened)
+
+    async def _generate_text(self, prompt: str, retries: int = 3, timeout: Optional[float] = None,
+                             use_cache: bool = True, stop: Optional[StopCondition] = None,
+                             accept: Optional[Callable[[str], bool]] = None) -> Optional[str]:
+        """Generate text using Hugging Face's API with caching and retry logic.
+
+        On return `stop` has consumed the whole response, whether it was streamed or not,
+        so stateful conditions such as parsers can be read by the caller. A response is
+        cached only once `accept` (called after `stop` has consumed it) approves it, and a
+        cached response it rejects is generated again rather than replayed.
+        """
+        accept = accept or bool
+        timeout = timeout if timeout is not None else self.timeout
+        stream = self.streaming and stop is not None
+        # Early-terminated output differs from a full completion, so it is cached separately
+        params = {**self.generation_params, "stop_condition": stop.key} if stream else self.generation_params
+        cache_key = ResponseCache.make_key(self.model, prompt, params)
+        if use_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                if stop:
+                    stop.reset()
+                    stop.feed(cached, cached)
+                if accept(cached):
+                    return cached
+                self.logger.warning("Discarding a cached response that no longer passes validation")
+
+        async def collect() -> str:
+            return "".join([chunk async for chunk in self.stream_text(prompt, stop, timeout)])
+
+        def call(client):
+            return asyncio.wait_for(client.text_generation(prompt, **self.generation_params), timeout=timeout)
+
+        async def attempt() -> str:
             try:
-                response = self.client.text_generation(
-                    prompt,
-                    max_new_tokens=500,
-                    temperature=0.7,
-                    top_p=0.95,
-                    repetition_penalty=1.1
-                )
-                return response
+                if stream:
+                    return await collect()
+                if self.hedge:
+                    return await self.hedge.run("call", lambda: call(self.client), lambda: call(self.hedge_client))
+                return await call(self.client)
+            except asyncio.TimeoutError:
+                self.logger.error(f"Generation timed out after {timeout}s")
+                raise
             except Exception as e:
                 self.logger.error(f"Generation error: {str(e)}")
-                if retries > 1:
-                    retries -= 1
-                    await asyncio.sleep(2)
-                    continue
                 raise
-        raise Exception("Failed to generate text after maximum retries")
 
-    async def generate_post(self, topic: str, tone: str = "professional") -> Dict[str, str]:
+        with span("generate_text", stop=stop.key if stop else "none", streamed=stream):
+            response = await self.resilience.call(attempt, max_attempts=retries)
+        if stop and not stream:
+            stop.reset()
+            stop.feed(response or "", response or "")
+        if use_cache and response and accept(response):
+            self.cache.set(cache_key, response)
+        return response
+
+    @property
+    def hashtag_engine(self):
+        """Local TF-IDF hashtag engine, loaded on first use"""
+        if self._hashtag_engine is None:
+            from hashtag_engine import HashtagEngine
+            self._hashtag_engine = HashtagEngine()
+        return self._hashtag_engine
+
+    async def close(self) -> None:
+        """Release the inference client's HTTP resources"""
+        for client in (self._client, self._hedge_client):
+            close = getattr(client, "close", None)
+            if close:
+                await close()
+        self.cache.close()
+
+    async def generate_post(self, topic: str, tone: str = "professional", use_cache: bool = True) -> Dict[str, str]:
         """Generate a LinkedIn post with hashtags for a given topic"""
         prompt = f"""
         Task: Create a professional LinkedIn post about {topic}.
@@ -64,28 +238,18 @@ class ContentGenerator:
         """
         
         try:
-            response_text = await self._generate_text(prompt)
-            try:
-                # Try to parse as JSON first
-                result = json.loads(response_text)
-                return {
-                    "content": result.get("content", ""),
-                    "hashtags": result.get("hashtags", [])
-                }
-            except json.JSONDecodeError:
-                # If not JSON, extract content and hashtags manually
-                words = response_text.split()
-                hashtags = [word for word in words if word.startswith("#")]
-                content = " ".join([word for word in words if not word.startswith("#")])
-                return {
-                    "content": content.strip(),
-                    "hashtags": hashtags
-                }
+            # The parser consumes tokens as they stream in, stopping at the closing brace
+            parser = StructuredOutputParser()
+            await self._generate_text(
+                prompt, use_cache=use_cache, stop=AnyOf(parser, WordBudget(self.word_budget)),
+                accept=lambda _: bool(parser.post()["content"])
+            )
+            return parser.extract_post()
         except Exception as e:
             self.logger.error(f"Error generating post: {str(e)}")
             raise
 
-    async def optimize_content(self, content: str) -> str:
+    async def optimize_content(self, content: str, use_cache: bool = True) -> str:
         """Optimize the content for LinkedIn engagement"""
         prompt = f"""
         Task: Optimize this LinkedIn post for maximum engagement while maintaining authenticity:
@@ -106,12 +270,23 @@ class ContentGenerator:
         """
         
         try:
-            return (await self._generate_text(prompt)).strip()
+            return (await self._generate_text(
+                prompt, use_cache=use_cache, stop=WordBudget(self.word_budget)
+            )).strip()
         except Exception as e:
             self.logger.error(f"Error optimizing content: {str(e)}")
             return content
 
-    async def generate_hashtags(self, content: str, count: int = 5) -> List[str]:
+    async def generate_hashtags(self, content: str, count: int = 5, use_cache: bool = True) -> List[str]:
+        """Suggest hashtags locally, falling back to the LLM when the engine finds too few"""
+        if self.hashtag_source == 'local':
+            hashtags = self.hashtag_engine.suggest(content, count)
+            if len(hashtags) >= min(3, count) or not self.hashtag_llm_fallback:
+                return hashtags
+            self.logger.info(f"Local hashtag engine found {len(hashtags)} tags, asking the model")
+        return await self.generate_llm_hashtags(content, count, use_cache)
+
+    async def generate_llm_hashtags(self, content: str, count: int = 5, use_cache: bool = True) -> List[str]:
         """Generate relevant hashtags based on the content"""
         prompt = f"""
         Task: Generate {count} relevant, professional, and trending LinkedIn hashtags for this content:
@@ -123,28 +298,106 @@ class ContentGenerator:
         """
         
         try:
-            response_text = await self._generate_text(prompt)
+            response_text = await self._generate_text(
+                prompt, use_cache=use_cache, stop=HashtagBlockComplete(count),
+                accept=lambda text: any(tag.startswith("#") for tag in text.split())
+            )
             hashtags = [tag.strip() for tag in response_text.split() if tag.startswith("#")]
             return hashtags[:count]
         except Exception as e:
             self.logger.error(f"Error generating hashtags: {str(e)}")
             return []
 
-    async def create_content_batch(self, topics: List[str], tone: str = "professional") -> List[Dict[str, str]]:
-        """Generate a batch of posts for multiple topics"""
-        posts = []
-        for topic in topics:
+    def _validate_fused(self, result: Optional[Dict], count: int) -> Optional[Dict]:
+        """Check a parsed fused response against the expected schema, or return None"""
+        if not isinstance(result, dict) or set(result) != {"content", "hashtags"}:
+            return None
+        content = result["content"]
+        hashtags = result["hashtags"]
+        if not isinstance(content, str) or not content.strip():
+            return None
+        if not isinstance(hashtags, list) or not 1 <= len(hashtags) <= count:
+            return None
+        for tag in hashtags:
+            if not isinstance(tag, str) or not tag.startswith("#") or len(tag) < 2 or any(c.isspace() for c in tag):
+                return None
+        return {"content": content.strip(), "hashtags": hashtags}
+
+    def _fused_prompt(self, topic: str, tone: str, count: int) -> str:
+        return f"""
+        Task: Write an engaging, ready-to-publish LinkedIn post about {topic}.
+
+        Requirements:
+        - Written in a {tone} tone, conversational and accessible
+        - Between 150-200 words, with short sentences and clear line breaks
+        - Include relevant industry insights and limit technical jargon
+        - Include a thought-provoking question and a clear call to action
+        - Provide between 3 and {count} relevant hashtags
+
+        Respond with ONLY a JSON object, no other text, matching exactly:
+        {{"content": "<post text without hashtags>", "hashtags": ["#Tag1", "#Tag2"]}}
+        """
+
+    async def generate_fused_post(self, topic: str, tone: str = "professional",
+                                  count: int = 5, use_cache: bool = True) -> Optional[Dict]:
+        """Generate optimized content and hashtags in one call; None if the output is invalid"""
+        parser = StructuredOutputParser()
+        await self._generate_text(self._fused_prompt(topic, tone, count), use_cache=use_cache, stop=parser,
+                                  accept=lambda _: self._validate_fused(parser.value(), count) is not None)
+        parsed = parser.value()
+        result = self._validate_fused(parsed, count)
+        # One outcome per response: valid JSON that fails the schema counts only as rejected
+        record_parse("rejected" if result is None and parsed is not None else parser.outcome or "failed")
+        if result is None:
+            self.logger.warning(f"Fused response for topic '{topic}' failed validation")
+        return result
+
+    async def preview_post(self, topic: str, tone: str = "professional", count: int = 5) -> AsyncIterator[str]:
+        """Stream a fused draft token by token for live preview; nothing is cached"""
+        async for chunk in self.stream_text(self._fused_prompt(topic, tone, count), JsonObjectComplete()):
+            yield chunk
+
+    async def _process_topic(self, topic: str, tone: str, use_cache: bool = True) -> Dict[str, str]:
+        """Run the fused call, or the draft -> optimize -> hashtags pipeline, for a single topic"""
+        if self.fused:
+            result = await self.generate_fused_post(topic, tone, use_cache=use_cache)
+            if result:
+                return {"topic": topic, **result}
+            self.logger.info(f"Falling back to multi-step generation for topic '{topic}'")
+
+        post = await self.generate_post(topic, tone, use_cache=use_cache)
+        optimized_content = await self.optimize_content(post["content"], use_cache=use_cache)
+        hashtags = await self.generate_hashtags(optimized_content, use_cache=use_cache)
+        return {
+            "topic": topic,
+            "content": optimized_content,
+            "hashtags": hashtags
+        }
+
+    async def regenerate(self, topic: str, tone: str = "professional") -> Dict[str, str]:
+        """Generate a fresh post for a topic, bypassing cached responses"""
+        return await self._process_topic(topic, tone, use_cache=False)
+
+    async def stream_content_batch(self, topics: Iterable[str], tone: str = "professional",
+                                   concurrency: Optional[int] = None) -> AsyncIterator[Dict[str, str]]:
+        """Generate posts for many topics concurrently, yielding each one as it completes"""
+        async def process(topic: str) -> Optional[Dict[str, str]]:
             try:
-                post = await self.generate_post(topic, tone)
-                optimized_content = await self.optimize_content(post["content"])
-                hashtags = await self.generate_hashtags(optimized_content)
-                posts.append({
-                    "topic": topic,
-                    "content": optimized_content,
-                    "hashtags": hashtags
-                })
+                return await self._process_topic(topic, tone)
             except Exception as e:
                 self.logger.error(f"Error generating content for topic '{topic}': {e}")
+                return None
+
+        async for post in bounded_map(process, topics, concurrency or self.concurrency):
+            if post is not None:
+                yield post
+
+    async def create_content_batch(self, topics: List[str], tone: str = "professional",
+                                   concurrency: Optional[int] = None) -> List[Dict[str, str]]:
+        """Generate a batch of posts for multiple topics, in completion order"""
+        posts = []
+        async for post in self.stream_content_batch(topics, tone, concurrency):
+            posts.append(post)
         return posts
 
 if __name__ == "__main__":
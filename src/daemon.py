@@ -0,0 +1,153 @@
+import os
+import json
+import signal
+import asyncio
+import logging
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from aiohttp import web
+
+from schedule_store import ScheduleStore, ScheduleDispatcher
+from resilience import resilience_stats
+from structured_output import parse_stats
+from metrics import registry, export_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class PostingDaemon:
+    """Keeps one automation instance warm and posts on an internal schedule"""
+
+    def __init__(self, automation_factory: Callable, pick_topics: Callable[[], List[str]],
+                 interval: Optional[float] = None, health_host: Optional[str] = None,
+                 health_port: Optional[int] = None, schedule_store: Optional[ScheduleStore] = None,
+                 content_buffer=None):
+        self.automation_factory = automation_factory
+        self.schedule_store = schedule_store
+        self.content_buffer = content_buffer
+        self.pick_topics = pick_topics
+        self.interval = interval if interval is not None else float(os.getenv('POST_INTERVAL', '300'))
+        self.health_host = health_host or os.getenv('HEALTH_HOST', '127.0.0.1')
+        self.health_port = health_port if health_port is not None else int(os.getenv('HEALTH_PORT', '8080'))
+
+        self.started_at: Optional[datetime] = None
+        self.last_run_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self.runs = 0
+        self.posts_published = 0
+        self._stop = asyncio.Event()
+
+    def stop(self) -> None:
+        """Ask the loop to exit once the current cycle has finished"""
+        logger.info("Shutdown requested, finishing current cycle")
+        self._stop.set()
+
+    def health(self) -> Dict:
+        """Snapshot of the daemon's state for the health endpoint"""
+        return {
+            "status": "stopping" if self._stop.is_set() else "ok",
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_error": self.last_error,
+            "runs": self.runs,
+            "posts_published": self.posts_published,
+            "interval_seconds": self.interval,
+            "scheduled": self.schedule_store.counts() if self.schedule_store else {},
+            "buffer": self.content_buffer.stats() if self.content_buffer else {},
+            "backends": resilience_stats(),
+            "parsing": parse_stats()
+        }
+
+    async def _handle_health(self, request: web.Request) -> web.Response:
+        body = self.health()
+        status = 200 if body["status"] == "ok" else 503
+        return web.Response(text=json.dumps(body), status=status, content_type="application/json")
+
+    async def _handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=registry.prometheus_text(), content_type="text/plain")
+
+    async def _start_health_server(self) -> Optional[web.AppRunner]:
+        """Serve GET /health and Prometheus GET /metrics; a port of 0 disables the endpoints"""
+        if not self.health_port:
+            return None
+        app = web.Application()
+        app.router.add_get("/health", self._handle_health)
+        app.router.add_get("/metrics", self._handle_metrics)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, self.health_host, self.health_port).start()
+        logger.info(f"Health endpoint listening on http://{self.health_host}:{self.health_port}/health")
+        return runner
+
+    def _install_signal_handlers(self) -> None:
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                # Signal handlers are unavailable on some platforms (e.g. Windows)
+                pass
+
+    async def run_cycle(self, automation) -> None:
+        """Generate and publish one round of posts"""
+        self.runs += 1
+        self.last_run_at = datetime.now()
+        try:
+            topics = self.pick_topics()
+            if not topics:
+                raise ValueError("No topics available")
+            logger.info(f"Selected topics: {topics}")
+            self.posts_published += await automation.create_and_post_content(topics)
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error(f"Daemon cycle failed: {e}")
+        export_metrics()
+
+    async def run(self) -> None:
+        """Run until SIGTERM/SIGINT, keeping sessions, token and profile resident"""
+        self._install_signal_handlers()
+        self.started_at = datetime.now()
+        runner = await self._start_health_server()
+        loop = asyncio.get_running_loop()
+        try:
+            async with self.automation_factory() as automation:
+                if not await automation.initialize():
+                    logger.warning("Initialization failed; will retry on the next cycle")
+
+                # Queued posts are published by their own dispatcher alongside the interval loop
+                dispatcher = dispatch_task = None
+                if self.schedule_store is not None:
+                    dispatcher = ScheduleDispatcher(self.schedule_store, automation)
+                    dispatch_task = asyncio.create_task(dispatcher.run())
+
+                # The content buffer refills between cycles so publish slots rarely wait on the model
+                fill_task = None
+                if self.content_buffer is not None:
+                    automation.content_buffer = self.content_buffer
+                    fill_task = asyncio.create_task(self.content_buffer.run(automation.content_generator))
+
+                try:
+                    while not self._stop.is_set():
+                        started = loop.time()
+                        await self.run_cycle(automation)
+
+                        # Sleep until the next slot, waking early on shutdown
+                        remaining = max(0.0, self.interval - (loop.time() - started))
+                        try:
+                            await asyncio.wait_for(self._stop.wait(), timeout=remaining)
+                        except asyncio.TimeoutError:
+                            pass
+                finally:
+                    if dispatcher is not None:
+                        dispatcher.stop()
+                        await dispatch_task
+                    if fill_task is not None:
+                        self.content_buffer.stop()
+                        fill_task.cancel()
+                        await asyncio.gather(fill_task, return_exceptions=True)
+        finally:
+            if runner is not None:
+                await runner.cleanup()
+            logger.info("Daemon stopped")
@@ -0,0 +1,126 @@
+import os
+import re
+import time
+import zlib
+import sqlite3
+import hashlib
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+GENERATED = 'generated'
+PUBLISHED = 'published'
+
+_WORD = re.compile(r"[a-z0-9']+")
+
+
+class DedupIndex:
+    """MinHash/LSH index over generated and published posts for near-duplicate lookups"""
+
+    def __init__(self, path: Optional[str] = None, threshold: Optional[float] = None,
+                 num_perm: int = 128, bands: int = 16, shingle_size: int = 3):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.path = path or os.getenv('DEDUP_INDEX_PATH', '.dedup_index.db')
+        self.threshold = threshold if threshold is not None else float(os.getenv('DEDUP_THRESHOLD', '0.7'))
+        # Generated posts that never went live stop blocking similar content after this long
+        self.pending_ttl = float(os.getenv('DEDUP_PENDING_HOURS', '72')) * 3600
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        # Fixed seed: signatures must stay comparable across runs
+        rng = np.random.default_rng(0x5EED)
+        self._a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, text_hash TEXT NOT NULL, kind TEXT NOT NULL, "
+            "topic TEXT, signature BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (band INTEGER NOT NULL, bucket INTEGER NOT NULL, doc_id INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_buckets ON buckets (band, bucket)")
+        self._conn.commit()
+
+    def _shingles(self, text: str) -> np.ndarray:
+        """Hash overlapping word n-grams of the normalized text to 32-bit values"""
+        words = _WORD.findall(text.lower())
+        size = min(self.shingle_size, len(words)) or 1
+        grams = {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+        return np.fromiter((zlib.crc32(gram.encode()) for gram in grams), dtype=np.uint64, count=len(grams))
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature using multiply-shift hashing (uint64 arithmetic wraps mod 2**64)"""
+        shingles = self._shingles(text)
+        hashed = (np.outer(shingles, self._a) + self._b) >> np.uint64(32)
+        return hashed.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[int]:
+        keys = []
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            keys.append(int.from_bytes(hashlib.blake2b(chunk, digest_size=7).digest(), 'little'))
+        return keys
+
+    def find_duplicate(self, text: str, exclude: Optional[int] = None) -> Optional[Tuple[int, float]]:
+        """Return (doc_id, estimated Jaccard similarity) of the closest near-duplicate, if any
+
+        `exclude` is the post's own document id, so a retry doesn't match itself; an
+        unpublished document with the same text is treated as the same post too.
+        """
+        signature = self.signature(text)
+        text_hash = hashlib.sha256(text.encode()).hexdigest()
+        pending_since = time.time() - self.pending_ttl
+        candidates = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates.update(row[0] for row in self._conn.execute(
+                "SELECT doc_id FROM buckets WHERE band = ? AND bucket = ?", (band, key)
+            ))
+        candidates.discard(exclude)
+        best = None
+        for doc_id in candidates:
+            blob, kind, doc_hash, created_at = self._conn.execute(
+                "SELECT signature, kind, text_hash, created_at FROM documents WHERE id = ?", (doc_id,)
+            ).fetchone()
+            if kind == GENERATED and (doc_hash == text_hash or created_at < pending_since):
+                continue
+            similarity = float(np.mean(np.frombuffer(blob, dtype=np.uint32) == signature))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (doc_id, similarity)
+        return best
+
+    def add(self, text: str, kind: str = GENERATED, topic: Optional[str] = None) -> int:
+        """Index a post and return its document id"""
+        signature = self.signature(text)
+        with self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO documents (text_hash, kind, topic, signature, created_at) VALUES (?, ?, ?, ?, ?)",
+                (hashlib.sha256(text.encode()).hexdigest(), kind, topic, signature.tobytes(), time.time())
+            )
+            doc_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO buckets (band, bucket, doc_id) VALUES (?, ?, ?)",
+                [(band, key, doc_id) for band, key in enumerate(self._band_keys(signature))]
+            )
+        return doc_id
+
+    def mark_published(self, doc_id: int) -> None:
+        with self._conn:
+            self._conn.execute("UPDATE documents SET kind = ? WHERE id = ?", (PUBLISHED, doc_id))
+
+    def discard(self, doc_id: int) -> None:
+        """Forget a generated post that will never be published"""
+        with self._conn:
+            if self._conn.execute("DELETE FROM documents WHERE id = ? AND kind = ?", (doc_id, GENERATED)).rowcount:
+                self._conn.execute("DELETE FROM buckets WHERE doc_id = ?", (doc_id,))
+
+    def close(self) -> None:
+        self._conn.close()
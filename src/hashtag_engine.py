@@ -0,0 +1,206 @@
+import os
+import re
+import json
+import math
+import time
+import logging
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"[a-z][a-z0-9+]*")
+_CAMEL = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each even every few for from
+further get gets getting had has have having he her here hers how i if in into is it its itself
+just know let like made make makes many me more most much must my new no nor not now of off on
+once one only or other our ours out over own really same see she should so some such than that
+the their them then there these they thing things this those through to too under until up us
+use used using very want was way we well were what when where which while who why will with
+would you your yours today time year years lot lots ways work help helps great good better best
+""".split())
+
+# Curated starting vocabulary: tag followed by extra keywords that should suggest it
+DEFAULT_VOCABULARY = """
+#ArtificialIntelligence ai
+#MachineLearning ml models training
+#GenerativeAI genai llm llms chatgpt
+#DataScience analytics data
+#BigData data pipelines
+#CloudComputing cloud aws azure gcp
+#CyberSecurity security breach privacy
+#DevOps deployment ci cd
+#SoftwareEngineering software engineering code developers
+#Programming coding code
+#OpenSource community contributors
+#Leadership leaders leading managers
+#Management managers teams
+#Innovation innovative ideas
+#DigitalTransformation digital transformation
+#FutureOfWork remote hybrid workplace
+#RemoteWork remote distributed
+#CareerDevelopment career growth skills
+#Productivity focus efficiency
+#Entrepreneurship founders startup startups
+#Startups startup founders funding
+#Marketing brand audience campaigns
+#Sales customers pipeline deals
+#CustomerExperience customers experience
+#Sustainability climate sustainable green
+#Healthcare health patients medical
+#FinTech finance payments banking
+#Blockchain crypto web3
+#Automation automate automated workflows
+#Technology tech
+#Networking connections
+#PersonalBranding brand linkedin
+#Learning learn learning courses
+#Diversity inclusion equity
+#Hiring recruiting talent
+""".strip()
+
+
+def tokenize(text: str) -> List[str]:
+    return [word for word in _WORD.findall(text.lower()) if len(word) > 1 and word not in STOPWORDS]
+
+
+def tag_key(tag: str) -> str:
+    """Case-insensitive identity of a hashtag, without the '#'"""
+    return tag.lstrip("#").lower()
+
+
+def tag_terms(tag: str) -> List[str]:
+    """Split '#MachineLearning' into ['machine', 'learning']"""
+    return [part.lower() for part in _CAMEL.findall(tag.lstrip("#"))]
+
+
+class HashtagEngine:
+    """Local hashtag suggestions from a TF-IDF keyword index over post history and a curated vocabulary"""
+
+    def __init__(self, path: Optional[str] = None, vocabulary_path: Optional[str] = None,
+                 engagement: Optional[Dict[str, Tuple[float, int]]] = None):
+        self.path = path or os.getenv('HASHTAG_INDEX_PATH', '.hashtag_index.json')
+        vocabulary_path = vocabulary_path or os.getenv('HASHTAG_VOCABULARY_PATH', 'hashtags.txt')
+        self.vocabulary = self._load_vocabulary(vocabulary_path)
+        # term -> vocabulary tags it suggests
+        self._vocab_index: Dict[str, List[str]] = {}
+        for tag, terms in self.vocabulary.items():
+            for term in terms:
+                self._vocab_index.setdefault(term, []).append(tag)
+
+        # History: document frequency per term, and how often each term appeared with each tag
+        self.docs = 0
+        self.df: Counter = Counter()
+        self.term_tags: Dict[str, Counter] = {}
+        self.display: Dict[str, str] = {tag_key(tag): tag for tag in self.vocabulary}
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                saved = json.load(f)
+            self.docs = saved.get("docs", 0)
+            self.df = Counter(saved.get("df", {}))
+            self.term_tags = {term: Counter(tags) for term, tags in saved.get("term_tags", {}).items()}
+            self.display.update(saved.get("display", {}))
+
+        self._engagement = engagement
+        self._reload_engagement = engagement is None
+        self._engagement_loaded_at = 0.0
+
+    @staticmethod
+    def _load_vocabulary(path: str) -> Dict[str, List[str]]:
+        """Parse '#Tag keyword keyword ...' lines; a local file replaces the built-in list"""
+        text = DEFAULT_VOCABULARY
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                text = f.read()
+        vocabulary = {}
+        for line in text.splitlines():
+            parts = line.split()
+            if not parts or not parts[0].startswith('#') or len(parts[0]) < 2:
+                continue
+            terms = tag_terms(parts[0]) + [word.lower() for word in parts[1:]]
+            vocabulary[parts[0]] = list(dict.fromkeys(term for term in terms if term not in STOPWORDS))
+        return vocabulary
+
+    @property
+    def engagement(self) -> Dict[str, Tuple[float, int]]:
+        """(mean engagement, post count) per hashtag key, reloaded hourly"""
+        if self._reload_engagement and time.time() - self._engagement_loaded_at > 3600:
+            self._engagement = None
+        if self._engagement is None:
+            from analytics_store import AnalyticsStore
+            self._engagement_loaded_at = time.time()
+            try:
+                self._engagement = AnalyticsStore().hashtag_stats()
+            except Exception as e:
+                logger.warning(f"Hashtag engagement unavailable, ranking by relevance only: {e}")
+                self._engagement = {}
+        return self._engagement
+
+    def _idf(self, term: str) -> float:
+        return math.log((self.docs + 1) / (self.df.get(term, 0) + 1)) + 1
+
+    def _engagement_factor(self, key: str, baseline: float) -> float:
+        """Shrink a tag's engagement ratio toward 1 when it has few posts"""
+        mean, count = self.engagement.get(key, (baseline, 0))
+        if baseline <= 0:
+            return 1.0
+        ratio = (count * mean / baseline + 3) / (count + 3)
+        return min(2.0, max(0.5, ratio))
+
+    def suggest(self, content: str, count: int = 5) -> List[str]:
+        """Rank candidate hashtags for a post by relevance, weighted by past engagement"""
+        terms = Counter(tokenize(content))
+        if not terms:
+            return []
+        total = sum(terms.values())
+        weights = {term: (n / total) * self._idf(term) for term, n in terms.items()}
+
+        scores: Dict[str, float] = {}
+        for term, weight in weights.items():
+            for tag in self._vocab_index.get(term, ()):
+                key = tag_key(tag)
+                scores[key] = scores.get(key, 0.0) + weight / math.sqrt(len(self.vocabulary[tag]))
+            # Tags we used before alongside this term, in proportion to how often they co-occurred
+            related = self.term_tags.get(term)
+            if related:
+                seen = self.df.get(term, 1)
+                for key, n in related.items():
+                    scores[key] = scores.get(key, 0.0) + weight * n / seen
+
+        if len(scores) < count:
+            # Not enough known tags: promote keywords the post keeps returning to. One-off words
+            # ("quarterly", "grew") make poor tags; returning fewer lets the LLM fallback run
+            for term, weight in sorted(weights.items(), key=lambda item: item[1], reverse=True):
+                if len(scores) >= count:
+                    break
+                if terms[term] >= 2 and len(term) > 3 and term not in scores:
+                    scores[term] = 0.5 * weight
+
+        engagement = self.engagement
+        baseline = (sum(mean * n for mean, n in engagement.values()) / sum(n for _, n in engagement.values())
+                    if engagement else 0.0)
+        ranked = sorted(scores, key=lambda key: scores[key] * self._engagement_factor(key, baseline), reverse=True)
+        return [self.display.get(key, f"#{key.capitalize()}") for key in ranked[:count]]
+
+    def learn(self, content: str, hashtags: List[str]) -> None:
+        """Add a published post to the history index"""
+        terms = set(tokenize(content))
+        self.docs += 1
+        self.df.update(terms)
+        for tag in hashtags:
+            key = tag_key(tag)
+            if not key:
+                continue
+            self.display.setdefault(key, tag if tag.startswith('#') else f"#{tag}")
+            for term in terms:
+                self.term_tags.setdefault(term, Counter())[key] += 1
+        self.save()
+
+    def save(self) -> None:
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({"docs": self.docs, "df": self.df, "term_tags": self.term_tags, "display": self.display}, f)
+        os.replace(tmp_path, self.path)
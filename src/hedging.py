@@ -0,0 +1,129 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from metrics import inc
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Below this many observations the configured initial delay is used instead of a percentile
+MIN_SAMPLES = 20
+
+
+class HedgePolicy:
+    """Sends a backup request once a call outlives a latency percentile, within a hedging budget"""
+
+    def __init__(self, percentile: float = 0.9, initial_delay: float = 2.0, budget: float = 0.1,
+                 window: int = 200):
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        # Each call earns `budget` hedges, so at most that fraction of calls is duplicated
+        self.budget = budget
+        self._tokens = 1.0
+        self.window = window
+        self._latencies: Dict[str, Deque[float]] = {}
+        self.calls = 0
+        self.fired = 0
+        self.won = 0
+        self.denied = 0
+
+    @classmethod
+    def from_env(cls) -> 'HedgePolicy':
+        """Build a policy from HF_HEDGE_* environment variables"""
+        return cls(
+            percentile=float(os.getenv('HF_HEDGE_PERCENTILE', '0.9')),
+            initial_delay=float(os.getenv('HF_HEDGE_DELAY', '2.0')),
+            budget=float(os.getenv('HF_HEDGE_BUDGET', '0.1'))
+        )
+
+    def observe(self, kind: str, seconds: float) -> None:
+        if kind not in self._latencies:
+            self._latencies[kind] = deque(maxlen=self.window)
+        self._latencies[kind].append(seconds)
+
+    def delay(self, kind: str) -> float:
+        """How long a `kind` call may run before it is hedged"""
+        samples = self._latencies.get(kind)
+        if not samples or len(samples) < MIN_SAMPLES:
+            return self.initial_delay
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(self.percentile * len(ordered)))]
+
+    def _allow(self) -> bool:
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    async def run(self, kind: str, primary: Callable[[], Awaitable[T]], backup: Callable[[], Awaitable[T]],
+                  discard: Optional[Callable[[T], Awaitable[None]]] = None) -> T:
+        """Await `primary`, racing `backup` against it if it is slow; the first success wins
+
+        `discard` releases a result that finished but lost the race (e.g. closes a stream).
+        """
+        self.calls += 1
+        self._tokens = min(1.0, self._tokens + self.budget)
+        started = time.perf_counter()
+        first = asyncio.ensure_future(primary())
+        delay = self.delay(kind)
+        try:
+            done, _ = await asyncio.wait({first}, timeout=delay)
+        except asyncio.CancelledError:
+            first.cancel()
+            await asyncio.gather(first, return_exceptions=True)
+            raise
+        if done:
+            result = first.result()
+            self.observe(kind, time.perf_counter() - started)
+            return result
+        if not self._allow():
+            self.denied += 1
+            inc("llm_hedges_total", outcome="denied")
+            result = await first
+            self.observe(kind, time.perf_counter() - started)
+            return result
+
+        self.fired += 1
+        inc("llm_hedges_total", outcome="fired")
+        logger.debug(f"Hedging {kind} call after {delay:.2f}s")
+        tasks = [first, asyncio.ensure_future(backup())]
+        winner = None
+        try:
+            winner = await self._first_success(tasks)
+        finally:
+            losers = [task for task in tasks if task is not winner]
+            for task in losers:
+                task.cancel()
+            for result in await asyncio.gather(*losers, return_exceptions=True):
+                # A loser may have finished just before it was cancelled
+                if discard and not isinstance(result, BaseException):
+                    await discard(result)
+
+        # A losing primary is recorded as of when it was abandoned: a lower bound that keeps the tail visible
+        self.observe(kind, time.perf_counter() - started)
+        if winner is first:
+            inc("llm_hedges_total", outcome="lost")
+        else:
+            self.won += 1
+            inc("llm_hedges_total", outcome="won")
+        return winner.result()
+
+    @staticmethod
+    async def _first_success(tasks):
+        """Wait for the first task to succeed, preferring the primary on a tie; raise the primary's error if all fail"""
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in tasks:
+                if task in done and not task.cancelled() and task.exception() is None:
+                    return task
+        raise tasks[0].exception()
+
+    def stats(self) -> Dict:
+        return {"calls": self.calls, "fired": self.fired, "won": self.won, "denied": self.denied,
+                "delays": {kind: round(self.delay(kind), 3) for kind in self._latencies}}
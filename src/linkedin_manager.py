@@ -1,74 +1,179 @@
 import os
 import json
-from typing import Dict, Optional, List
+import logging
+from typing import Dict, Optional, List, Iterable, AsyncIterator
+from urllib.parse import quote
+import asyncio
 import aiohttp
 from datetime import datetime
 from oauth_handler import OAuthHandler
+from rate_limiter import RateLimiter, parse_retry_after
+from resilience import NonRetryableError, get_backend
+from metrics import inc, span
+from concurrency import bounded_map
+
+logger = logging.getLogger(__name__)
+
+class LinkedInAPIError(Exception):
+    """Non-success response from the LinkedIn API"""
+
+    def __init__(self, status: int, body: str, retry_after: Optional[float] = None,
+                 retryable: Optional[bool] = None):
+        super().__init__(f"LinkedIn API error: {status} - {body}")
+        self.status = status
+        self.body = body
+        self.retry_after = retry_after
+        # None lets the resilience layer classify by status
+        self.retryable = retryable
+
+class AmbiguousWriteError(NonRetryableError):
+    """A write that must not be replayed failed without telling us whether it was applied"""
+
+
+def post_text(content: str, hashtags: Optional[List[str]] = None) -> str:
+    """The commentary text LinkedIn stores for a post: content followed by its hashtags"""
+    return content + "\n\n" + " ".join(hashtags) if hashtags else content
 
 class LinkedInManager:
-    def __init__(self, oauth_handler: OAuthHandler):
+    def __init__(self, oauth_handler: OAuthHandler, session: Optional[aiohttp.ClientSession] = None,
+                 rate_limiter: Optional[RateLimiter] = None, account: Optional[str] = None):
         self.oauth_handler = oauth_handler
-        self.base_url = "https://api.linkedin.com/v2"
+        self.account = account
+        # Overridable so benchmarks and tests can point at a local stand-in
+        self.base_url = os.getenv('LINKEDIN_API_BASE_URL', 'https://api.linkedin.com/v2').rstrip('/')
         self.user_info = None
-        
+
+        # Every call waits on a per-endpoint, per-member token bucket
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.resilience = get_backend("linkedin")
+
+        # Bulk analytics sweeps: parallel requests and URNs per batch-get call
+        self.analytics_concurrency = int(os.getenv('ANALYTICS_CONCURRENCY', '8'))
+        self.analytics_batch_size = int(os.getenv('ANALYTICS_BATCH_SIZE', '20'))
+        self._analytics_batch_supported = True
+
+        # One pooled, keep-alive session is shared by every request (and the OAuth handler)
+        self._session = session
+        self._owns_session = session is None
+        if session is not None:
+            oauth_handler.set_session(session)
+        self.pool_limit = int(os.getenv('LINKEDIN_POOL_LIMIT', '100'))
+        self.pool_limit_per_host = int(os.getenv('LINKEDIN_POOL_LIMIT_PER_HOST', '20'))
+        self.dns_cache_ttl = int(os.getenv('LINKEDIN_DNS_CACHE_TTL', '300'))
+        self.keepalive_timeout = float(os.getenv('LINKEDIN_KEEPALIVE_TIMEOUT', '60'))
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Return the shared HTTP session, creating the pooled connector on first use"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_limit,
+                limit_per_host=self.pool_limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._owns_session = True
+            self.oauth_handler.set_session(self._session)
+        return self._session
+
+    def set_session(self, session: aiohttp.ClientSession) -> None:
+        """Borrow a pooled session owned by someone else, e.g. another account's manager"""
+        self._session = session
+        self._owns_session = False
+        self.oauth_handler.set_session(session)
+
+    async def close(self) -> None:
+        """Close the shared HTTP session if this manager created it"""
+        if self._session is not None and self._owns_session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self) -> 'LinkedInManager':
+        await self.get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
     async def _get_headers(self) -> Dict[str, str]:
         """Get headers with valid access token"""
         token = await self.oauth_handler.get_valid_token()
         if not token:
-            raise Exception("No valid access token available")
+            raise NonRetryableError("No valid access token available")
         return {
             "Authorization": f"Bearer {token}",
             "Content-Type": "application/json",
             "X-Restli-Protocol-Version": "2.0.0"
         }
 
+    def _member_key(self) -> str:
+        """Identify the member whose quota a request counts against"""
+        return (self.user_info or {}).get("sub") or self.account or "me"
+
     async def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None, 
-                          params: Optional[Dict] = None, retries: int = 3) -> Dict:
-        """Make HTTP request to LinkedIn API with retry logic"""
-        async with aiohttp.ClientSession() as session:
-            while retries > 0:
-                try:
-                    headers = await self._get_headers()
-                    url = f"{self.base_url}/{endpoint}"
+                          params: Optional[Dict] = None, retries: int = 3, replay_safe: bool = True) -> Dict:
+        """Make HTTP request to LinkedIn API with backoff, retry classification and circuit breaking
+
+        With replay_safe=False, only failures the server certainly didn't act on (throttling,
+        auth, refused connections) are retried; anything else raises AmbiguousWriteError.
+        """
+        session = await self.get_session()
+        url = f"{self.base_url}/{endpoint}"
+        
+        async def attempt() -> Dict:
+            headers = await self._get_headers()
+            member = self._member_key()
+            await self.rate_limiter.acquire(endpoint, member)
+            
+            try:
+                async with session.request(method, url, headers=headers,
+                                           json=data, params=params) as response:
+                    inc("linkedin_responses_total", endpoint=self.rate_limiter.endpoint_key(endpoint),
+                        status=response.status)
+                    self.rate_limiter.update_from_response(endpoint, member, response.status, response.headers)
+                    response_text = await response.text()
                     
-                    async with session.request(method, url, headers=headers,
-                                            json=data, params=params) as response:
-                        if response.status == 401:
-                            # Token might be expired, try to refresh
-                            await self.oauth_handler.get_valid_token()
-                            retries -= 1
-                            continue
-                            
-                        response_text = await response.text()
+                    if response.status == 401:
+                        # Token was rejected; drop it so the retry refreshes once
+                        self.oauth_handler.invalidate_token(headers["Authorization"].split(" ", 1)[1])
+                        raise LinkedInAPIError(response.status, response_text, retryable=True)
                         
-                        if response.status not in [200, 201]:
-                            raise Exception(f"LinkedIn API error: {response.status} - {response_text}")
-                            
-                        return json.loads(response_text) if response_text else {}
+                    if response.status not in [200, 201]:
+                        raise LinkedInAPIError(
+                            response.status, response_text,
+                            retry_after=parse_retry_after(response.headers.get("Retry-After"))
+                        )
                         
-                except Exception as e:
-                    if retries <= 1:
-                        raise Exception(f"Failed after {3-retries} retries: {str(e)}")
-                    retries -= 1
-                    
-            raise Exception("Maximum retries exceeded")
+                    return json.loads(response_text) if response_text else {}
+            except aiohttp.ClientConnectorError:
+                # Never reached the server
+                raise
+            except (asyncio.TimeoutError, aiohttp.ClientError, LinkedInAPIError) as e:
+                if replay_safe or (isinstance(e, LinkedInAPIError) and e.status < 500):
+                    raise
+                raise AmbiguousWriteError(f"{method} {endpoint} may or may not have been applied: {e}") from e
+                
+        with span("linkedin_request", method=method, endpoint=self.rate_limiter.endpoint_key(endpoint)):
+            return await self.resilience.call(attempt, max_attempts=retries)
 
     async def get_user_profile(self) -> Dict:
         """Get current user's profile information"""
         if not self.user_info:
-            self.user_info = await self._make_request(
-                "GET",
-                "userinfo"
-            )
+            with span("profile_fetch"):
+                self.user_info = await self._make_request(
+                    "GET",
+                    "userinfo"
+                )
         return self.user_info
 
-    async def create_post(self, content: str, hashtags: Optional[List[str]] = None) -> Dict:
-        """Create a new post on LinkedIn"""
+    async def create_post(self, content: str, hashtags: Optional[List[str]] = None,
+                          replay_safe: bool = True) -> Dict:
+        """Create a new post on LinkedIn; replay_safe=False never retries a POST that may have landed"""
         try:
             # Get user profile
             try:
                 user_info = await self.get_user_profile()
-                print(f"Generated post for user: {user_info}")
+                logger.debug(f"Creating post for user {user_info.get('sub')}")
             except Exception as e:
                 raise Exception(f"Failed to fetch user profile: {str(e)}")
 
@@ -82,12 +187,10 @@ class LinkedInManager:
                 raise ValueError("Post content cannot be empty")
 
             # Combine content with hashtags
-            full_content = content
-            if hashtags:
-                try:
-                    full_content += "\n\n" + " ".join(hashtags)
-                except Exception as e:
-                    raise Exception(f"Error formatting hashtags: {str(e)}")
+            try:
+                full_content = post_text(content, hashtags)
+            except Exception as e:
+                raise Exception(f"Error formatting hashtags: {str(e)}")
 
             # Prepare post data
             post_data = {
@@ -107,8 +210,10 @@ class LinkedInManager:
             }
 
             # Make the API request to create the post
-            return await self._make_request("POST", "ugcPosts", data=post_data)
+            return await self._make_request("POST", "ugcPosts", data=post_data, replay_safe=replay_safe)
 
+        except AmbiguousWriteError:
+            raise
         except ValueError as ve:
             # Handle validation errors
             raise ValueError(f"Validation error: {str(ve)}")
@@ -120,15 +225,13 @@ class LinkedInManager:
                           hashtags: Optional[List[str]] = None) -> Dict:
         """Schedule a post for future publication"""
         user_info = await self.get_user_profile()
-        user_id = user_info.get("id")
+        user_id = user_info.get("sub")
         
         if not user_id:
             raise Exception("Could not determine user ID")
             
         # Combine content with hashtags
-        full_content = content
-        if hashtags:
-            full_content += "\n\n" + " ".join(hashtags)
+        full_content = post_text(content, hashtags)
 
         post_data = {
             "author": f"urn:li:person:{user_id}",
@@ -149,6 +252,31 @@ class LinkedInManager:
 
         return await self._make_request("POST", "ugcPosts", data=post_data)
 
+    async def find_post(self, content: str, hashtags: Optional[List[str]] = None,
+                        count: int = 20) -> Optional[Dict]:
+        """Find one of our recent posts with exactly this text, e.g. to settle an ambiguous publish
+
+        Reading posts needs the r_member_social scope, which LinkedIn grants only to approved
+        apps; without it this raises, and the caller must treat the outcome as unknown.
+        """
+        user_info = await self.get_user_profile()
+        author = quote(f"urn:li:person:{user_info.get('sub')}", safe="")
+        try:
+            response = await self._make_request(
+                "GET", f"ugcPosts?q=authors&authors=List({author})&sortBy=LAST_MODIFIED&count={count}"
+            )
+        except LinkedInAPIError as e:
+            if e.status == 403:
+                raise LinkedInAPIError(403, "reading recent posts needs the r_member_social scope "
+                                            "(see LINKEDIN_SCOPES)", retryable=False) from e
+            raise
+        text = post_text(content, hashtags)
+        for element in response.get("elements", []):
+            share = element.get("specificContent", {}).get("com.linkedin.ugc.ShareContent", {})
+            if share.get("shareCommentary", {}).get("text") == text:
+                return element
+        return None
+
     async def get_post_analytics(self, post_id: str) -> Dict:
         """Get analytics for a specific post"""
         try:
@@ -159,36 +287,89 @@ class LinkedInManager:
             )
             return analytics.get("totalShareStatistics", {})
         except Exception as e:
-            print(f"Error fetching analytics for post {post_id}: {e}")
+            logger.error(f"Error fetching analytics for post {post_id}: {e}")
             return {}
 
+    async def _fetch_analytics_chunk(self, post_ids: List[str]) -> List[Dict]:
+        """Fetch one chunk with a batch get, falling back to single gets if unsupported"""
+        if self._analytics_batch_supported and len(post_ids) > 1:
+            # Rest.li batch get: URNs are encoded, the List(...) syntax is not
+            ids = ",".join(quote(post_id, safe="") for post_id in post_ids)
+            try:
+                response = await self._make_request(
+                    "GET", f"socialMetrics?ids=List({ids})&fields=totalShareStatistics"
+                )
+            except LinkedInAPIError as e:
+                if e.status not in (400, 404, 405, 501):
+                    return [{"post_id": post_id, "stats": None, "error": str(e)} for post_id in post_ids]
+                self._analytics_batch_supported = False
+            except Exception as e:
+                return [{"post_id": post_id, "stats": None, "error": str(e)} for post_id in post_ids]
+            else:
+                results = response.get("results", {})
+                errors = response.get("errors", {})
+                return [
+                    {"post_id": post_id,
+                     "stats": results[post_id].get("totalShareStatistics", {}) if post_id in results else None,
+                     "error": None if post_id in results else str(errors.get(post_id, "missing from batch response"))}
+                    for post_id in post_ids
+                ]
+
+        entries = []
+        for post_id in post_ids:
+            try:
+                analytics = await self._make_request(
+                    "GET",
+                    f"socialMetrics/{post_id}",
+                    params={"fields": "totalShareStatistics"}
+                )
+                entries.append({"post_id": post_id, "stats": analytics.get("totalShareStatistics", {}), "error": None})
+            except Exception as e:
+                entries.append({"post_id": post_id, "stats": None, "error": str(e)})
+        return entries
+
+    async def stream_post_analytics(self, post_ids: Iterable[str], concurrency: Optional[int] = None,
+                                    batch_size: Optional[int] = None) -> AsyncIterator[Dict]:
+        """Fetch analytics for many posts concurrently, yielding {"post_id", "stats", "error"} as they arrive"""
+        size = max(1, batch_size or self.analytics_batch_size)
+        ids = list(post_ids)
+        chunks = [ids[i:i + size] for i in range(0, len(ids), size)]
+        limit = concurrency or self.analytics_concurrency
+        async for entries in bounded_map(self._fetch_analytics_chunk, chunks, limit):
+            for entry in entries:
+                yield entry
+
+    async def get_posts_analytics(self, post_ids: Iterable[str], concurrency: Optional[int] = None) -> Dict[str, Dict]:
+        """Collect analytics for many posts, keyed by post id, with per-post errors"""
+        return {entry["post_id"]: entry async for entry in self.stream_post_analytics(post_ids, concurrency)}
+
     async def delete_post(self, post_id: str) -> bool:
         """Delete a LinkedIn post"""
         try:
             await self._make_request("DELETE", f"ugcPosts/{post_id}")
             return True
         except Exception as e:
-            print(f"Error deleting post {post_id}: {e}")
+            logger.error(f"Error deleting post {post_id}: {e}")
             return False
 
 # Example usage
 async def main():
     oauth_handler = OAuthHandler()
-    linkedin = LinkedInManager(oauth_handler)
     
-    try:
-        profile = await linkedin.get_user_profile()
-        print(f"Connected as: {profile.get('localizedFirstName')} {profile.get('localizedLastName')}")
-        
-        # Example post
-        post = await linkedin.create_post(
-            "Testing the LinkedIn API integration! #LinkedInAPI #Testing",
-            hashtags=["#Python", "#Development"]
-        )
-        print(f"Post created successfully: {post}")
-        
-    except Exception as e:
-        print(f"Error: {e}")
+    async with LinkedInManager(oauth_handler) as linkedin:
+        try:
+            profile = await linkedin.get_user_profile()
+            print(f"Connected as: {profile.get('localizedFirstName')} {profile.get('localizedLastName')}")
+            
+            # Example post
+            post = await linkedin.create_post(
+                "Testing the LinkedIn API integration! #LinkedInAPI #Testing",
+                hashtags=["#Python", "#Development"]
+            )
+            print(f"Post created successfully: {post}")
+            
+        except Exception as e:
+            print(f"Error: {e}")
 
 if __name__ == "__main__":
     import asyncio
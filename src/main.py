@@ -1,29 +1,41 @@
 import os
 import asyncio
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
 import logging
+from logging.handlers import RotatingFileHandler
+from contextlib import nullcontext
 from pathlib import Path
 
 from oauth_handler import OAuthHandler
 from content_generator import ContentGenerator
 from linkedin_manager import LinkedInManager
+from metrics import span, export_metrics
 
-# Configure logging with more verbose output
+# LOG_LEVEL may come from .env, so load it before configuring logging
+load_dotenv(dotenv_path=Path('.env'))
+
+# Configure logging; set LOG_LEVEL=DEBUG for per-stage span timings
 logging.basicConfig(
-    level=logging.DEBUG,  # Set to DEBUG for more verbose output
+    level=getattr(logging, os.getenv('LOG_LEVEL', 'INFO').upper(), logging.INFO),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
         logging.StreamHandler(),
-        logging.FileHandler('linkedin_poster.log', mode='w')  # 'w' mode to start fresh
+        # Appends across runs, rotating so a long-lived daemon's log stays bounded
+        RotatingFileHandler('linkedin_poster.log', mode='a',
+                            maxBytes=int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024))),
+                            backupCount=int(os.getenv('LOG_BACKUP_COUNT', '5')))
     ]
 )
 logger = logging.getLogger(__name__)
 logger.debug("Logging initialized")  # Verify logging is working
 
 class LinkedInPostAutomation:
-    def __init__(self):
+    def __init__(self, oauth_handler: Optional[OAuthHandler] = None,
+                 content_generator: Optional[ContentGenerator] = None,
+                 linkedin_manager: Optional[LinkedInManager] = None, analytics_store=None, dedup_index=None,
+                 outbox=None, content_buffer=None):
         # Load environment variables
         env_path = Path('.env')
         load_dotenv(dotenv_path=env_path)
@@ -32,14 +44,142 @@ class LinkedInPostAutomation:
         logger.info("Environment variables loaded")
         logger.info(f"GEMINI_API_KEY present: {bool(os.getenv('GEMINI_API_KEY'))}")
         
-        # Initialize components
-        self.oauth_handler = OAuthHandler()
-        self.content_generator = ContentGenerator()
-        self.linkedin_manager = LinkedInManager(self.oauth_handler)
-        
+        # Initialize components; multi-account mode passes in per-account handlers and a shared generator
+        self.oauth_handler = oauth_handler or OAuthHandler()
+        self.content_generator = content_generator or ContentGenerator()
+        self.linkedin_manager = linkedin_manager or LinkedInManager(self.oauth_handler)
+        self._analytics_store = analytics_store
+        self._dedup_index = dedup_index
+        self._outbox = outbox
+        # Optional ContentBuffer of pre-generated posts; publish slots take from it before generating
+        self.content_buffer = content_buffer
+        self._publisher = None
+        # Outbox entries are kept per account; single-account runs use ''
+        self.account = self.oauth_handler.account or ''
+        self.max_regenerations = int(os.getenv('DEDUP_MAX_REGENERATIONS', '2'))
+
+    @property
+    def analytics_store(self):
+        """Local analytics history, opened on first use to keep numpy off the startup path"""
+        if self._analytics_store is None:
+            from analytics_store import AnalyticsStore
+            self._analytics_store = AnalyticsStore()
+        return self._analytics_store
+
+    @property
+    def dedup_index(self):
+        """Near-duplicate index over generated and published posts, opened on first use"""
+        if self._dedup_index is None:
+            from dedup_index import DedupIndex
+            self._dedup_index = DedupIndex()
+        return self._dedup_index
+
+    @property
+    def outbox(self):
+        """Write-ahead log of generated posts awaiting publication, opened on first use"""
+        if self._outbox is None:
+            from outbox import Outbox
+            self._outbox = Outbox()
+        return self._outbox
+
+    @property
+    def publisher(self):
+        """Drains this account's outbox entries to LinkedIn"""
+        if self._publisher is None:
+            from outbox import OutboxPublisher
+            self._publisher = OutboxPublisher(self.outbox, self, account=self.account)
+        return self._publisher
+
+    async def ensure_unique(self, post: Dict) -> Optional[Dict]:
+        """Regenerate a post that nearly duplicates earlier content; None if it stays a duplicate"""
+        for attempt in range(self.max_regenerations + 1):
+            # A retried post carries its document id and must not count as its own duplicate
+            match = self.dedup_index.find_duplicate(post['content'], exclude=post.get('dedup_id'))
+            if match is None:
+                if post.get('dedup_id') is None:
+                    post['dedup_id'] = self.dedup_index.add(post['content'], topic=post.get('topic'))
+                return post
+            logger.info(f"Post for topic '{post.get('topic')}' is {match[1]:.0%} similar to "
+                        f"indexed post {match[0]}")
+            if post.get('dedup_id') is not None:
+                # This text will not be published now, so it must not block other posts
+                self.dedup_index.discard(post['dedup_id'])
+            if attempt == self.max_regenerations or not post.get('topic'):
+                break
+            post = await self.content_generator.regenerate(post['topic'])
+        logger.warning(f"Skipping near-duplicate post for topic '{post.get('topic')}'")
+        return None
+
+    def record_published(self, result: Dict, topic: str, content: Optional[str] = None,
+                         hashtags: Optional[List[str]] = None) -> None:
+        """Remember a published post's topic and hashtags so its analytics can be attributed later"""
+        post_id = result.get("id") if result else None
+        if post_id:
+            self.analytics_store.register_post(post_id, topic, hashtags=hashtags)
+        if content and hashtags:
+            self.content_generator.hashtag_engine.learn(content, hashtags)
+
+    async def dispatch_scheduled(self, store=None) -> int:
+        """Publish queued posts that have fallen due; returns how many were attempted"""
+        from schedule_store import ScheduleStore, ScheduleDispatcher
+        owned = store is None
+        if owned:
+            path = os.getenv('SCHEDULE_DB_PATH', '.schedule.db')
+            if not os.path.exists(path):
+                return 0
+            store = ScheduleStore(path)
+        try:
+            dispatcher = ScheduleDispatcher(store, self)
+            dispatcher.load()
+            attempted = await dispatcher.dispatch_due()
+            next_due = store.next_due()
+            if next_due is not None:
+                logger.info(f"Next queued post is due {datetime.fromtimestamp(next_due)}; "
+                            f"a later run, --dispatch or --daemon publishes it")
+            return attempted
+        finally:
+            if owned:
+                store.close()
+
+    async def collect_analytics(self, since_days: Optional[float] = None) -> int:
+        """Sweep analytics for recorded posts into the local store; returns samples stored"""
+        since = datetime.now().timestamp() - since_days * 86400 if since_days else None
+        post_ids = self.analytics_store.post_ids(since)
+        samples = []
+        failed = 0
+        async for entry in self.linkedin_manager.stream_post_analytics(post_ids):
+            if entry["error"]:
+                failed += 1
+                logger.warning(f"Analytics unavailable for {entry['post_id']}: {entry['error']}")
+            else:
+                samples.append((entry["post_id"], entry["stats"]))
+        stored = self.analytics_store.append(samples)
+        logger.info(f"Stored analytics for {stored} posts ({failed} failed)")
+        return stored
+
+    async def close(self) -> None:
+        """Shut down the token refresher, pooled HTTP sessions and generator resources"""
+        await self.oauth_handler.stop_background_refresh()
+        await self.linkedin_manager.close()
+        await self.content_generator.close()
+        if self._outbox is not None:
+            self._outbox.close()
+
+    async def __aenter__(self) -> 'LinkedInPostAutomation':
+        await self.linkedin_manager.get_session()
+        # Refreshes due soon overlap with content generation instead of delaying a post
+        self.oauth_handler.start_background_refresh()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
     async def initialize(self) -> bool:
         """Initialize the automation system"""
         try:
+            # Open the shared session first so token requests reuse it
+            await self.linkedin_manager.get_session()
+
             # Verify OAuth token
             token = await self.oauth_handler.get_valid_token()
             if not token:
@@ -56,32 +196,41 @@ class LinkedInPostAutomation:
             logger.error(f"Initialization error: {e}")
             return False
 
-    async def create_and_post_content(self, topics: List[str], schedule_time: Optional[datetime] = None) -> None:
-        """Generate and post content for given topics"""
+    async def create_and_post_content(self, topics: List[str], schedule_time: Optional[datetime] = None) -> int:
+        """Generate and post content for given topics, returning how many were posted
+
+        Immediate posts go through the outbox first, so generated content survives a crash
+        and the drain also publishes anything an earlier run left unfinished.
+        """
+        posted = 0
+        buffer = self.content_buffer
         try:
-            # Generate content for all topics
-            posts = await self.content_generator.create_content_batch(topics)
+            # Take pre-generated posts where the buffer has them and generate the rest live
+            with span("content_generation"):
+                async with buffer.publishing() if buffer else nullcontext():
+                    posts, missing = buffer.take(topics) if buffer else ([], topics)
+                    if missing:
+                        posts += await self.content_generator.create_content_batch(missing)
 
             for post in posts:
                 try:
                     logger.info(f"Processing post for topic: {post['topic']}")
+                    with span("dedup_check"):
+                        post = await self.ensure_unique(post)
+                    if post is None:
+                        continue
 
                     if schedule_time:
-                        result = await self.linkedin_manager.schedule_post(
+                        await self.linkedin_manager.schedule_post(
                             content=post['content'],
                             schedule_time=schedule_time,
                             hashtags=post['hashtags']
                         )
                         logger.info(f"Post scheduled for {schedule_time}")
+                        self.dedup_index.mark_published(post['dedup_id'])
+                        posted += 1
                     else:
-                        result = await self.linkedin_manager.create_post(
-                            content=post['content'],
-                            hashtags=post['hashtags']
-                        )
-                        logger.info("Post published successfully")
-                        
-                    # Wait briefly between posts to avoid rate limiting
-                    await asyncio.sleep(2)
+                        self.outbox.add(post, account=self.account)
                     
                 except Exception as e:
                     logger.error(f"Error posting content for topic '{post['topic']}': {e}")
@@ -89,24 +238,111 @@ class LinkedInPostAutomation:
         except Exception as e:
             logger.error(f"Error in content creation and posting: {e}")
 
+        if not schedule_time:
+            try:
+                posted += await self.publisher.drain()
+            except Exception as e:
+                logger.error(f"Error publishing from the outbox: {e}")
+        return posted
+
+QUEUED_NOTICE = ("Queued posts live in the local schedule store (SCHEDULE_DB_PATH) and are published by the "
+                 "first plain run, --dispatch or --daemon at or after their time; keep that file between runs")
+
 # CLI Interface
 def cli():
     """Command line interface for the automation tool"""
     import argparse
     from datetime import datetime, timedelta
-    import random
     import os
     
     parser = argparse.ArgumentParser(description='LinkedIn Post Automation Tool')
-    parser.add_argument('--schedule', type=str, help='Schedule time (YYYY-MM-DD HH:MM)')
+    parser.add_argument('--schedule', type=str,
+                        help='Queue the selected topic in the local schedule store for this time (YYYY-MM-DD HH:MM)')
+    parser.add_argument('--enqueue-file', type=str,
+                        help='Bulk enqueue posts from a JSON-lines file of {"publish_at", "topic" | "content", "hashtags"}')
+    parser.add_argument('--dispatch', action='store_true',
+                        help='Publish every queued post that is due, then exit')
+    parser.add_argument('--collect-analytics', action='store_true',
+                        help='Fetch analytics for recorded posts into the local analytics store')
+    parser.add_argument('--since-days', type=float,
+                        help='Only collect analytics for posts published in the last N days')
+    parser.add_argument('--analytics-report', action='store_true',
+                        help='Print per-topic engagement from the local analytics store')
+    parser.add_argument('--daemon', action='store_true',
+                        help='Stay running and post on an internal schedule')
+    parser.add_argument('--interval', type=float,
+                        help='Seconds between posts in daemon mode (default: POST_INTERVAL or 300)')
+    parser.add_argument('--health-port', type=int,
+                        help='Port for the daemon health endpoint, 0 to disable (default: HEALTH_PORT or 8080)')
+    parser.add_argument('--drain-outbox', action='store_true',
+                        help='Publish posts left in the outbox by earlier runs, then exit')
+    parser.add_argument('--accounts', nargs='?', const='', metavar='FILE',
+                        help='Post once for every account in FILE (default: ACCOUNTS_FILE or accounts.json) concurrently')
+    parser.add_argument('--preview', nargs='?', const='', metavar='TOPIC',
+                        help='Stream a draft for TOPIC (or a random library topic) to the terminal without posting')
     
     args = parser.parse_args()
     
-    # Always read from topics.txt in the current directory
-    all_topics = []
+    if args.collect_analytics:
+        async def collect():
+            async with LinkedInPostAutomation() as automation:
+                await automation.collect_analytics(args.since_days)
+        asyncio.run(collect())
+        export_metrics()
+        return
+    
+    if args.drain_outbox:
+        async def drain():
+            async with LinkedInPostAutomation() as automation:
+                published = await automation.publisher.drain()
+                print(f"Published {published} outbox posts; outbox: {automation.outbox.counts()}")
+        asyncio.run(drain())
+        export_metrics()
+        return
+    
+    if args.analytics_report:
+        import numpy as np
+        from analytics_store import AnalyticsStore
+        store = AnalyticsStore()
+        ranking = sorted(store.topic_mean_engagement().items(), key=lambda item: item[1], reverse=True)
+        if not ranking:
+            print("No analytics collected yet; run with --collect-analytics first")
+            return
+        print("Mean engagement by topic:")
+        for topic, engagement in ranking:
+            print(f"  {engagement:8.4f}  {topic}")
+        hourly = store.hour_of_day_histogram()
+        if not np.isnan(hourly).all():
+            print(f"Best publishing hour (UTC): {int(np.nanargmax(hourly)):02d}:00")
+        return
+    
+    if args.enqueue_file or args.dispatch:
+        from schedule_store import ScheduleStore
+        store = ScheduleStore()
+        if args.enqueue_file:
+            try:
+                ids = store.enqueue_file(args.enqueue_file)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Error enqueuing posts: {e}")
+                return
+            print(f"Queued {len(ids)} posts from {args.enqueue_file}")
+            if not args.dispatch:
+                print(QUEUED_NOTICE)
+        if args.dispatch:
+            async def dispatch():
+                async with LinkedInPostAutomation() as automation:
+                    published = await automation.dispatch_scheduled(store)
+                    print(f"Dispatched {published} due posts; queue: {store.counts()}")
+            asyncio.run(dispatch())
+            export_metrics()
+        store.close()
+        return
+    
+    # Always read from topics.txt in the current directory; topics are indexed
+    # once and then read on demand, so large libraries stay cheap per run
+    from topic_scheduler import TopicLibrary, TopicScheduler
     try:
-        with open('topics.txt', 'r') as f:
-            all_topics = [line.strip() for line in f if line.strip()]
+        scheduler = TopicScheduler(TopicLibrary('topics.txt'))
     except FileNotFoundError:
         print("Error: topics.txt not found in current directory")
         return
@@ -114,13 +350,77 @@ def cli():
         print(f"Error reading topics.txt: {e}")
         return
         
-    # Select one random topic
-    if all_topics:
-        topics = [random.choice(all_topics)]
-        print(f"Selected topic: {topics[0]}")
-    else:
+    if not len(scheduler.library):
         print("Error: No topics found")
         return
+        
+    if args.preview is not None:
+        # Previews sample without recording a choice, so they don't start a topic's cooldown
+        topic = args.preview or scheduler.library.sample(1, scheduler.rng)[0]
+        print(f"Previewing topic: {topic}\n")
+
+        async def preview():
+            load_dotenv(dotenv_path=Path('.env'))
+            generator = ContentGenerator()
+            try:
+                async for chunk in generator.preview_post(topic):
+                    print(chunk, end='', flush=True)
+                print()
+            finally:
+                await generator.close()
+
+        asyncio.run(preview())
+        return
+    
+    if args.accounts is not None:
+        from multi_account import AccountFanout, load_accounts
+        try:
+            accounts = load_accounts(args.accounts or None)
+        except (OSError, ValueError) as e:
+            print(f"Error reading accounts: {e}")
+            return
+        # Accounts with their own topics file get their own scheduler; the rest share topics.txt
+        schedulers = {account["name"]: TopicScheduler(TopicLibrary(account["topics"]), scheduler.history)
+                      if account.get("topics") else scheduler for account in accounts}
+
+        if os.path.exists(os.getenv('SCHEDULE_DB_PATH', '.schedule.db')):
+            logger.warning("Multi-account runs don't dispatch the schedule store; "
+                           "run with --dispatch or --daemon to publish queued posts")
+
+        async def fan_out():
+            async with AccountFanout(accounts) as fanout:
+                published = await fanout.run_once(lambda name: schedulers[name].pick())
+            for name, count in published.items():
+                print(f"{name}: {count} posts published")
+
+        asyncio.run(fan_out())
+        export_metrics()
+        return
+    
+    # Pre-generated posts for topics.txt; publish slots take from it instead of waiting on the model.
+    # Only the daemon refills it: a one-shot run would pay for posts it may never publish
+    buffer = None
+    if os.getenv('CONTENT_BUFFER', 'true').lower() == 'true':
+        from content_buffer import ContentBuffer
+        buffer = ContentBuffer(scheduler, pool='topics.txt')
+    
+    if args.daemon:
+        from daemon import PostingDaemon
+        from schedule_store import ScheduleStore
+        daemon = PostingDaemon(
+            LinkedInPostAutomation,
+            buffer.pick if buffer else scheduler.pick,
+            interval=args.interval,
+            health_port=args.health_port,
+            schedule_store=ScheduleStore(),
+            content_buffer=buffer
+        )
+        asyncio.run(daemon.run())
+        return
+    
+    # Select one topic, weighted by past engagement and skipping recent ones; buffered topics come first
+    topics = buffer.pick() if buffer and not args.schedule else scheduler.pick()
+    print(f"Selected topic: {topics[0]}")
     
     # Parse schedule time if provided
     schedule_time = None
@@ -130,9 +430,25 @@ def cli():
         except ValueError as e:
             print(f"Error parsing schedule time: {e}")
             return
+        
+        # Scheduled posts go to the durable local queue; any later run publishes them once due
+        from schedule_store import ScheduleStore
+        store = ScheduleStore()
+        entry_id = store.enqueue(schedule_time, topic=topics[0])
+        store.close()
+        print(f"Queued post {entry_id} for {schedule_time}")
+        print(QUEUED_NOTICE)
+        return
     
-    # Run the automation
-    asyncio.run(LinkedInPostAutomation().create_and_post_content(topics, schedule_time))
+    # Run the automation over a single pooled session
+    async def run():
+        async with LinkedInPostAutomation(content_buffer=buffer) as automation:
+            await automation.create_and_post_content(topics)
+            # Plain runs (e.g. the cron workflow) also publish whatever --schedule queued
+            await automation.dispatch_scheduled()
+
+    asyncio.run(run())
+    export_metrics()
 
 if __name__ == "__main__":
     cli()
\ No newline at end of file
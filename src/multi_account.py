@@ -0,0 +1,132 @@
+import os
+import json
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional
+
+from oauth_handler import OAuthHandler
+from content_generator import ContentGenerator
+from linkedin_manager import LinkedInManager
+from rate_limiter import RateLimiter
+from token_vault import TokenVault
+from main import LinkedInPostAutomation
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+
+def load_accounts(path: Optional[str] = None) -> List[Dict]:
+    """Read account definitions from a JSON list of {"name", "username", "password", "topics"}
+
+    String values written as "$VAR" are read from the environment, so credentials
+    can stay out of the file.
+    """
+    path = path or os.getenv('ACCOUNTS_FILE', 'accounts.json')
+    with open(path, 'r') as f:
+        entries = json.load(f)
+    if not isinstance(entries, list):
+        raise ValueError(f"{path} must contain a JSON list of accounts")
+
+    accounts = []
+    names = set()
+    for entry in entries:
+        name = str(entry.get("name", "")).strip()
+        if not name:
+            raise ValueError("Every account needs a 'name'")
+        if name in names:
+            raise ValueError(f"Duplicate account name '{name}'")
+        names.add(name)
+        account = {}
+        for key, value in entry.items():
+            if isinstance(value, str) and value.startswith('$'):
+                value = os.getenv(value[1:])
+            account[key] = value
+        account["name"] = name
+        accounts.append(account)
+    return accounts
+
+
+class AccountFanout:
+    """Posts for many accounts concurrently over one pooled session, one generator and one token vault"""
+
+    def __init__(self, accounts: List[Dict], vault: Optional[TokenVault] = None,
+                 concurrency: Optional[int] = None):
+        self.vault = vault or TokenVault()
+        self.concurrency = concurrency or int(os.getenv('ACCOUNT_CONCURRENCY', '8'))
+        # Buckets are keyed per member, so each account is throttled independently
+        self.rate_limiter = RateLimiter()
+        self.content_generator = ContentGenerator()
+        self.automations: Dict[str, LinkedInPostAutomation] = {}
+
+        primary = None
+        for account in accounts:
+            name = account["name"]
+            oauth_handler = OAuthHandler(account=name, vault=self.vault,
+                                         username=account.get("username"), password=account.get("password"))
+            # The first account's manager opens the pooled session; the others borrow it
+            linkedin_manager = LinkedInManager(oauth_handler, rate_limiter=self.rate_limiter, account=name)
+            if primary is None:
+                automation = primary = LinkedInPostAutomation(oauth_handler, self.content_generator,
+                                                              linkedin_manager)
+            else:
+                # One set of local indexes, so concurrent accounts don't each rewrite the same files
+                automation = LinkedInPostAutomation(oauth_handler, self.content_generator, linkedin_manager,
+                                                    analytics_store=primary.analytics_store,
+                                                    dedup_index=primary.dedup_index,
+                                                    outbox=primary.outbox)
+            self.automations[name] = automation
+        self._primary = primary
+
+    async def __aenter__(self) -> 'AccountFanout':
+        if self._primary is not None:
+            session = await self._primary.linkedin_manager.get_session()
+            for automation in self.automations.values():
+                if automation is not self._primary:
+                    automation.linkedin_manager.set_session(session)
+        for automation in self.automations.values():
+            automation.oauth_handler.start_background_refresh()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Stop every account's refresher, then close the shared session, generator and vault"""
+        for automation in self.automations.values():
+            await automation.oauth_handler.stop_background_refresh()
+        if self._primary is not None:
+            await self._primary.linkedin_manager.close()
+            self._primary.outbox.close()
+        await self.content_generator.close()
+        self.vault.close()
+
+    async def initialize(self) -> Dict[str, bool]:
+        """Load or obtain every account's token and fetch its profile; browser logins still run one at a time"""
+        names = list(self.automations)
+        results = await asyncio.gather(*(self.automations[name].initialize() for name in names))
+        return dict(zip(names, results))
+
+    async def run_once(self, pick_topics: Callable[[str], List[str]]) -> Dict[str, int]:
+        """Post for every account concurrently; returns posts published per account"""
+        semaphore = asyncio.Semaphore(max(1, self.concurrency))
+
+        async def post_for(name: str, automation: LinkedInPostAutomation) -> int:
+            async with semaphore:
+                topics = pick_topics(name)
+                if not topics:
+                    logger.warning(f"No topics available for account {name}")
+                    return 0
+                logger.info(f"Account {name}: posting {topics}")
+                with span("account_post"):
+                    return await automation.create_and_post_content(topics)
+
+        names = list(self.automations)
+        results = await asyncio.gather(*(post_for(name, self.automations[name]) for name in names),
+                                       return_exceptions=True)
+        published = {}
+        for name, result in zip(names, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Posting for account {name} failed: {result}")
+                result = 0
+            published[name] = result
+        return published
@@ -1,32 +1,55 @@
 import os
 import json
 import asyncio
-from typing import Optional, Dict
-from fastapi import FastAPI, HTTPException
+from typing import Optional, Dict, AsyncIterator
+from contextlib import asynccontextmanager
 from cryptography.fernet import Fernet
-import uvicorn
 import aiohttp
 from datetime import datetime, timedelta
-import base64
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+import logging
 from urllib.parse import urlparse, parse_qs
 
+from metrics import span
+from token_vault import TokenVault, load_encryption_key
+
+logger = logging.getLogger(__name__)
+
+# The browser (selenium) and callback server (fastapi/uvicorn) stacks are only
+# imported when authorization is actually needed, keeping cold starts fast
+
+# One browser login or callback server at a time, however many accounts need one
+_authorization_lock = asyncio.Lock()
+
 class OAuthHandler:
-    def __init__(self):
+    def __init__(self, account: Optional[str] = None, vault: Optional[TokenVault] = None,
+                 username: Optional[str] = None, password: Optional[str] = None):
         self.client_id = os.getenv('LINKEDIN_CLIENT_ID')
         self.client_secret = os.getenv('LINKEDIN_CLIENT_SECRET')
-        self.linkedin_username = os.getenv('LINKEDIN_USERNAME')
-        self.linkedin_password = os.getenv('LINKEDIN_PASSWORD')
+        self.linkedin_username = username or os.getenv('LINKEDIN_USERNAME')
+        self.linkedin_password = password or os.getenv('LINKEDIN_PASSWORD')
         self.redirect_uri = os.getenv('REDIRECT_URI', 'http://localhost:8000/callback')
+        self.oauth_base_url = os.getenv('LINKEDIN_OAUTH_BASE_URL', 'https://www.linkedin.com/oauth/v2').rstrip('/')
+        # Add r_member_social (if LinkedIn has approved the app for it) so ambiguous publishes can be verified
+        self.scope = os.getenv('LINKEDIN_SCOPES', 'openid profile w_member_social email')
+        # Multi-account mode keeps each account's tokens in the shared vault instead of the single-account file
+        self.account = account
+        self.vault = vault
         self.token_file = '.linkedin_tokens.enc'
+        self.session: Optional[aiohttp.ClientSession] = None
+
+        # Decrypted tokens are memoized; the lock makes refresh/authorization single-flight
+        self._token_data: Optional[Dict] = None
+        self._invalidated_token: Optional[str] = None
+        self._token_lock = asyncio.Lock()
+        self.expiry_margin = timedelta(seconds=int(os.getenv('TOKEN_EXPIRY_MARGIN', '300')))
+
+        # Background refresh renews the token this long before it expires
+        self.refresh_margin = timedelta(seconds=int(os.getenv('TOKEN_REFRESH_MARGIN', '3600')))
+        self.refresh_retry_interval = int(os.getenv('TOKEN_REFRESH_RETRY_INTERVAL', '60'))
+        self._refresh_task: Optional[asyncio.Task] = None
         
         # Validate required environment variables
-        print("Checking environment variables...")
+        logger.debug("Checking environment variables...")
         missing_vars = []
         invalid_vars = []
         
@@ -38,33 +61,32 @@ class OAuthHandler:
                 invalid_vars.append(var)
                 # Strip whitespace and update environment variable
                 os.environ[var] = value.strip()
-                print(f"Fixed whitespace in {var}")
+                logger.info(f"Fixed whitespace in {var}")
                 
         if missing_vars:
-            print(f"Missing required environment variables: {', '.join(missing_vars)}")
+            logger.warning(f"Missing required environment variables: {', '.join(missing_vars)}")
         if invalid_vars:
-            print(f"Found and fixed whitespace in variables: {', '.join(invalid_vars)}")
+            logger.info(f"Found and fixed whitespace in variables: {', '.join(invalid_vars)}")
         
-        # Handle encryption key
-        env_key = os.getenv('TOKEN_ENCRYPTION_KEY')
-        if env_key:
-            try:
-                # Validate the provided key
-                self.encryption_key = base64.urlsafe_b64decode(env_key)
-                if len(self.encryption_key) != 32:
-                    raise ValueError("Invalid key length")
-            except Exception:
-                # If provided key is invalid, generate a new one
-                self.encryption_key = Fernet.generate_key()
+        # The key must stay stable across runs, or stored tokens can't be decrypted
+        if vault is not None:
+            self.cipher_suite = vault.cipher_suite
         else:
-            # Generate a new key if none provided
-            self.encryption_key = Fernet.generate_key()
-            
-        self.cipher_suite = Fernet(self.encryption_key)
-        self.app = FastAPI()
-        self.setup_routes()
+            self.cipher_suite = Fernet(load_encryption_key())
+        self._app = None
+        
+    @property
+    def app(self):
+        """FastAPI callback app, built on first use"""
+        if self._app is None:
+            from fastapi import FastAPI
+            self._app = FastAPI()
+            self.setup_routes()
+        return self._app
         
     def setup_routes(self):
+        from fastapi import HTTPException
+        
         @self.app.get("/callback")
         async def callback(code: str):
             try:
@@ -76,10 +98,17 @@ class OAuthHandler:
     async def automated_authorization(self) -> Optional[str]:
         """Perform automated authorization using Selenium"""
         if not all([self.linkedin_username, self.linkedin_password]):
-            print("LinkedIn credentials not found in environment variables.")
+            logger.warning("LinkedIn credentials not found in environment variables.")
             return await self.manual_authorization()
 
-        print("Starting automated authorization...")
+        from selenium import webdriver
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.chrome.service import Service
+        from webdriver_manager.chrome import ChromeDriverManager
+
+        logger.info("Starting automated authorization...")
         options = webdriver.ChromeOptions()
         # Remove headless mode to reduce detection likelihood
         options.add_argument('--no-sandbox')
@@ -90,7 +119,9 @@ class OAuthHandler:
         options.add_argument('--disable-blink-features=AutomationControlled')
         
         # Use persistent user data directory in project folder
-        user_data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'chrome-data')
+        # (one per account, so each keeps its own LinkedIn login cookies)
+        profile = f"chrome-data-{self.account}" if self.account else 'chrome-data'
+        user_data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', profile)
         os.makedirs(user_data_dir, exist_ok=True)
         options.add_argument(f'--user-data-dir={user_data_dir}')
         
@@ -105,26 +136,25 @@ class OAuthHandler:
         options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36')
         
         try:
-            print("Initializing Chrome WebDriver...")
+            logger.info("Initializing Chrome WebDriver...")
             service = Service(ChromeDriverManager().install())
             driver = webdriver.Chrome(service=service, options=options)
             driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-            print("WebDriver initialized successfully")
+            logger.info("WebDriver initialized successfully")
             
             # Navigate to LinkedIn authorization URL
-            scope = "openid profile w_member_social email"  # Standardized scope
             auth_url = (
-                f"https://www.linkedin.com/oauth/v2/authorization"
+                f"{self.oauth_base_url}/authorization"
                 f"?response_type=code"
                 f"&client_id={self.client_id}"
                 f"&redirect_uri={self.redirect_uri}"
-                f"&scope={scope}"
+                f"&scope={self.scope}"
             )
-            print(f"Navigating to authorization URL...")
+            logger.info(f"Navigating to authorization URL...")
             driver.get(auth_url)
 
             try:
-                print("Waiting for login form...")
+                logger.info("Waiting for login form...")
                 # Wait for and fill in login form
                 # Wait for and fill in login form with delays
                 username_field = WebDriverWait(driver, 10).until(
@@ -135,7 +165,7 @@ class OAuthHandler:
                 for char in self.linkedin_username:
                     username_field.send_keys(char)
                     await asyncio.sleep(0.1)  # Simulate human typing
-                print("Username entered...")
+                logger.info("Username entered...")
                 await asyncio.sleep(1)  # Natural pause after username
                 
                 password_field = driver.find_element(By.ID, "password")
@@ -143,7 +173,7 @@ class OAuthHandler:
                 for char in self.linkedin_password:
                     password_field.send_keys(char)
                     await asyncio.sleep(0.1)  # Simulate human typing
-                print("Password entered...")
+                logger.info("Password entered...")
                 await asyncio.sleep(1)  # Natural pause before submitting
                 
                 # Try to find and click submit button with extended wait
@@ -152,26 +182,26 @@ class OAuthHandler:
                         EC.element_to_be_clickable((By.CSS_SELECTOR, "button[type='submit']"))
                     )
                     submit_button.click()
-                    print("Login form submitted...")
+                    logger.info("Login form submitted...")
                 except Exception as e:
-                    print(f"Error clicking submit button: {str(e)}")
-                    print(f"Current page source: {driver.page_source}")
+                    logger.error(f"Error clicking submit button: {str(e)}")
+                    logger.debug(f"Current page source: {driver.page_source}")
                     raise
 
                 # Wait for redirect and handle security challenges
-                print("Waiting for redirect or security challenge...")
+                logger.info("Waiting for redirect or security challenge...")
                 wait = WebDriverWait(driver, 20)
                 
                 def check_url_condition(driver):
                     current_url = driver.current_url
-                    print(f"Checking URL: {current_url}")
+                    logger.debug(f"Checking URL: {current_url}")
                     
                     if "checkpoint/challenge" in current_url:
-                        print("Security challenge detected!")
+                        logger.warning("Security challenge detected!")
                         return False
                     
                     if self.redirect_uri in current_url:
-                        print("Successfully redirected to callback URL")
+                        logger.info("Successfully redirected to callback URL")
                         return True
                     
                     return False
@@ -180,146 +210,282 @@ class OAuthHandler:
                     wait.until(check_url_condition)
                 except Exception as e:
                     if "checkpoint/challenge" in driver.current_url:
-                        print("LinkedIn security challenge detected. Manual intervention required.")
-                        print("Please complete the security challenge manually.")
+                        logger.warning("LinkedIn security challenge detected. Manual intervention required.")
+                        logger.warning("Please complete the security challenge manually.")
                         # Fall back to manual authorization
                         driver.quit()
                         return await self.manual_authorization()
                     raise e
                 
-                print(f"Current URL after redirect: {driver.current_url}")
+                logger.debug(f"Current URL after redirect: {driver.current_url}")
             except Exception as e:
-                print(f"Error during login process: {str(e)}")
+                logger.error(f"Error during login process: {str(e)}")
                 raise
             
             try:
                 # Extract authorization code from URL
                 current_url = driver.current_url
-                print(f"Parsing URL for auth code: {current_url}")
+                logger.debug(f"Parsing URL for auth code: {current_url}")
                 
                 parsed_url = urlparse(current_url)
                 query_params = parse_qs(parsed_url.query)
-                print(f"Query parameters: {query_params}")
+                logger.debug(f"Query parameters: {query_params}")
                 
                 auth_code = query_params.get('code', [None])[0]
                 if auth_code:
-                    print("Successfully extracted authorization code")
+                    logger.info("Successfully extracted authorization code")
                 else:
-                    print("No authorization code found in URL")
+                    logger.warning("No authorization code found in URL")
                     if 'error' in query_params:
-                        print(f"OAuth error: {query_params['error']}")
+                        logger.error(f"OAuth error: {query_params['error']}")
                 
                 driver.quit()
-                print("Browser session closed")
+                logger.info("Browser session closed")
                 
                 if auth_code:
                     # Get access token using the authorization code
-                    print("Exchanging authorization code for access token...")
+                    logger.info("Exchanging authorization code for access token...")
                     token_data = await self.get_access_token(auth_code)
                     return token_data.get('access_token')
                 
                 return None
             except Exception as e:
-                print(f"Error extracting authorization code: {str(e)}")
+                logger.error(f"Error extracting authorization code: {str(e)}")
                 return None
             
         except Exception as e:
-            print(f"Automated authorization failed: {str(e)}")
-            print("Falling back to manual authorization...")
+            logger.error(f"Automated authorization failed: {str(e)}")
+            logger.warning("Falling back to manual authorization...")
             return await self.manual_authorization()
 
     async def manual_authorization(self):
         """Fall back to manual authorization process"""
-        scope = "openid profile w_member_social email"
         auth_url = (
-            f"https://www.linkedin.com/oauth/v2/authorization"
+            f"{self.oauth_base_url}/authorization"
             f"?response_type=code"
             f"&client_id={self.client_id}"
             f"&redirect_uri={self.redirect_uri}"
-            f"&scope={scope}"
+            f"&scope={self.scope}"
         )
-        print(f"Please visit this URL to authorize the application: {auth_url}")
+        logger.warning(f"Please visit this URL to authorize the application: {auth_url}")
         
+        import uvicorn
         config = uvicorn.Config(self.app, host="0.0.0.0", port=8000, log_level="info")
         server = uvicorn.Server(config)
         await server.serve()
 
+    def set_session(self, session: Optional[aiohttp.ClientSession]) -> None:
+        """Share an existing pooled HTTP session for token requests"""
+        self.session = session
+
+    @asynccontextmanager
+    async def _client_session(self) -> AsyncIterator[aiohttp.ClientSession]:
+        """Yield the shared session if one is set, otherwise a short-lived one"""
+        if self.session is not None and not self.session.closed:
+            yield self.session
+        else:
+            async with aiohttp.ClientSession() as session:
+                yield session
+
     async def get_access_token(self, auth_code: str) -> Dict:
         """Exchange authorization code for access token"""
-        async with aiohttp.ClientSession() as session:
-            data = {
-                'grant_type': 'authorization_code',
-                'code': auth_code,
-                'redirect_uri': self.redirect_uri,
-                'client_id': self.client_id,
-                'client_secret': self.client_secret
-            }
-            
-            async with session.post('https://www.linkedin.com/oauth/v2/accessToken', data=data) as response:
-                if response.status != 200:
-                    raise Exception(f"Failed to get access token: {await response.text()}")
+        with span("token_exchange"):
+            async with self._client_session() as session:
+                data = {
+                    'grant_type': 'authorization_code',
+                    'code': auth_code,
+                    'redirect_uri': self.redirect_uri,
+                    'client_id': self.client_id,
+                    'client_secret': self.client_secret
+                }
                 
-                token_data = await response.json()
-                token_data['timestamp'] = datetime.now().isoformat()
-                await self.save_tokens(token_data)
-                return token_data
+                async with session.post(f"{self.oauth_base_url}/accessToken", data=data) as response:
+                    if response.status != 200:
+                        raise Exception(f"Failed to get access token: {await response.text()}")
+                    
+                    token_data = self._stamp_expiry(await response.json())
+                    await self.save_tokens(token_data)
+                    return token_data
 
     async def refresh_token(self, refresh_token: str) -> Dict:
         """Refresh the access token using the refresh token"""
-        async with aiohttp.ClientSession() as session:
-            data = {
-                'grant_type': 'refresh_token',
-                'refresh_token': refresh_token,
-                'client_id': self.client_id,
-                'client_secret': self.client_secret
-            }
-            
-            async with session.post('https://www.linkedin.com/oauth/v2/accessToken', data=data) as response:
-                if response.status != 200:
-                    raise Exception(f"Failed to refresh token: {await response.text()}")
+        with span("token_refresh"):
+            async with self._client_session() as session:
+                data = {
+                    'grant_type': 'refresh_token',
+                    'refresh_token': refresh_token,
+                    'client_id': self.client_id,
+                    'client_secret': self.client_secret
+                }
                 
-                token_data = await response.json()
-                token_data['timestamp'] = datetime.now().isoformat()
-                await self.save_tokens(token_data)
-                return token_data
+                async with session.post(f"{self.oauth_base_url}/accessToken", data=data) as response:
+                    if response.status != 200:
+                        raise Exception(f"Failed to refresh token: {await response.text()}")
+                    
+                    token_data = await response.json()
+                    # LinkedIn may omit the refresh token when it is unchanged
+                    token_data.setdefault('refresh_token', refresh_token)
+                    token_data = self._stamp_expiry(token_data)
+                    await self.save_tokens(token_data)
+                    return token_data
+
+    def _stamp_expiry(self, token_data: Dict) -> Dict:
+        """Record absolute expiry times from the token response's expires_in fields"""
+        now = datetime.now()
+        token_data['timestamp'] = now.isoformat()
+        if 'expires_in' in token_data:
+            token_data['expires_at'] = (now + timedelta(seconds=int(token_data['expires_in']))).isoformat()
+        if 'refresh_token_expires_in' in token_data:
+            token_data['refresh_token_expires_at'] = (
+                now + timedelta(seconds=int(token_data['refresh_token_expires_in']))
+            ).isoformat()
+        return token_data
+
+    def _token_expiry(self, token_data: Dict) -> datetime:
+        """Return when the access token expires"""
+        if 'expires_at' in token_data:
+            return datetime.fromisoformat(token_data['expires_at'])
+        token_timestamp = datetime.fromisoformat(token_data['timestamp'])
+        if 'expires_in' in token_data:
+            return token_timestamp + timedelta(seconds=int(token_data['expires_in']))
+        # Tokens saved before expiry tracking: assume LinkedIn's 60-day lifetime
+        return token_timestamp + timedelta(days=60)
+
+    def _can_refresh(self, token_data: Dict) -> bool:
+        """Check whether the token carries a refresh token that has not expired yet"""
+        if 'refresh_token' not in token_data:
+            return False
+        if 'refresh_token_expires_at' in token_data:
+            return datetime.now() < datetime.fromisoformat(token_data['refresh_token_expires_at'])
+        return True
 
     async def save_tokens(self, token_data: Dict) -> None:
         """Save tokens securely"""
-        encrypted_data = self.cipher_suite.encrypt(json.dumps(token_data).encode())
-        with open(self.token_file, 'wb') as f:
-            f.write(encrypted_data)
+        if self.vault is not None:
+            self.vault.put(self.account, token_data)
+        else:
+            encrypted_data = self.cipher_suite.encrypt(json.dumps(token_data).encode())
+            with open(self.token_file, 'wb') as f:
+                f.write(encrypted_data)
+        self._token_data = token_data
+        self._invalidated_token = None
+
+    def _read_tokens(self) -> Optional[Dict]:
+        """Read and decrypt the token file"""
+        if self.vault is not None:
+            return self.vault.get(self.account)
+        if not os.path.exists(self.token_file):
+            return None
+            
+        with open(self.token_file, 'rb') as f:
+            encrypted_data = f.read()
+            
+        return json.loads(self.cipher_suite.decrypt(encrypted_data))
+
+    def _is_token_expiring(self, token_data: Dict) -> bool:
+        """Check whether a token was rejected, has expired or is about to"""
+        if token_data.get('access_token') == self._invalidated_token:
+            return True
+        return datetime.now() + self.expiry_margin >= self._token_expiry(token_data)
+
+    def invalidate_token(self, access_token: Optional[str] = None) -> None:
+        """Drop the cached token, e.g. after a 401, so the next caller refreshes it"""
+        current = self._token_data.get('access_token') if self._token_data else None
+        if access_token is None or access_token == current:
+            self._invalidated_token = access_token or current
+            self._token_data = None
 
     async def load_tokens(self) -> Optional[Dict]:
-        """Load and validate stored tokens"""
+        """Load and validate stored tokens, from memory when possible"""
         try:
-            if not os.path.exists(self.token_file):
+            token_data = self._token_data or self._read_tokens()
+            if not token_data:
                 return None
-                
-            with open(self.token_file, 'rb') as f:
-                encrypted_data = f.read()
-                
-            token_data = json.loads(self.cipher_suite.decrypt(encrypted_data))
-            token_timestamp = datetime.fromisoformat(token_data['timestamp'])
             
-            # Check if token is expired (assuming 60-day expiration)
-            if datetime.now() - token_timestamp > timedelta(days=60):
-                if 'refresh_token' in token_data:
+            if self._is_token_expiring(token_data):
+                self._token_data = None
+                if self._can_refresh(token_data):
                     return await self.refresh_token(token_data['refresh_token'])
+                # An expired refresh token can't be renewed; the caller re-authorizes
                 return None
                 
+            self._token_data = token_data
             return token_data
         except Exception as e:
-            print(f"Error loading tokens: {e}")
+            logger.error(f"Error loading tokens: {e}")
             return None
 
     async def get_valid_token(self) -> Optional[str]:
         """Get a valid access token, refreshing if necessary"""
-        token_data = await self.load_tokens()
-        
-        if not token_data:
-            return await self.automated_authorization()
+        token_data = self._token_data
+        if token_data and not self._is_token_expiring(token_data):
+            return token_data.get('access_token')
             
-        return token_data.get('access_token')
+        with span("token_load"):
+            async with self._token_lock:
+                # Another caller may have refreshed the token while we waited
+                token_data = await self.load_tokens()
+                
+                if not token_data:
+                    async with _authorization_lock:
+                        if self.account:
+                            logger.info(f"Authorizing account {self.account}")
+                        return await self.automated_authorization()
+                    
+                return token_data.get('access_token')
+
+    def start_background_refresh(self) -> asyncio.Task:
+        """Start renewing the token ahead of expiry so requests never wait on a refresh"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+        return self._refresh_task
+
+    async def stop_background_refresh(self) -> None:
+        """Cancel the background refresher"""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    async def _refresh_loop(self) -> None:
+        """Sleep until the refresh margin before expiry, then refresh under the token lock"""
+        while True:
+            try:
+                token_data = self._token_data or self._read_tokens()
+            except Exception as e:
+                logger.warning(f"Background refresh could not read tokens: {e}")
+                token_data = None
+                
+            if not token_data or not self._can_refresh(token_data):
+                # Nothing to renew; the next caller re-authorizes if the token lapses
+                await asyncio.sleep(self.refresh_retry_interval)
+                continue
+                
+            refresh_at = self._token_expiry(token_data) - self.refresh_margin
+            delay = (refresh_at - datetime.now()).total_seconds()
+            if delay > 0:
+                # Re-check periodically in case the token is replaced elsewhere
+                await asyncio.sleep(min(delay, 3600))
+                continue
+                
+            failed = False
+            async with self._token_lock:
+                current = self._token_data or self._read_tokens()
+                if current and current.get('access_token') != token_data.get('access_token'):
+                    # Someone else already refreshed it
+                    continue
+                try:
+                    await self.refresh_token(token_data['refresh_token'])
+                    logger.info("Access token refreshed in the background")
+                except Exception as e:
+                    logger.error(f"Background token refresh failed: {e}")
+                    failed = True
+            # Back off without the lock, so callers can still load or re-authorize meanwhile
+            if failed:
+                await asyncio.sleep(self.refresh_retry_interval)
 
 # Example usage
 async def main():
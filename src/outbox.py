@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+from typing import Dict, List, Optional
+
+from linkedin_manager import AmbiguousWriteError, post_text
+from metrics import inc, span
+
+logger = logging.getLogger(__name__)
+
+GENERATED = 'generated'
+PUBLISHING = 'publishing'
+PUBLISHED = 'published'
+FAILED = 'failed'
+
+
+def idempotency_key(content: str, hashtags: Optional[List[str]] = None, account: str = '') -> str:
+    """Identify a post by the account it is for and the exact text it publishes"""
+    return hashlib.sha256(f"{account}\0{post_text(content, hashtags)}".encode()).hexdigest()
+
+
+class Outbox:
+    """Write-ahead log of generated posts, drained by an OutboxPublisher"""
+
+    def __init__(self, path: Optional[str] = None, lease: Optional[float] = None):
+        self.path = path or os.getenv('OUTBOX_DB_PATH', '.outbox.db')
+        # A 'publishing' entry untouched for this long was abandoned by a crashed publisher
+        self.lease = lease if lease is not None else float(os.getenv('OUTBOX_LEASE_SECONDS', '300'))
+        self._conn = sqlite3.connect(self.path)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "idempotency_key TEXT NOT NULL UNIQUE, "
+            "account TEXT NOT NULL DEFAULT '', "
+            "topic TEXT, content TEXT NOT NULL, hashtags TEXT, dedup_id INTEGER, "
+            "status TEXT NOT NULL DEFAULT 'generated', "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "post_id TEXT, error TEXT, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox (account, status, id)"
+        )
+        self._conn.commit()
+
+    def add(self, post: Dict, account: str = '') -> Dict:
+        """Durably record a generated post; adding the same text for the same account again is a no-op"""
+        key = idempotency_key(post['content'], post.get('hashtags'), account)
+        now = time.time()
+        with self._conn:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO outbox (idempotency_key, account, topic, content, hashtags, dedup_id, "
+                "status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, account, post.get('topic'), post['content'], json.dumps(post.get('hashtags') or []),
+                 post.get('dedup_id'), GENERATED, now, now)
+            )
+        if not cursor.rowcount:
+            logger.info(f"Post for topic '{post.get('topic')}' is already in the outbox")
+        return self.get_by_key(key)
+
+    def get(self, entry_id: int) -> Optional[Dict]:
+        row = self._conn.execute("SELECT * FROM outbox WHERE id = ?", (entry_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def get_by_key(self, key: str) -> Optional[Dict]:
+        row = self._conn.execute("SELECT * FROM outbox WHERE idempotency_key = ?", (key,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def pending(self, account: str = '') -> List[Dict]:
+        """Entries still to publish: fresh ones, and 'publishing' ones whose publisher went away"""
+        rows = self._conn.execute(
+            "SELECT * FROM outbox WHERE account = ? AND (status = ? OR (status = ? AND updated_at < ?)) ORDER BY id",
+            (account, GENERATED, PUBLISHING, time.time() - self.lease)
+        )
+        return [self._row_to_dict(row) for row in rows]
+
+    def is_pending(self, entry: Dict) -> bool:
+        """Whether an entry may be claimed now: fresh, or abandoned by its publisher"""
+        return entry['status'] == GENERATED or (
+            entry['status'] == PUBLISHING and entry['updated_at'] < time.time() - self.lease
+        )
+
+    def claim(self, entry: Dict) -> bool:
+        """Atomically take an entry for publishing; False if another publisher got there first"""
+        with self._conn:
+            return self._conn.execute(
+                "UPDATE outbox SET status = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE id = ? AND status = ? AND updated_at = ?",
+                (PUBLISHING, time.time(), entry['id'], entry['status'], entry['updated_at'])
+            ).rowcount == 1
+
+    def _set_status(self, entry_id: int, status: str, **fields) -> None:
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        sql = f"UPDATE outbox SET status = ?, updated_at = ?{', ' + assignments if fields else ''} WHERE id = ?"
+        with self._conn:
+            self._conn.execute(sql, (status, time.time(), *fields.values(), entry_id))
+
+    def mark_published(self, entry_id: int, post_id: Optional[str]) -> None:
+        self._set_status(entry_id, PUBLISHED, post_id=post_id, error=None)
+
+    def mark_failed(self, entry_id: int, error: str) -> None:
+        self._set_status(entry_id, FAILED, error=error)
+
+    def mark_uncertain(self, entry_id: int, error: str) -> None:
+        """Leave an entry 'publishing' so a later drain settles it once the lease runs out"""
+        self._set_status(entry_id, PUBLISHING, error=error)
+
+    def release(self, entry_id: int, error: str) -> None:
+        """Return an entry to the queue after a failure that certainly didn't publish it"""
+        self._set_status(entry_id, GENERATED, error=error)
+
+    def requeue_failed(self, account: str = '') -> int:
+        with self._conn:
+            return self._conn.execute(
+                "UPDATE outbox SET status = ?, attempts = 0, updated_at = ? WHERE account = ? AND status = ?",
+                (GENERATED, time.time(), account, FAILED)
+            ).rowcount
+
+    def counts(self) -> Dict[str, int]:
+        return {row[0]: row[1] for row in self._conn.execute(
+            "SELECT status, COUNT(*) FROM outbox GROUP BY status"
+        )}
+
+    def close(self) -> None:
+        self._conn.close()
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict:
+        entry = dict(row)
+        entry["hashtags"] = json.loads(entry["hashtags"] or "[]")
+        return entry
+
+
+class OutboxPublisher:
+    """Publishes outbox entries for one account without ever posting the same entry twice"""
+
+    def __init__(self, outbox: Outbox, automation, account: str = '', max_attempts: Optional[int] = None):
+        self.outbox = outbox
+        self.automation = automation
+        self.account = account
+        self.max_attempts = max_attempts or int(os.getenv('OUTBOX_MAX_ATTEMPTS', '3'))
+
+    async def _settle(self, entry: Dict) -> Optional[Dict]:
+        """Look for an earlier attempt's post on LinkedIn; raises if we can't tell"""
+        match = await self.automation.linkedin_manager.find_post(entry['content'], entry['hashtags'])
+        inc("outbox_reconciled_total", outcome="found" if match else "not_found")
+        return match
+
+    async def publish(self, entry: Dict) -> bool:
+        """Publish one entry; returns True once it is live"""
+        resumed = entry['status'] == PUBLISHING
+        if not self.outbox.claim(entry):
+            return False
+
+        manager = self.automation.linkedin_manager
+        try:
+            # A crashed or timed-out attempt may already have posted it
+            result = await self._settle(entry) if resumed else None
+        except Exception as e:
+            inc("outbox_reconciled_total", outcome="unknown")
+            self.outbox.mark_failed(entry['id'], f"publish outcome unknown, check the profile before requeueing: {e}")
+            logger.error(f"Could not verify whether outbox entry {entry['id']} was published: {e}")
+            return False
+
+        if result is None:
+            try:
+                with span("publish"):
+                    result = await manager.create_post(content=entry['content'], hashtags=entry['hashtags'],
+                                                       replay_safe=False)
+            except AmbiguousWriteError as e:
+                # Settle it right away if the post is visible; otherwise a later drain will
+                try:
+                    result = await self._settle(entry)
+                except Exception:
+                    result = None
+                if result is None:
+                    self.outbox.mark_uncertain(entry['id'], str(e))
+                    logger.warning(f"Outbox entry {entry['id']} may or may not be published; will verify later")
+                    return False
+            except Exception as e:
+                if entry['attempts'] + 1 >= self.max_attempts:
+                    self.outbox.mark_failed(entry['id'], str(e))
+                    if entry['dedup_id'] is not None:
+                        # It will never go live, so it must not block similar posts
+                        self.automation.dedup_index.discard(entry['dedup_id'])
+                    logger.error(f"Outbox entry {entry['id']} failed permanently: {e}")
+                else:
+                    self.outbox.release(entry['id'], str(e))
+                    logger.warning(f"Outbox entry {entry['id']} failed, will retry: {e}")
+                return False
+
+        self.outbox.mark_published(entry['id'], result.get('id'))
+        logger.info("Post published successfully")
+
+        # Bookkeeping failures must not make a live post look unpublished
+        try:
+            if entry['dedup_id'] is not None:
+                self.automation.dedup_index.mark_published(entry['dedup_id'])
+            self.automation.record_published(result, entry['topic'] or '', entry['content'], entry['hashtags'])
+        except Exception as e:
+            logger.error(f"Could not record analytics for outbox entry {entry['id']}: {e}")
+        return True
+
+    async def drain(self) -> int:
+        """Publish every pending entry, oldest first; returns how many went live"""
+        published = 0
+        for entry in self.outbox.pending(self.account):
+            if await self.publish(entry):
+                published += 1
+        return published
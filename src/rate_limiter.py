@@ -0,0 +1,148 @@
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Mapping, Optional, Tuple
+
+from metrics import inc, observe
+
+logger = logging.getLogger(__name__)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given either as seconds or as an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """Token bucket whose rate can be adjusted and which can be paused outright"""
+
+    def __init__(self, rate: float, capacity: float, max_rate: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = rate / 16
+        self.max_rate = max_rate or rate * 2
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> float:
+        """Wait for a token; returns how long the caller was delayed"""
+        waited = 0.0
+        # The lock keeps waiters in FIFO order so a burst can't starve earlier callers
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    delay = self.blocked_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                else:
+                    delay = (1 - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+
+    def pause(self, seconds: float) -> None:
+        """Block the bucket for `seconds` and drain any saved-up burst"""
+        now = time.monotonic()
+        self._refill(now)
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = 0
+
+    def slow_down(self) -> None:
+        """Multiplicative decrease after being throttled"""
+        self.rate = max(self.min_rate, self.rate / 2)
+
+    def speed_up(self) -> None:
+        """Additive increase while requests keep succeeding"""
+        self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class RateLimiter:
+    """Token buckets per (endpoint, member), tuned from LinkedIn's rate-limit responses"""
+
+    def __init__(self, default_rate: Optional[float] = None, default_burst: Optional[float] = None,
+                 endpoint_rates: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.default_rate = default_rate or float(os.getenv('RATE_LIMIT_DEFAULT_RPS', '5'))
+        self.default_burst = default_burst or float(os.getenv('RATE_LIMIT_DEFAULT_BURST', '10'))
+        # Writes are far more tightly limited than reads
+        self.endpoint_rates = endpoint_rates or {
+            "ugcPosts": (float(os.getenv('RATE_LIMIT_POSTS_RPS', '1')),
+                         float(os.getenv('RATE_LIMIT_POSTS_BURST', '2')))
+        }
+        self.default_retry_after = float(os.getenv('RATE_LIMIT_DEFAULT_RETRY_AFTER', '60'))
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self.throttled = 0
+
+    @staticmethod
+    def endpoint_key(endpoint: str) -> str:
+        """Group endpoints by their resource, e.g. 'ugcPosts/urn:li:share:1' -> 'ugcPosts'"""
+        return endpoint.split('?', 1)[0].split('/', 1)[0]
+
+    def bucket(self, endpoint: str, member: str) -> TokenBucket:
+        key = (self.endpoint_key(endpoint), member)
+        if key not in self._buckets:
+            rate, burst = self.endpoint_rates.get(key[0], (self.default_rate, self.default_burst))
+            self._buckets[key] = TokenBucket(rate, burst)
+        return self._buckets[key]
+
+    async def acquire(self, endpoint: str, member: str) -> float:
+        """Wait until a request to `endpoint` on behalf of `member` is allowed"""
+        waited = await self.bucket(endpoint, member).acquire()
+        observe("rate_limit_wait_seconds", waited, endpoint=self.endpoint_key(endpoint))
+        if waited:
+            logger.debug(f"Rate limiter delayed {self.endpoint_key(endpoint)} for {member} by {waited:.2f}s")
+        return waited
+
+    def update_from_response(self, endpoint: str, member: str, status: int,
+                             headers: Mapping[str, str]) -> Optional[float]:
+        """Adapt the bucket to a response; returns the enforced pause for throttled calls"""
+        bucket = self.bucket(endpoint, member)
+        if status == 429:
+            self.throttled += 1
+            inc("rate_limited_total", endpoint=self.endpoint_key(endpoint))
+            retry_after = parse_retry_after(headers.get('Retry-After'))
+            pause = retry_after if retry_after is not None else self.default_retry_after
+            bucket.slow_down()
+            bucket.pause(pause)
+            logger.warning(f"Throttled on {self.endpoint_key(endpoint)} for {member}; "
+                           f"pausing {pause:.1f}s, rate now {bucket.rate:.2f}/s")
+            return pause
+
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset = headers.get('X-RateLimit-Reset')
+        if remaining is not None and reset is not None:
+            try:
+                if int(remaining) <= 0:
+                    reset_value = float(reset)
+                    # Reset may be an epoch timestamp or a number of seconds
+                    pause = reset_value - time.time() if reset_value > 1e9 else reset_value
+                    bucket.pause(max(0.0, pause))
+                    return pause
+            except ValueError:
+                pass
+
+        if 200 <= status < 300:
+            bucket.speed_up()
+        return None
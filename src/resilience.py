@@ -0,0 +1,217 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from metrics import inc
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Statuses worth retrying: timeouts, throttling and server-side failures
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+# Retried, but not held against the backend: throttling is per caller and is paced by the
+# rate limiter, and an expired token is renewed by the token refresher. Counting them would
+# let one throttled account fail every account sharing the breaker fast.
+BREAKER_NEUTRAL_STATUSES = {401, 429}
+
+
+class NonRetryableError(Exception):
+    """An error that will fail the same way however often it is retried"""
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the backend while its circuit breaker is open"""
+
+
+def error_status(exc: Exception) -> Optional[int]:
+    """Extract an HTTP status from our own errors or from client library errors"""
+    status = getattr(exc, 'status', None)
+    if status is None:
+        response = getattr(exc, 'response', None)
+        status = getattr(response, 'status_code', None) or getattr(response, 'status', None)
+    return status if isinstance(status, int) else None
+
+
+def error_retry_after(exc: Exception) -> Optional[float]:
+    """Return the server-requested delay carried by an error, if any"""
+    retry_after = getattr(exc, 'retry_after', None)
+    if retry_after is not None:
+        return retry_after
+    response = getattr(exc, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if headers:
+        from rate_limiter import parse_retry_after
+        return parse_retry_after(headers.get('Retry-After'))
+    return None
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Classify an error as transient (retry) or permanent (fail now)"""
+    explicit = getattr(exc, 'retryable', None)
+    if explicit is not None:
+        return bool(explicit)
+    if isinstance(exc, (NonRetryableError, CircuitOpenError, ValueError, TypeError, KeyError)):
+        return False
+    status = error_status(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUSES
+    # Timeouts, connection resets and unknown failures are assumed transient
+    return True
+
+
+class RetryPolicy:
+    """Capped exponential backoff with full jitter"""
+
+    def __init__(self, max_attempts: Optional[int] = None, base_delay: Optional[float] = None,
+                 max_delay: Optional[float] = None):
+        self.max_attempts = max_attempts or int(os.getenv('RETRY_MAX_ATTEMPTS', '3'))
+        self.base_delay = base_delay if base_delay is not None else float(os.getenv('RETRY_BASE_DELAY', '1'))
+        self.max_delay = max_delay if max_delay is not None else float(os.getenv('RETRY_MAX_DELAY', '30'))
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Delay before retry number `attempt` (0-based), never shorter than Retry-After"""
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        return max(backoff, retry_after or 0.0)
+
+
+class CircuitBreaker:
+    """Opens after consecutive transient failures and lets one trial call through after a cool-down"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: Optional[int] = None,
+                 reset_timeout: Optional[float] = None):
+        self.name = name
+        self.failure_threshold = failure_threshold or int(os.getenv('BREAKER_FAILURE_THRESHOLD', '5'))
+        self.reset_timeout = reset_timeout if reset_timeout is not None else float(os.getenv('BREAKER_RESET_TIMEOUT', '60'))
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opened_count = 0
+        self.closed_count = 0
+        self._trial_in_flight = False
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError while open; admit a single trial once the cool-down has passed"""
+        if self.state == self.CLOSED:
+            return
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._trial_in_flight = False
+        if self.state == self.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return
+        raise CircuitOpenError(f"{self.name} circuit is open; failing fast")
+
+    def release_trial(self) -> None:
+        """End a half-open trial that produced no verdict, so the next call may try instead"""
+        self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            self.closed_count += 1
+            logger.info(f"{self.name} circuit closed")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self.opened_count += 1
+            self._trial_in_flight = False
+            logger.warning(f"{self.name} circuit opened after {self.failures} consecutive failures")
+
+
+class Resilience:
+    """Retry policy, circuit breaker and counters for one backend"""
+
+    def __init__(self, name: str, policy: Optional[RetryPolicy] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.name = name
+        self.policy = policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker(name)
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.short_circuited = 0
+
+    async def call(self, operation: Callable[[], Awaitable[T]], max_attempts: Optional[int] = None) -> T:
+        """Run `operation`, retrying transient errors with backoff while the breaker allows"""
+        attempts = max_attempts or self.policy.max_attempts
+        self.calls += 1
+        for attempt in range(attempts):
+            try:
+                self.breaker.before_call()
+                trial = self.breaker.state == CircuitBreaker.HALF_OPEN
+            except CircuitOpenError:
+                self.short_circuited += 1
+                self.failures += 1
+                inc("backend_calls_total", backend=self.name, outcome="short_circuited")
+                raise
+            try:
+                result = await operation()
+            except Exception as e:
+                retryable = is_retryable(e)
+                if retryable and error_status(e) in BREAKER_NEUTRAL_STATUSES:
+                    if trial:
+                        self.breaker.release_trial()
+                elif retryable:
+                    self.breaker.record_failure()
+                else:
+                    # The backend answered; the request itself was at fault
+                    self.breaker.record_success()
+                if not retryable or attempt == attempts - 1:
+                    self.failures += 1
+                    inc("backend_calls_total", backend=self.name, outcome="error")
+                    raise
+                delay = self.policy.delay(attempt, error_retry_after(e))
+                self.retries += 1
+                inc("backend_retries_total", backend=self.name)
+                logger.warning(f"{self.name} call failed ({e}); retry {attempt + 1}/{attempts - 1} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+            except BaseException:
+                # Cancelled (shutdown, a lost hedge race): no verdict, but never leave a trial stuck
+                if trial:
+                    self.breaker.release_trial()
+                raise
+            else:
+                self.breaker.record_success()
+                inc("backend_calls_total", backend=self.name, outcome="ok")
+                return result
+        raise RuntimeError("unreachable")
+
+    def stats(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "short_circuited": self.short_circuited,
+            "breaker_state": self.breaker.state,
+            "breaker_opened": self.breaker.opened_count,
+            "breaker_closed": self.breaker.closed_count
+        }
+
+
+_backends: Dict[str, Resilience] = {}
+
+
+def get_backend(name: str) -> Resilience:
+    """Return the process-wide resilience state for a backend, so breakers are shared"""
+    if name not in _backends:
+        _backends[name] = Resilience(name)
+    return _backends[name]
+
+
+def resilience_stats() -> Dict[str, Dict]:
+    """Retry and breaker counters for every backend seen so far"""
+    return {name: backend.stats() for name, backend in _backends.items()}
@@ -0,0 +1,115 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+from typing import Dict, Optional, Any
+
+from metrics import inc
+
+
+class ResponseCache:
+    """Content-addressed on-disk cache for model responses with TTL and LRU eviction"""
+
+    def __init__(self, path: str = '.content_cache.db', ttl: float = 86400,
+                 max_entries: int = 1000, bypass: bool = False):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON responses (accessed_at)")
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls) -> 'ResponseCache':
+        """Build a cache from HF_CACHE_* environment variables"""
+        return cls(
+            path=os.getenv('HF_CACHE_PATH', '.content_cache.db'),
+            ttl=float(os.getenv('HF_CACHE_TTL', '86400')),
+            max_entries=int(os.getenv('HF_CACHE_MAX_ENTRIES', '1000')),
+            bypass=os.getenv('HF_CACHE_BYPASS', 'false').lower() == 'true'
+        )
+
+    @staticmethod
+    def make_key(model: str, prompt: str, params: Dict[str, Any]) -> str:
+        """Hash the model, prompt and sampling parameters into a cache key"""
+        payload = json.dumps({"model": model, "prompt": prompt, "params": params}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached response, or None on a miss or expired entry"""
+        if self.bypass:
+            return None
+        row = self._conn.execute(
+            "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        now = time.time()
+        if row is None or (self.ttl and now - row[1] > self.ttl):
+            if row is not None:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+            self.misses += 1
+            inc("cache_requests_total", result="miss")
+            return None
+
+        self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        self._conn.commit()
+        self.hits += 1
+        inc("cache_requests_total", result="hit")
+        return row[0]
+
+    def set(self, key: str, response: str) -> None:
+        """Store a response and evict least recently used entries over the size bound"""
+        if self.bypass:
+            return
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (key, response, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, response, now, now)
+        )
+        self._evict(now)
+        self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then the least recently used ones beyond max_entries"""
+        removed = 0
+        if self.ttl:
+            removed += self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (now - self.ttl,)
+            ).rowcount
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            removed += self._conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?)", (overflow,)
+            ).rowcount
+        if removed:
+            self.evictions += removed
+            self.logger.debug(f"Evicted {removed} cached responses")
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss/eviction counters and the current entry count"""
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "entries": count}
+
+    def clear(self) -> None:
+        """Remove every cached response"""
+        self._conn.execute("DELETE FROM responses")
+        self._conn.commit()
+
+    def close(self) -> None:
+        """Close the underlying database"""
+        self._conn.close()
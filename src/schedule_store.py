@@ -0,0 +1,303 @@
+import os
+import json
+import time
+import heapq
+import sqlite3
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Iterable
+
+from metrics import observe, span
+from outbox import PUBLISHED as OUTBOX_PUBLISHED, PUBLISHING as OUTBOX_PUBLISHING, FAILED as OUTBOX_FAILED
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+PUBLISHING = 'publishing'
+PUBLISHED = 'published'
+FAILED = 'failed'
+
+
+def parse_time(value) -> float:
+    """Accept an epoch number, 'YYYY-MM-DD HH:MM' or ISO-8601 string and return epoch seconds"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    try:
+        return datetime.strptime(value, '%Y-%m-%d %H:%M').timestamp()
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+class ScheduleStore:
+    """Durable, indexed queue of posts waiting to be published"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv('SCHEDULE_DB_PATH', '.schedule.db')
+        self._conn = sqlite3.connect(self.path)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS scheduled_posts ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "due_at REAL NOT NULL, "
+            "topic TEXT, content TEXT, hashtags TEXT, dedup_id INTEGER, "
+            "status TEXT NOT NULL DEFAULT 'queued', "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "post_id TEXT, error TEXT, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        # Stores created before prepared posts were kept with their dedup document
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(scheduled_posts)")}
+        if 'dedup_id' not in columns:
+            self._conn.execute("ALTER TABLE scheduled_posts ADD COLUMN dedup_id INTEGER")
+        # Due-time lookups walk this index, so they stay O(log n) with thousands queued
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_status_due ON scheduled_posts (status, due_at)"
+        )
+        self._conn.commit()
+
+    def enqueue(self, due_at, topic: Optional[str] = None, content: Optional[str] = None,
+                hashtags: Optional[List[str]] = None) -> int:
+        """Queue one post; either a topic to generate from or ready content is required"""
+        return self.enqueue_many([{"publish_at": due_at, "topic": topic,
+                                   "content": content, "hashtags": hashtags}])[0]
+
+    def enqueue_many(self, entries: Iterable[Dict]) -> List[int]:
+        """Queue many posts in a single transaction"""
+        now = time.time()
+        ids = []
+        with self._conn:
+            for entry in entries:
+                if not entry.get("topic") and not entry.get("content"):
+                    raise ValueError("Scheduled entry needs a 'topic' or 'content'")
+                cursor = self._conn.execute(
+                    "INSERT INTO scheduled_posts (due_at, topic, content, hashtags, status, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (parse_time(entry["publish_at"]), entry.get("topic"), entry.get("content"),
+                     json.dumps(entry.get("hashtags") or []), QUEUED, now, now)
+                )
+                ids.append(cursor.lastrowid)
+        return ids
+
+    def enqueue_file(self, path: str) -> List[int]:
+        """Bulk enqueue from a JSON-lines file of {"publish_at", "topic" | "content", "hashtags"}"""
+        entries = []
+        with open(path, 'r') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{path}:{line_number}: invalid JSON: {e}")
+        return self.enqueue_many(entries)
+
+    def get(self, entry_id: int) -> Optional[Dict]:
+        row = self._conn.execute("SELECT * FROM scheduled_posts WHERE id = ?", (entry_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def queued(self) -> List[Tuple[float, int]]:
+        """Return (due_at, id) for every queued entry, in due order"""
+        return [tuple(row) for row in self._conn.execute(
+            "SELECT due_at, id FROM scheduled_posts WHERE status = ? ORDER BY due_at", (QUEUED,)
+        )]
+
+    def next_due(self) -> Optional[float]:
+        row = self._conn.execute(
+            "SELECT due_at FROM scheduled_posts WHERE status = ? ORDER BY due_at LIMIT 1", (QUEUED,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def recover(self) -> int:
+        """Requeue entries left 'publishing' by a crashed run
+
+        Safe because a requeued entry republishes the text stored before its first attempt
+        through the outbox, which checks LinkedIn before posting an interrupted entry again.
+        """
+        with self._conn:
+            count = self._conn.execute(
+                "UPDATE scheduled_posts SET status = ?, updated_at = ? WHERE status = ?",
+                (QUEUED, time.time(), PUBLISHING)
+            ).rowcount
+        if count:
+            logger.warning(f"Recovered {count} scheduled posts interrupted while publishing")
+        return count
+
+    def _set_status(self, entry_id: int, status: str, **fields) -> None:
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        sql = f"UPDATE scheduled_posts SET status = ?, updated_at = ?{', ' + assignments if fields else ''} WHERE id = ?"
+        with self._conn:
+            self._conn.execute(sql, (status, time.time(), *fields.values(), entry_id))
+
+    def mark_publishing(self, entry_id: int) -> None:
+        with self._conn:
+            self._conn.execute(
+                "UPDATE scheduled_posts SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (PUBLISHING, time.time(), entry_id)
+            )
+
+    def set_post(self, entry_id: int, post: Dict) -> None:
+        """Keep the prepared post, so a retry publishes the same text instead of generating again"""
+        with self._conn:
+            self._conn.execute(
+                "UPDATE scheduled_posts SET content = ?, hashtags = ?, dedup_id = ?, updated_at = ? WHERE id = ?",
+                (post["content"], json.dumps(post.get("hashtags") or []), post.get("dedup_id"), time.time(), entry_id)
+            )
+
+    def mark_published(self, entry_id: int, post_id: Optional[str]) -> None:
+        self._set_status(entry_id, PUBLISHED, post_id=post_id, error=None)
+
+    def mark_failed(self, entry_id: int, error: str) -> None:
+        self._set_status(entry_id, FAILED, error=error)
+
+    def requeue(self, entry_id: int, due_at: float, error: str) -> None:
+        self._set_status(entry_id, QUEUED, due_at=due_at, error=error)
+
+    def counts(self) -> Dict[str, int]:
+        return {row[0]: row[1] for row in self._conn.execute(
+            "SELECT status, COUNT(*) FROM scheduled_posts GROUP BY status"
+        )}
+
+    def close(self) -> None:
+        self._conn.close()
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict:
+        entry = dict(row)
+        entry["hashtags"] = json.loads(entry["hashtags"] or "[]")
+        return entry
+
+
+class ScheduleDispatcher:
+    """Heap-based dispatcher that publishes queued posts when they fall due"""
+
+    def __init__(self, store: ScheduleStore, automation, max_attempts: Optional[int] = None,
+                 retry_delay: Optional[float] = None):
+        self.store = store
+        self.automation = automation
+        self.max_attempts = max_attempts or int(os.getenv('SCHEDULE_MAX_ATTEMPTS', '3'))
+        self.retry_delay = retry_delay if retry_delay is not None else float(os.getenv('SCHEDULE_RETRY_DELAY', '300'))
+        self._heap: List[Tuple[float, int]] = []
+        self._wakeup = asyncio.Event()
+        self._stop = asyncio.Event()
+
+    def load(self) -> None:
+        """Rebuild the in-memory heap from the store, resuming after a crash"""
+        self.store.recover()
+        self._heap = self.store.queued()
+        heapq.heapify(self._heap)
+        logger.info(f"Dispatcher loaded {len(self._heap)} queued posts")
+
+    def enqueue(self, due_at, **entry) -> int:
+        """Queue a post durably and wake the dispatcher if it is now the earliest"""
+        entry_id = self.store.enqueue(due_at, **entry)
+        heapq.heappush(self._heap, (parse_time(due_at), entry_id))
+        self._wakeup.set()
+        return entry_id
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wakeup.set()
+
+    def _discard(self, entry_id: int) -> None:
+        """Stop a post that will never be published from blocking similar ones"""
+        dedup_id = self.store.get(entry_id)["dedup_id"]
+        if dedup_id is not None:
+            self.automation.dedup_index.discard(dedup_id)
+
+    def _retry_later(self, entry_id: int, due_at: float, error: str) -> None:
+        self.store.requeue(entry_id, due_at, error)
+        heapq.heappush(self._heap, (due_at, entry_id))
+
+    def _fail_or_retry(self, entry: Dict, error: str, outbox_entry: Optional[Dict] = None) -> None:
+        entry_id = entry["id"]
+        if entry["attempts"] + 1 >= self.max_attempts:
+            self.store.mark_failed(entry_id, error)
+            if outbox_entry is not None:
+                # Otherwise the next outbox drain would still publish it
+                self.automation.outbox.mark_failed(outbox_entry["id"], error)
+            self._discard(entry_id)
+            logger.error(f"Scheduled post {entry_id} failed permanently: {error}")
+        else:
+            self._retry_later(entry_id, time.time() + self.retry_delay, error)
+            logger.warning(f"Scheduled post {entry_id} failed, retrying later: {error}")
+
+    async def _publish(self, entry_id: int) -> None:
+        """Prepare a due post and publish it through the outbox, so a lost response is never replayed blindly"""
+        entry = self.store.get(entry_id)
+        if not entry or entry["status"] != QUEUED:
+            return
+        self.store.mark_publishing(entry_id)
+        observe("schedule_lag_seconds", max(0.0, time.time() - entry["due_at"]))
+        outbox = self.automation.outbox
+        try:
+            post = {"topic": entry["topic"], "content": entry["content"], "hashtags": entry["hashtags"],
+                    "dedup_id": entry["dedup_id"]}
+            if not post["content"]:
+                posts = await self.automation.content_generator.create_content_batch([entry["topic"]])
+                if not posts:
+                    raise Exception(f"Content generation failed for topic '{entry['topic']}'")
+                post = posts[0]
+            # A stored dedup_id means the text was checked and may already be in the outbox;
+            # replacing it now could publish both versions
+            if post.get("dedup_id") is None:
+                post = await self.automation.ensure_unique(post)
+                if post is None:
+                    self.store.mark_failed(entry_id, "near-duplicate of an earlier post")
+                    return
+                self.store.set_post(entry_id, post)
+            outbox_entry = outbox.add(post, account=self.automation.account)
+        except Exception as e:
+            self._fail_or_retry(entry, str(e))
+            return
+
+        if outbox.is_pending(outbox_entry):
+            await self.automation.publisher.publish(outbox_entry)
+            outbox_entry = outbox.get(outbox_entry["id"])
+
+        status = outbox_entry["status"]
+        if status == OUTBOX_PUBLISHED:
+            self.store.mark_published(entry_id, outbox_entry["post_id"])
+            logger.info(f"Published scheduled post {entry_id}")
+        elif status == OUTBOX_FAILED:
+            self.store.mark_failed(entry_id, outbox_entry["error"] or "publish failed")
+            logger.error(f"Scheduled post {entry_id} failed permanently: {outbox_entry['error']}")
+        elif status == OUTBOX_PUBLISHING:
+            # Uncertain or held by another publisher: look again once its lease has run out
+            self._retry_later(entry_id, outbox_entry["updated_at"] + outbox.lease + 1,
+                              outbox_entry["error"] or "publish in progress elsewhere")
+            logger.warning(f"Scheduled post {entry_id} may already be live; will verify after the outbox lease")
+        else:
+            self._fail_or_retry(entry, outbox_entry["error"] or "publish failed", outbox_entry)
+
+    async def dispatch_due(self) -> int:
+        """Publish every post whose due time has passed; returns how many were attempted"""
+        attempted = 0
+        now = time.time()
+        while self._heap and self._heap[0][0] <= now:
+            _, entry_id = heapq.heappop(self._heap)
+            with span("schedule_publish"):
+                await self._publish(entry_id)
+            attempted += 1
+        return attempted
+
+    async def run(self, until_empty: bool = False) -> None:
+        """Sleep until the earliest due post, publish it, and repeat until stopped"""
+        self.load()
+        while not self._stop.is_set():
+            await self.dispatch_due()
+            if not self._heap:
+                if until_empty:
+                    break
+                timeout = None
+            else:
+                timeout = max(0.0, self._heap[0][0] - time.time())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,103 @@
+import re
+from typing import List
+
+
+class StopCondition:
+    """Decides, chunk by chunk, when streamed output is already usable"""
+
+    key = "none"
+
+    def reset(self) -> None:
+        """Clear state before a new stream"""
+
+    def feed(self, chunk: str, text: str) -> bool:
+        """Consume the next chunk (`text` is everything so far); True stops the stream"""
+        return False
+
+
+class JsonObjectComplete(StopCondition):
+    """Stops once the first top-level JSON object has been closed"""
+
+    key = "json_object"
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, chunk: str, text: str) -> bool:
+        for char in chunk:
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"' and self.started:
+                self.in_string = True
+            elif char == '{':
+                self.started = True
+                self.depth += 1
+            elif char == '}' and self.started:
+                self.depth -= 1
+                if self.depth == 0:
+                    return True
+        return False
+
+
+class WordBudget(StopCondition):
+    """Stops after a maximum number of words"""
+
+    def __init__(self, max_words: int):
+        self.max_words = max_words
+        self.key = f"words:{max_words}"
+        self.reset()
+
+    def reset(self) -> None:
+        self.words = 0
+        self.in_word = False
+
+    def feed(self, chunk: str, text: str) -> bool:
+        for char in chunk:
+            if char.isspace():
+                self.in_word = False
+            elif not self.in_word:
+                self.in_word = True
+                self.words += 1
+        return self.words > self.max_words
+
+
+class HashtagBlockComplete(StopCondition):
+    """Stops once `count` complete hashtags (followed by a separator) have been produced"""
+
+    # A tag is only complete once something other than a word character follows it
+    _TAG = re.compile(r"#\w+(?=\W)")
+
+    def __init__(self, count: int):
+        self.count = count
+        self.key = f"hashtags:{count}"
+
+    def feed(self, chunk: str, text: str) -> bool:
+        return len(self._TAG.findall(text)) >= self.count
+
+
+class AnyOf(StopCondition):
+    """Stops as soon as any of the wrapped conditions does"""
+
+    def __init__(self, *conditions: StopCondition):
+        self.conditions: List[StopCondition] = list(conditions)
+        self.key = "any(" + ",".join(condition.key for condition in self.conditions) + ")"
+
+    def reset(self) -> None:
+        for condition in self.conditions:
+            condition.reset()
+
+    def feed(self, chunk: str, text: str) -> bool:
+        # Feed every condition so stateful ones stay in sync
+        results = [condition.feed(chunk, text) for condition in self.conditions]
+        return any(results)
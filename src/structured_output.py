@@ -0,0 +1,192 @@
+import re
+import json
+import logging
+from typing import Dict, List, Optional
+
+from streaming import StopCondition
+from metrics import inc, registry
+
+logger = logging.getLogger(__name__)
+
+OUTCOMES = ("json", "repaired", "prose", "failed", "rejected")
+
+# Keys models commonly use instead of the ones the prompts ask for
+_CONTENT_KEYS = ("content", "post", "text", "body")
+_HASHTAG_KEYS = ("hashtags", "tags")
+
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+# A key (optionally with its colon and a partial literal) whose value never arrived
+_DANGLING_KEY = re.compile(r',?\s*"(?:[^"\\]|\\.)*"\s*(?::\s*[\w.+-]*)?\s*$')
+_TRAILING_TAGS = re.compile(r"(?:\s*#\w+)+\s*$")
+_FENCE = re.compile(r"^\s*```[\w-]*\s*$", re.MULTILINE)
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class StructuredOutputError(ValueError):
+    """The model's answer held no post text"""
+
+
+def record_parse(outcome: str) -> None:
+    inc("llm_output_parses_total", outcome=outcome)
+
+
+def parse_stats() -> Dict[str, int]:
+    """Parse outcome counts, as reported on the daemon health endpoint"""
+    return {outcome: int(registry.counter("llm_output_parses_total", outcome=outcome)) for outcome in OUTCOMES}
+
+
+def normalize_hashtags(value) -> List[str]:
+    """Accept a list or a space/comma separated string and return distinct '#Tag' strings"""
+    items = value if isinstance(value, list) else re.split(r"[\s,]+", value) if isinstance(value, str) else []
+    tags = []
+    for item in items:
+        if not isinstance(item, str):
+            continue
+        word = re.sub(r"\W", "", item)
+        if word and f"#{word}" not in tags:
+            tags.append(f"#{word}")
+    return tags
+
+
+def _loads(text: str) -> Optional[Dict]:
+    """json.loads that tolerates raw newlines in strings and trailing commas"""
+    for candidate in (text, _TRAILING_COMMA.sub(r"\1", text)):
+        try:
+            value = json.loads(candidate, strict=False)
+        except json.JSONDecodeError:
+            continue
+        return value if isinstance(value, dict) else None
+    return None
+
+
+def _field(value: Dict, keys) -> Optional[object]:
+    """The first of `keys` present in a parsed object"""
+    for key in keys:
+        if key in value:
+            return value[key]
+    return None
+
+
+class StructuredOutputParser(StopCondition):
+    """Incremental extractor of the first JSON object in model output, fenced or wrapped in prose.
+
+    Fed chunk by chunk from the token stream it stops generation as soon as an object
+    closes; objects cut off by a token limit are repaired by closing what is still open.
+    """
+
+    key = "json_object"
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.buffer = ""
+        self.start: Optional[int] = None
+        self.stack: List[str] = []
+        self.in_string = False
+        self.string_start = 0
+        self.escaped = False
+        self.complete = False
+        self._object: Optional[Dict] = None
+        self._parsed = False
+        self.outcome: Optional[str] = None
+
+    def feed(self, chunk: str, text: Optional[str] = None) -> bool:
+        if self.complete:
+            return True
+        offset = len(self.buffer)
+        self.buffer += chunk
+        for i, char in enumerate(chunk, offset):
+            if self.start is None:
+                if char == "{":
+                    self.start = i
+                    self.stack = ["{"]
+                continue
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+                self.string_start = i
+            elif char in _CLOSERS:
+                self.stack.append(char)
+            elif char in "}]" and self.stack:
+                self.stack.pop()
+                if not self.stack:
+                    value = _loads(self.buffer[self.start:i + 1])
+                    if value is not None:
+                        self._object, self._parsed, self.complete = value, True, True
+                        self.outcome = "json"
+                        self.buffer = self.buffer[:i + 1]
+                        return True
+                    # Braces in surrounding prose: keep looking for the real object
+                    self.start = None
+        return False
+
+    def _repair(self) -> Optional[Dict]:
+        """Close a truncated object, dropping any key whose value never arrived"""
+        text = self.buffer[self.start:]
+        if self.in_string and self.stack[-1] == "[":
+            # A half-written list item (typically a hashtag) is dropped rather than closed
+            text = self.buffer[self.start:self.string_start].rstrip().rstrip(",")
+        elif self.in_string:
+            text = (text[:-1] if self.escaped else text) + '"'
+        closers = "".join(_CLOSERS[opener] for opener in reversed(self.stack))
+        for candidate in (text, _DANGLING_KEY.sub("", text), text.rstrip().rstrip(",:")):
+            value = _loads(candidate + closers)
+            if value is not None:
+                return value
+        return None
+
+    def value(self) -> Optional[Dict]:
+        """The parsed (or repaired) object, or None when the text holds no usable JSON"""
+        if not self._parsed:
+            self._parsed = True
+            if self.start is not None:
+                self._object = self._repair()
+                if self._object is not None:
+                    self.outcome = "repaired"
+        return self._object
+
+    def _prose(self) -> Dict:
+        """Fallback for plain-text answers: only a trailing block of tags counts as hashtags"""
+        text = _FENCE.sub("", self.buffer).strip()
+        match = _TRAILING_TAGS.search(text)
+        if not match:
+            return {"content": text, "hashtags": []}
+        return {"content": text[:match.start()].rstrip(), "hashtags": normalize_hashtags(match.group())}
+
+    def post(self) -> Dict:
+        """Pull 'content' and 'hashtags' out of whatever the model produced, setting `outcome`"""
+        value = self.value()
+        if value is None:
+            post = self._prose()
+            self.outcome = "prose" if post["content"] else "failed"
+            return post
+        content = _field(value, _CONTENT_KEYS)
+        if not isinstance(content, str) or not content.strip():
+            # JSON without usable text: publishing the raw object would be worse than nothing
+            self.outcome = "failed"
+            return {"content": "", "hashtags": []}
+        content = content.strip()
+        hashtags = normalize_hashtags(_field(value, _HASHTAG_KEYS))
+        if not hashtags:
+            # Some answers put the tags at the end of the content instead
+            match = _TRAILING_TAGS.search(content)
+            if match:
+                content, hashtags = content[:match.start()].rstrip(), normalize_hashtags(match.group())
+        return {"content": content, "hashtags": hashtags}
+
+    def extract_post(self) -> Dict:
+        """Like post(), but records the outcome and raises StructuredOutputError when there is no text"""
+        post = self.post()
+        record_parse(self.outcome)
+        if self.outcome == "failed":
+            raise StructuredOutputError("Model response contained no post text")
+        if self.outcome != "json":
+            logger.debug(f"Structured output parsed via {self.outcome}")
+        return post
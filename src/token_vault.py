@@ -0,0 +1,90 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+from typing import Dict, List, Optional
+
+from cryptography.fernet import Fernet
+
+logger = logging.getLogger(__name__)
+
+
+def load_encryption_key(path: Optional[str] = None) -> bytes:
+    """Return the Fernet key for stored tokens, generating and persisting one on first run
+
+    TOKEN_ENCRYPTION_KEY takes precedence and must be a valid Fernet key (32 url-safe
+    base64-encoded bytes); an invalid one raises instead of silently orphaning every
+    stored token behind a fresh key.
+    """
+    env_key = os.getenv('TOKEN_ENCRYPTION_KEY')
+    if env_key:
+        key = env_key.strip().encode()
+        try:
+            Fernet(key)
+        except (ValueError, TypeError) as e:
+            raise ValueError(
+                "TOKEN_ENCRYPTION_KEY is not a valid Fernet key; generate one with "
+                "`python -c \"from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())\"`"
+            ) from e
+        return key
+
+    path = path or os.getenv('TOKEN_KEY_PATH', '.linkedin_token.key')
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            key = f.read().strip()
+        try:
+            Fernet(key)
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Encryption key in {path} is corrupt; restore it or delete it to re-authorize") from e
+        return key
+
+    key = Fernet.generate_key()
+    # Created owner-only; O_EXCL keeps two processes from racing to different keys
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        return load_encryption_key(path)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    logger.info(f"Generated a new token encryption key in {path}")
+    return key
+
+
+class TokenVault:
+    """Encrypted token store for many accounts, indexed by account name"""
+
+    def __init__(self, path: Optional[str] = None, key: Optional[bytes] = None):
+        self.path = path or os.getenv('TOKEN_VAULT_PATH', '.linkedin_tokens.db')
+        self.cipher_suite = Fernet(key or load_encryption_key())
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tokens ("
+            "account TEXT PRIMARY KEY, token BLOB NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, account: str) -> Optional[Dict]:
+        """Decrypt one account's token data, or None if it has never authorized"""
+        row = self._conn.execute("SELECT token FROM tokens WHERE account = ?", (account,)).fetchone()
+        return json.loads(self.cipher_suite.decrypt(row[0])) if row else None
+
+    def put(self, account: str, token_data: Dict) -> None:
+        encrypted = self.cipher_suite.encrypt(json.dumps(token_data).encode())
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO tokens (account, token, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(account) DO UPDATE SET token = excluded.token, updated_at = excluded.updated_at",
+                (account, encrypted, time.time())
+            )
+
+    def delete(self, account: str) -> bool:
+        with self._conn:
+            return self._conn.execute("DELETE FROM tokens WHERE account = ?", (account,)).rowcount > 0
+
+    def accounts(self) -> List[str]:
+        return [row[0] for row in self._conn.execute("SELECT account FROM tokens ORDER BY account")]
+
+    def close(self) -> None:
+        self._conn.close()
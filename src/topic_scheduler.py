@@ -0,0 +1,212 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from metrics import span
+
+# numpy is imported where arrays are used, so importing this module on a CLI run stays cheap
+
+logger = logging.getLogger(__name__)
+
+
+def topic_hash(topic: str) -> int:
+    """Stable 64-bit hash of a stripped topic line"""
+    return int.from_bytes(hashlib.blake2b(topic.encode(), digest_size=8).digest(), 'little')
+
+
+class TopicLibrary:
+    """Byte-offset index over a topics file so individual topics are read on demand"""
+
+    def __init__(self, path: str, index_dir: Optional[str] = None):
+        self.path = path
+        self.index_dir = index_dir or os.getenv('TOPIC_INDEX_DIR', '.topic_index')
+        key = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:16]
+        self._offsets_path = os.path.join(self.index_dir, f'{key}.offsets.npy')
+        self._hashes_path = os.path.join(self.index_dir, f'{key}.hashes.npy')
+        self._meta_path = os.path.join(self.index_dir, f'{key}.json')
+        self.offsets, self.hashes = self._load_or_build()
+
+    def _file_signature(self) -> Dict:
+        stat = os.stat(self.path)
+        return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+    def _load_or_build(self) -> Tuple['np.ndarray', 'np.ndarray']:
+        import numpy as np
+        signature = self._file_signature()
+        try:
+            with open(self._meta_path, 'r') as f:
+                if json.load(f) == signature:
+                    return np.load(self._offsets_path, mmap_mode='r'), np.load(self._hashes_path, mmap_mode='r')
+        except (OSError, ValueError):
+            pass
+        return self._build(signature)
+
+    def _build(self, signature: Dict) -> Tuple['np.ndarray', 'np.ndarray']:
+        """Scan the file once, recording where each non-empty line starts"""
+        import numpy as np
+        offsets, hashes = [], []
+        position = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                topic = line.decode('utf-8', errors='replace').strip()
+                if topic:
+                    offsets.append(position)
+                    hashes.append(topic_hash(topic))
+                position += len(line)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        os.makedirs(self.index_dir, exist_ok=True)
+        np.save(self._offsets_path, offsets)
+        np.save(self._hashes_path, hashes)
+        with open(self._meta_path, 'w') as f:
+            json.dump(signature, f)
+        logger.info(f"Indexed {len(offsets)} topics from {self.path}")
+        return offsets, hashes
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def read(self, indices) -> List[str]:
+        """Read the topics at the given line indices"""
+        topics = []
+        with open(self.path, 'rb') as f:
+            for index in indices:
+                f.seek(int(self.offsets[index]))
+                topics.append(f.readline().decode('utf-8', errors='replace').strip())
+        return topics
+
+    def sample(self, k: int, rng: 'np.random.Generator') -> List[str]:
+        """Uniformly sample up to k distinct topics without reading the whole file"""
+        k = min(k, len(self))
+        return self.read(rng.choice(len(self), size=k, replace=False)) if k else []
+
+    def contains(self, topics: List[str]) -> List[bool]:
+        """Vectorized membership test against the indexed topic hashes"""
+        if not topics:
+            return []
+        import numpy as np
+        wanted = np.asarray([topic_hash(topic) for topic in topics], dtype=np.uint64)
+        return list(np.isin(wanted, self.hashes))
+
+
+class TopicHistory:
+    """Persistent record of when each topic was chosen"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv('TOPIC_HISTORY_PATH', '.topic_history.db')
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS topic_history (topic TEXT NOT NULL, chosen_at REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_history_chosen ON topic_history (chosen_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_history_topic ON topic_history (topic, chosen_at)")
+        self._conn.commit()
+
+    def record(self, topics: List[str], chosen_at: Optional[float] = None) -> None:
+        chosen_at = chosen_at or time.time()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO topic_history (topic, chosen_at) VALUES (?, ?)",
+                [(topic, chosen_at) for topic in topics]
+            )
+
+    def recent(self, since: float) -> Set[str]:
+        """Topics chosen at or after `since`"""
+        return {row[0] for row in self._conn.execute(
+            "SELECT DISTINCT topic FROM topic_history WHERE chosen_at >= ?", (since,)
+        )}
+
+    def last_chosen(self, topics: List[str]) -> Dict[str, float]:
+        if not topics:
+            return {}
+        placeholders = ",".join("?" * len(topics))
+        return {row[0]: row[1] for row in self._conn.execute(
+            f"SELECT topic, MAX(chosen_at) FROM topic_history WHERE topic IN ({placeholders}) GROUP BY topic",
+            topics
+        )}
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class TopicScheduler:
+    """Chooses topics by Thompson sampling over stored engagement, with a recency cooldown"""
+
+    def __init__(self, library: TopicLibrary, history: Optional[TopicHistory] = None,
+                 engagement: Optional[Dict[str, Tuple[float, int]]] = None,
+                 cooldown_days: Optional[float] = None, sample_size: Optional[int] = None,
+                 seed: Optional[int] = None):
+        self.library = library
+        self.history = history or TopicHistory()
+        self.cooldown = (cooldown_days if cooldown_days is not None
+                         else float(os.getenv('TOPIC_COOLDOWN_DAYS', '7'))) * 86400
+        self.sample_size = sample_size or int(os.getenv('TOPIC_SAMPLE_SIZE', '64'))
+        import numpy as np
+        self.rng = np.random.default_rng(seed)
+        self._engagement = engagement
+        # Stats read from the store are reloaded periodically for long-running processes
+        self._reload_engagement = engagement is None
+        self._engagement_loaded_at = 0.0
+
+    @property
+    def engagement(self) -> Dict[str, Tuple[float, int]]:
+        """(mean engagement, post count) per topic from the local analytics store"""
+        if self._reload_engagement and time.time() - self._engagement_loaded_at > 3600:
+            self._engagement = None
+        if self._engagement is None:
+            from analytics_store import AnalyticsStore
+            self._engagement_loaded_at = time.time()
+            try:
+                self._engagement = AnalyticsStore().topic_stats()
+            except Exception as e:
+                logger.warning(f"Engagement history unavailable, sampling uniformly: {e}")
+                self._engagement = {}
+        return self._engagement
+
+    def _candidates(self) -> List[str]:
+        """A uniform sample of the library plus every known topic still in it"""
+        known = list(self.engagement)
+        present = [topic for topic, found in zip(known, self.library.contains(known)) if found]
+        return list(dict.fromkeys(self.library.sample(self.sample_size, self.rng) + present))
+
+    def _rank(self, candidates: List[str], count: int) -> List[str]:
+        """Thompson sampling: draw a plausible engagement per arm and keep the best"""
+        import numpy as np
+        stats = self.engagement
+        known = [topic for topic in candidates if topic in stats]
+        unseen = [topic for topic in candidates if topic not in stats]
+        means = np.array([stats[topic][0] for topic in known]) if known else np.zeros(1)
+        prior_mean = float(means.mean())
+        spread = float(means.std()) or max(abs(prior_mean), 1e-3)
+
+        mu = np.array([stats[topic][0] for topic in known])
+        n = np.array([stats[topic][1] for topic in known], dtype=np.float64)
+        scores = list(self.rng.normal(mu, spread / np.sqrt(n + 1))) if known else []
+        # Unseen topics are exchangeable, so they share draws from the prior rather than
+        # each getting one; otherwise exploration would grow with the sample size
+        slots = min(count, len(unseen))
+        scores += list(self.rng.normal(prior_mean, spread, size=slots))
+        arms = known + [unseen[i] for i in self.rng.choice(len(unseen), size=slots, replace=False)]
+        return [arms[i] for i in np.argsort(-np.asarray(scores))[:count]]
+
+    def pick(self, count: int = 1, record: bool = True, exclude: Iterable[str] = ()) -> List[str]:
+        """Choose `count` topics other than `exclude`, starting their cooldown unless `record` is false"""
+        if not len(self.library) or count < 1:
+            return []
+        exclude = set(exclude)
+        with span("topic_selection"):
+            candidates = [topic for topic in self._candidates() if topic not in exclude]
+            recent = self.history.recent(time.time() - self.cooldown)
+            eligible = [topic for topic in candidates if topic not in recent]
+            if eligible:
+                chosen = self._rank(eligible, count)
+            else:
+                # Everything sampled is cooling down: fall back to the least recently used
+                last = self.history.last_chosen(candidates)
+                chosen = sorted(candidates, key=lambda topic: last.get(topic, 0.0))[:count]
+        # Cooldown starts at selection so a failing topic isn't retried in a tight loop
+        if record:
+            self.history.record(chosen)
+        return chosen
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+# Modules import each other by their flat names, as they do when run from src/
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    """Run every test in a scratch directory with fresh process-wide metrics and breakers"""
+    from metrics import registry
+    import resilience
+
+    monkeypatch.chdir(tmp_path)
+    registry.reset()
+    resilience._backends.clear()
+    yield tmp_path
+    registry.reset()
+    resilience._backends.clear()
@@ -0,0 +1,78 @@
+import math
+import os
+
+import pytest
+
+from analytics_store import AnalyticsStore
+
+DAY = 86400.0
+
+
+def stats(impressions=100, likes=0, comments=0, shares=0, clicks=0):
+    return {"impressionCount": impressions, "likeCount": likes, "commentCount": comments,
+            "shareCount": shares, "clickCount": clicks}
+
+
+@pytest.fixture
+def store():
+    store = AnalyticsStore("analytics")
+    store.register_post("urn:1", "Testing", published_at=10 * DAY + 9 * 3600, hashtags=["#Testing", "#QA"])
+    store.register_post("urn:2", "Testing", published_at=11 * DAY + 9 * 3600, hashtags=["#testing"])
+    store.register_post("urn:3", "DevOps", published_at=12 * DAY + 15 * 3600, hashtags=["#DevOps"])
+    return store
+
+
+def test_engagement_is_derived_when_not_reported(store):
+    store.append([("urn:1", stats(impressions=200, likes=10, comments=5, shares=3, clicks=2))])
+    assert store.columns()["engagement"][0] == pytest.approx(0.1)
+    store.append([("urn:2", stats(impressions=0, likes=4))])
+    assert store.columns()["engagement"][1] == 0.0
+
+
+def test_unregistered_posts_and_missing_stats_are_skipped(store):
+    assert store.append([("urn:unknown", stats()), ("urn:1", None), ("urn:2", stats())]) == 1
+
+
+def test_only_each_posts_latest_sample_counts(store):
+    store.append([("urn:1", stats(likes=1)), ("urn:2", stats(likes=3))], sampled_at=1.0)
+    store.append([("urn:1", stats(likes=5))], sampled_at=2.0)
+
+    assert store.topic_stats() == {"Testing": (pytest.approx(0.04), 2)}
+    assert store.topic_stats("likes") == {"Testing": (4.0, 2)}
+
+
+def test_hashtag_stats_merge_case_and_the_hash_sign(store):
+    store.append([("urn:1", stats(likes=2)), ("urn:2", stats(likes=4)), ("urn:3", stats(likes=10))])
+    assert store.hashtag_stats("likes") == {"testing": (3.0, 2), "qa": (2.0, 1), "devops": (10.0, 1)}
+
+
+def test_hour_of_day_histogram(store):
+    store.append([("urn:1", stats(likes=2)), ("urn:2", stats(likes=4)), ("urn:3", stats(likes=10))])
+    histogram = store.hour_of_day_histogram("likes")
+    assert histogram[9] == 3.0 and histogram[15] == 10.0
+    assert math.isnan(histogram[0])
+
+
+def test_rolling_engagement_by_publish_day(store):
+    store.append([("urn:1", stats(likes=2)), ("urn:2", stats(likes=4)), ("urn:3", stats(likes=10))])
+    days, values = store.rolling_engagement(window_days=2, metric="likes")
+    assert list(days) == [10 * DAY, 11 * DAY, 12 * DAY]
+    assert list(values) == [2.0, 3.0, 7.0]
+
+
+def test_data_survives_reopening_and_ragged_columns_are_trimmed(store):
+    store.append([("urn:1", stats(likes=1)), ("urn:2", stats(likes=2))])
+    # A crash mid-append leaves one column a row ahead of the rest
+    with open(os.path.join("analytics", "likes.bin"), "ab") as f:
+        f.write(b"\0" * 8)
+
+    reopened = AnalyticsStore("analytics")
+    assert reopened.post_ids() == ["urn:1", "urn:2", "urn:3"]
+    assert reopened.post_ids(since=11 * DAY) == ["urn:2", "urn:3"]
+    assert len(reopened.columns()["likes"]) == 2
+    assert reopened.topic_stats("likes") == {"Testing": (1.5, 2)}
+
+
+def test_registering_a_post_twice_keeps_the_first_registration(store):
+    assert store.register_post("urn:1", "Other") == 0
+    assert store.posts[0]["topic"] == store.topics.index("Testing")
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from concurrency import bounded_map
+
+
+async def collect(func, items, limit):
+    return [result async for result in bounded_map(func, items, limit)]
+
+
+def test_yields_every_result_in_completion_order():
+    async def delayed(n):
+        await asyncio.sleep(n / 100)
+        return n
+
+    assert asyncio.run(collect(delayed, [3, 1, 2], 3)) == [1, 2, 3]
+
+
+def test_never_runs_more_than_the_limit_at_once():
+    running, peak = 0, 0
+
+    async def tracked(n):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.005)
+        running -= 1
+        return n
+
+    assert sorted(asyncio.run(collect(tracked, range(10), 3))) == list(range(10))
+    assert peak == 3
+
+
+def test_workers_wait_for_a_slow_consumer():
+    pulled = []
+
+    def items():
+        for n in range(100):
+            pulled.append(n)
+            yield n
+
+    async def first_two():
+        async def identity(n):
+            return n
+
+        results = []
+        async for result in bounded_map(identity, items(), 2):
+            results.append(result)
+            if len(results) == 2:
+                break
+        return results
+
+    assert len(asyncio.run(first_two())) == 2
+    # Two consumed, at most two queued and two in flight: never the whole input
+    assert len(pulled) <= 6
+
+
+def test_an_error_propagates_and_cancels_calls_in_flight():
+    cancelled = []
+
+    async def work(n):
+        if n == 0:
+            raise RuntimeError("boom")
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(n)
+            raise
+        return n
+
+    with pytest.raises(RuntimeError, match="boom"):
+        asyncio.run(collect(work, range(3), 3))
+    assert sorted(cancelled) == [1, 2]
+
+
+def test_a_zero_limit_still_makes_progress():
+    async def identity(n):
+        return n
+
+    assert asyncio.run(collect(identity, [1, 2], 0)) == [1, 2]
@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+import pytest
+
+from content_buffer import ContentBuffer
+from topic_scheduler import TopicHistory, TopicLibrary, TopicScheduler
+
+TOPICS = ["Code review habits", "Testing in production", "On-call rotations", "API versioning",
+          "Feature flags", "Incident postmortems"]
+
+
+class FakeGenerator:
+    def __init__(self):
+        self.batches = []
+
+    async def stream_content_batch(self, topics):
+        self.batches.append(list(topics))
+        for topic in topics:
+            yield {"topic": topic, "content": f"Thoughts on {topic}.", "hashtags": []}
+
+
+@pytest.fixture
+def scheduler(tmp_path):
+    path = tmp_path / "topics.txt"
+    path.write_text("\n".join(TOPICS) + "\n")
+    return TopicScheduler(TopicLibrary(str(path)), TopicHistory(), engagement={}, seed=1)
+
+
+def make(scheduler, **kwargs):
+    kwargs.setdefault("low", 1)
+    kwargs.setdefault("high", 3)
+    return ContentBuffer(scheduler, pool="test", **kwargs)
+
+
+def test_fill_tops_up_to_the_high_watermark_with_distinct_topics(scheduler):
+    buffer = make(scheduler, batch_size=2)
+    generator = FakeGenerator()
+
+    assert asyncio.run(buffer.fill(generator)) == 3
+    assert buffer.level() == 3
+    assert [len(batch) for batch in generator.batches] == [2, 1]
+    assert len(set(buffer.topics())) == 3
+
+
+def test_fill_skips_until_the_level_drops_to_the_low_watermark(scheduler):
+    buffer = make(scheduler)
+    asyncio.run(buffer.fill(FakeGenerator()))
+    buffer.take(buffer.pick(1))
+
+    assert asyncio.run(buffer.fill(FakeGenerator())) == 0
+    assert asyncio.run(buffer.fill(FakeGenerator(), force=True)) == 1
+
+
+def test_cooldown_starts_when_a_buffered_post_is_taken_not_when_it_is_generated(scheduler):
+    buffer = make(scheduler)
+    asyncio.run(buffer.fill(FakeGenerator()))
+    assert scheduler.history.recent(0) == set()
+
+    topic = buffer.pick(1)
+    posts, missing = buffer.take(topic)
+    assert [post["topic"] for post in posts] == topic and missing == []
+    assert scheduler.history.recent(0) == set(topic)
+    assert buffer.stats()["hits"] == 1
+
+
+def test_pick_prefers_buffered_topics_then_picks_fresh_ones(scheduler):
+    buffer = make(scheduler, high=1)
+    asyncio.run(buffer.fill(FakeGenerator(), force=True))
+    buffered = buffer.topics()
+
+    topics = buffer.pick(3)
+    assert topics[0] == buffered[0]
+    assert len(set(topics)) == 3
+    # Fresh picks are generated live, so their cooldown starts straight away
+    assert scheduler.history.recent(0) == set(topics[1:])
+
+    posts, missing = buffer.take(topics)
+    assert len(posts) == 1 and missing == topics[1:]
+
+
+def test_stale_posts_are_dropped(scheduler):
+    buffer = make(scheduler, max_age_hours=1)
+    buffer.add([{"topic": TOPICS[0], "content": "old", "hashtags": []}])
+    buffer._conn.execute("UPDATE buffered_posts SET created_at = ?", (time.time() - 7200,))
+
+    assert buffer.level() == 1
+    posts, missing = buffer.take([TOPICS[0]])
+    assert posts == [] and missing == [TOPICS[0]]
+    assert buffer.level() == 0
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from content_generator import ContentGenerator
+from structured_output import StructuredOutputError, parse_stats
+
+
+class FakeClient:
+    """AsyncInferenceClient double that answers each call with the next scripted response"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.prompts = []
+
+    async def text_generation(self, prompt, **params):
+        self.prompts.append(prompt)
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def generator(monkeypatch):
+    monkeypatch.setenv("HF_TOKEN", "test-token")
+    monkeypatch.setenv("CONTENT_STREAMING", "false")
+    monkeypatch.setenv("CONTENT_FUSED_MODE", "false")
+    generator = ContentGenerator()
+    yield generator
+    generator.cache.close()
+
+
+def test_draft_without_post_text_fails_the_topic_instead_of_optimizing_nothing(generator):
+    generator._client = FakeClient(['{"title": "Remote work", "tags": ["#RemoteWork"]}'])
+
+    with pytest.raises(StructuredOutputError):
+        asyncio.run(generator._process_topic("Remote work", "professional"))
+    # The optimize and hashtag stages never ran on an empty draft
+    assert len(generator._client.prompts) == 1
+    assert parse_stats()["failed"] == 1
+
+
+def test_batch_skips_a_topic_whose_draft_has_no_text(generator):
+    generator._client = FakeClient(['{"title": "Remote work"}'])
+
+    assert asyncio.run(generator.create_content_batch(["Remote work"])) == []
+
+
+def test_rejected_output_is_not_cached_so_a_retry_calls_the_model(generator):
+    generator._client = FakeClient(['{"title": "Remote work"}', '{"content": "Async beats meetings."}'])
+
+    with pytest.raises(StructuredOutputError):
+        asyncio.run(generator.generate_post("Remote work"))
+    post = asyncio.run(generator.generate_post("Remote work"))
+
+    assert post["content"] == "Async beats meetings."
+    assert len(generator._client.prompts) == 2
+    # The accepted answer is cached and replayed without another call
+    assert asyncio.run(generator.generate_post("Remote work")) == post
+    assert len(generator._client.prompts) == 2
+
+
+def test_invalid_fused_output_is_not_cached(generator):
+    generator.fused = True
+    fused = '{"content": "Async beats meetings.", "hashtags": ["#RemoteWork"]}'
+    generator._client = FakeClient(['{"content": "", "hashtags": []}', fused])
+
+    assert asyncio.run(generator.generate_fused_post("Remote work")) is None
+    assert asyncio.run(generator.generate_fused_post("Remote work")) == {
+        "content": "Async beats meetings.", "hashtags": ["#RemoteWork"]}
+    assert generator.cache.stats()["entries"] == 1
+
+
+def test_a_cached_response_that_fails_validation_is_regenerated(generator):
+    generator._client = FakeClient(['#RemoteWork #Async'])
+    asyncio.run(generator.generate_llm_hashtags("Async beats meetings."))
+    # Simulate an entry written before responses were validated
+    generator.cache._conn.execute("UPDATE responses SET response = 'no tags here'")
+
+    generator._client = FakeClient(['#RemoteWork #Async'])
+    assert asyncio.run(generator.generate_llm_hashtags("Async beats meetings.")) == ["#RemoteWork", "#Async"]
+    assert len(generator._client.prompts) == 1
@@ -0,0 +1,74 @@
+import time
+
+import pytest
+
+from dedup_index import PUBLISHED, DedupIndex
+
+POST = ("Small pull requests get reviewed faster, merge with fewer conflicts and make it much "
+        "easier to find the change that broke the build. Keep them focused on a single concern.")
+REWORDED = POST.replace("Small pull requests", "Smaller pull requests")
+UNRELATED = ("Our on-call rotation now hands over with a written summary of open incidents, so "
+             "nobody starts a shift without knowing what is still burning.")
+
+
+@pytest.fixture
+def index():
+    index = DedupIndex("dedup.db", threshold=0.5)
+    yield index
+    index.close()
+
+
+def test_signatures_are_stable_across_instances(index):
+    other = DedupIndex("other.db")
+    assert (index.signature(POST) == other.signature(POST)).all()
+    other.close()
+
+
+def test_near_duplicates_of_published_posts_are_found(index):
+    doc_id = index.add(POST, kind=PUBLISHED)
+    match = index.find_duplicate(REWORDED)
+    assert match is not None and match[0] == doc_id and match[1] >= 0.5
+    assert index.find_duplicate(UNRELATED) is None
+
+
+def test_a_post_never_matches_its_own_document(index):
+    doc_id = index.add(POST)
+    index.mark_published(doc_id)
+    assert index.find_duplicate(POST, exclude=doc_id) is None
+    assert index.find_duplicate(POST)[0] == doc_id
+
+
+def test_unpublished_documents_with_the_same_text_are_the_same_post(index):
+    index.add(POST)
+    assert index.find_duplicate(POST) is None
+    assert index.find_duplicate(REWORDED) is not None
+
+
+def test_stale_unpublished_documents_stop_blocking(index):
+    index.add(POST)
+    index.pending_ttl = 0
+    time.sleep(0.01)
+    assert index.find_duplicate(REWORDED) is None
+
+
+def test_discard_forgets_generated_posts_but_never_published_ones(index):
+    generated = index.add(POST)
+    index.discard(generated)
+    assert index.find_duplicate(REWORDED) is None
+
+    published = index.add(POST, kind=PUBLISHED)
+    index.discard(published)
+    assert index.find_duplicate(REWORDED)[0] == published
+
+
+def test_documents_survive_reopening(index):
+    doc_id = index.add(POST, kind=PUBLISHED)
+    index.close()
+    reopened = DedupIndex("dedup.db", threshold=0.5)
+    assert reopened.find_duplicate(REWORDED)[0] == doc_id
+    reopened.close()
+
+
+def test_num_perm_must_split_into_bands():
+    with pytest.raises(ValueError):
+        DedupIndex("bad.db", num_perm=100, bands=16)
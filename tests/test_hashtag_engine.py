@@ -0,0 +1,68 @@
+import pytest
+
+from hashtag_engine import HashtagEngine, tag_key, tag_terms, tokenize
+
+POST = ("Our machine learning models now retrain nightly. Training data flows through new pipelines, "
+        "and the models ship behind feature flags.")
+
+
+def make(**kwargs):
+    kwargs.setdefault("engagement", {})
+    return HashtagEngine(path="hashtags.json", vocabulary_path="missing.txt", **kwargs)
+
+
+def test_helpers():
+    assert tag_terms("#MachineLearning") == ["machine", "learning"]
+    assert tag_terms("#AIOps") == ["ai", "ops"]
+    assert tag_key("#DevOps") == "devops"
+    assert tokenize("The AI models are great") == ["ai", "models"]
+
+
+def test_vocabulary_tags_matching_the_post_are_suggested():
+    tags = make().suggest(POST, count=3)
+    assert tags[0] == "#MachineLearning"
+    assert len(tags) == 3
+
+
+def test_a_local_vocabulary_file_replaces_the_built_in_one(tmp_path):
+    (tmp_path / "vocab.txt").write_text("#Kubernetes k8s clusters\nnot a tag line\n")
+    engine = HashtagEngine(path="hashtags.json", vocabulary_path=str(tmp_path / "vocab.txt"), engagement={})
+    assert list(engine.vocabulary) == ["#Kubernetes"]
+    assert engine.suggest("Scaling k8s clusters", count=1) == ["#Kubernetes"]
+
+
+def test_one_off_words_do_not_pad_the_suggestions():
+    engine = make()
+    tags = engine.suggest("Quarterly revenue grew thanks to returning customers.", count=5)
+    assert "#Quarterly" not in tags and "#Grew" not in tags
+    assert len(tags) < 5
+
+
+def test_repeated_keywords_pad_when_the_vocabulary_runs_short():
+    tags = make().suggest("Kubernetes upgrades: plan kubernetes upgrades per cluster.", count=5)
+    assert "#Kubernetes" in tags and "#Upgrades" in tags
+
+
+def test_learned_history_suggests_tags_used_with_the_same_terms():
+    engine = make()
+    for _ in range(3):
+        engine.learn("Rust borrow checker tips", ["#RustLang"])
+    assert "#RustLang" in engine.suggest("More borrow checker tricks", count=3)
+
+    reloaded = make()
+    assert reloaded.docs == 3 and "#RustLang" in reloaded.suggest("borrow checker", count=3)
+
+
+def test_engagement_reorders_equally_relevant_tags():
+    text = "Startup founders"
+    plain = make().suggest(text, count=2)
+    assert set(plain) == {"#Entrepreneurship", "#Startups"}
+
+    boosted = plain[1]
+    engagement = {tag_key(plain[0]): (0.01, 20), tag_key(boosted): (0.09, 20)}
+    assert make(engagement=engagement).suggest(text, count=2)[0] == boosted
+
+
+@pytest.mark.parametrize("text", ["", "the and of"])
+def test_nothing_to_suggest(text):
+    assert make().suggest(text) == []
@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from hedging import MIN_SAMPLES, HedgePolicy
+from metrics import registry
+
+
+def after(seconds, result=None, error=None):
+    """A call that finishes after `seconds`, recording whether it ran to completion"""
+    state = {"started": False, "finished": False}
+
+    async def call():
+        state["started"] = True
+        await asyncio.sleep(seconds)
+        state["finished"] = True
+        if error:
+            raise error
+        return result
+
+    return call, state
+
+
+def test_fast_primary_is_not_hedged():
+    policy = HedgePolicy(initial_delay=0.2)
+    primary, _ = after(0, "primary")
+    backup, backup_state = after(0, "backup")
+
+    assert asyncio.run(policy.run("chat", primary, backup)) == "primary"
+    assert not backup_state["started"]
+    assert policy.fired == 0
+    assert policy.stats()["calls"] == 1
+
+
+def test_slow_primary_is_hedged_and_the_backup_wins():
+    policy = HedgePolicy(initial_delay=0.02)
+    primary, primary_state = after(1.0, "primary")
+    backup, _ = after(0, "backup")
+
+    assert asyncio.run(policy.run("chat", primary, backup)) == "backup"
+    assert (policy.fired, policy.won) == (1, 1)
+    # The abandoned primary is cancelled rather than left running
+    assert not primary_state["finished"]
+    assert registry.counter("llm_hedges_total", outcome="won") == 1
+
+
+def test_a_finished_loser_is_discarded():
+    policy = HedgePolicy(initial_delay=0.01)
+    gate = asyncio.Event()
+    discarded = []
+
+    async def primary():
+        await gate.wait()
+        return "primary"
+
+    async def backup():
+        # Releases the primary, so both have finished by the time the race is settled
+        gate.set()
+        return "backup"
+
+    async def discard(result):
+        discarded.append(result)
+
+    # On a tie the primary is preferred and the backup's result is released
+    assert asyncio.run(policy.run("chat", primary, backup, discard)) == "primary"
+    assert discarded == ["backup"]
+    assert registry.counter("llm_hedges_total", outcome="lost") == 1
+
+
+def test_hedging_is_denied_once_the_budget_is_spent():
+    policy = HedgePolicy(initial_delay=0.01, budget=0.1)
+
+    async def scenario():
+        results = []
+        for _ in range(3):
+            primary, _ = after(0.03, "primary")
+            backup, _ = after(0, "backup")
+            results.append(await policy.run("chat", primary, backup))
+        return results
+
+    assert asyncio.run(scenario()) == ["backup", "primary", "primary"]
+    assert (policy.fired, policy.denied) == (1, 2)
+    assert registry.counter("llm_hedges_total", outcome="denied") == 2
+
+
+def test_backup_covers_a_failing_primary():
+    policy = HedgePolicy(initial_delay=0.01)
+    primary, _ = after(0.03, error=RuntimeError("primary failed"))
+    backup, _ = after(0.05, "backup")
+
+    assert asyncio.run(policy.run("chat", primary, backup)) == "backup"
+    assert policy.won == 1
+
+
+def test_the_primary_error_is_raised_when_both_calls_fail():
+    policy = HedgePolicy(initial_delay=0.01)
+    primary, _ = after(0.03, error=RuntimeError("primary failed"))
+    backup, _ = after(0, error=RuntimeError("backup failed"))
+
+    with pytest.raises(RuntimeError, match="primary failed"):
+        asyncio.run(policy.run("chat", primary, backup))
+
+
+def test_delay_switches_to_the_percentile_after_enough_samples():
+    policy = HedgePolicy(percentile=0.9, initial_delay=5.0)
+    for i in range(MIN_SAMPLES - 1):
+        policy.observe("chat", i / 10)
+    assert policy.delay("chat") == 5.0
+    assert policy.delay("embed") == 5.0
+
+    policy.observe("chat", (MIN_SAMPLES - 1) / 10)
+    assert policy.delay("chat") == pytest.approx(1.8)
@@ -0,0 +1,106 @@
+import asyncio
+import json
+import os
+import stat
+
+import pytest
+from cryptography.fernet import Fernet, InvalidToken
+
+from multi_account import AccountFanout, load_accounts
+from token_vault import TokenVault, load_encryption_key
+
+
+@pytest.fixture
+def credentials(monkeypatch):
+    for name in ("LINKEDIN_CLIENT_ID", "LINKEDIN_CLIENT_SECRET", "LINKEDIN_USERNAME", "LINKEDIN_PASSWORD"):
+        monkeypatch.setenv(name, "test")
+    monkeypatch.setenv("HF_TOKEN", "test-token")
+    monkeypatch.setenv("TOKEN_KEY_PATH", "token.key")
+    monkeypatch.delenv("TOKEN_ENCRYPTION_KEY", raising=False)
+
+
+def write_accounts(entries):
+    with open("accounts.json", "w") as f:
+        json.dump(entries, f)
+    return "accounts.json"
+
+
+def test_load_accounts_reads_credentials_from_the_environment(monkeypatch):
+    monkeypatch.setenv("BRAND_PASSWORD", "secret")
+    path = write_accounts([{"name": " brand ", "username": "brand@example.com", "password": "$BRAND_PASSWORD"}])
+    assert load_accounts(path) == [{"name": "brand", "username": "brand@example.com", "password": "secret"}]
+
+
+@pytest.mark.parametrize("entries, message", [
+    ({"name": "brand"}, "JSON list"),
+    ([{"username": "x"}], "needs a 'name'"),
+    ([{"name": "a"}, {"name": "a"}], "Duplicate"),
+])
+def test_load_accounts_rejects_bad_files(entries, message):
+    with pytest.raises(ValueError, match=message):
+        load_accounts(write_accounts(entries))
+
+
+def test_generated_key_is_owner_only_and_reused(credentials):
+    key = load_encryption_key()
+    assert stat.S_IMODE(os.stat("token.key").st_mode) == 0o600
+    assert load_encryption_key() == key
+
+
+def test_an_invalid_key_raises_instead_of_orphaning_tokens(credentials, monkeypatch):
+    monkeypatch.setenv("TOKEN_ENCRYPTION_KEY", "not-a-key")
+    with pytest.raises(ValueError, match="TOKEN_ENCRYPTION_KEY"):
+        load_encryption_key()
+
+    monkeypatch.delenv("TOKEN_ENCRYPTION_KEY")
+    with open("token.key", "w") as f:
+        f.write("corrupt")
+    with pytest.raises(ValueError, match="corrupt"):
+        load_encryption_key()
+
+
+def test_vault_round_trips_tokens_per_account(credentials):
+    vault = TokenVault("vault.db")
+    vault.put("brand", {"access_token": "a"})
+    vault.put("alice", {"access_token": "b"})
+    vault.put("brand", {"access_token": "c"})
+
+    assert vault.get("brand") == {"access_token": "c"}
+    assert vault.get("nobody") is None
+    assert vault.accounts() == ["alice", "brand"]
+    assert vault.delete("alice") and not vault.delete("alice")
+    vault.close()
+
+    # Tokens are encrypted at rest and only readable with the same key
+    with pytest.raises(InvalidToken):
+        TokenVault("vault.db", key=Fernet.generate_key()).get("brand")
+    assert TokenVault("vault.db").get("brand") == {"access_token": "c"}
+
+
+def test_fanout_shares_one_generator_rate_limiter_and_local_indexes(credentials):
+    fanout = AccountFanout([{"name": "brand"}, {"name": "alice"}], vault=TokenVault("vault.db"))
+    brand, alice = fanout.automations["brand"], fanout.automations["alice"]
+
+    assert brand.content_generator is alice.content_generator
+    assert brand.linkedin_manager.rate_limiter is alice.linkedin_manager.rate_limiter
+    assert alice.outbox is brand.outbox and alice.dedup_index is brand.dedup_index
+    assert brand.oauth_handler.account == "brand" and alice.oauth_handler.vault is fanout.vault
+    asyncio.run(fanout.close())
+
+
+def test_run_once_posts_per_account_and_isolates_failures(credentials):
+    fanout = AccountFanout([{"name": "brand"}, {"name": "alice"}, {"name": "idle"}],
+                           vault=TokenVault("vault.db"), concurrency=2)
+
+    async def posts(topics):
+        return len(topics)
+
+    async def fails(topics):
+        raise RuntimeError("token revoked")
+
+    fanout.automations["brand"].create_and_post_content = posts
+    fanout.automations["alice"].create_and_post_content = fails
+    topics = {"brand": ["A", "B"], "alice": ["C"], "idle": []}
+
+    assert asyncio.run(fanout.run_once(topics.get)) == {"brand": 2, "alice": 0, "idle": 0}
+    asyncio.run(fanout.close())
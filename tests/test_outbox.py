@@ -0,0 +1,216 @@
+import asyncio
+import time
+
+import pytest
+from aiohttp import web
+
+import standins
+from linkedin_manager import AmbiguousWriteError, LinkedInAPIError, LinkedInManager
+from outbox import Outbox, OutboxPublisher, GENERATED, PUBLISHING, PUBLISHED, FAILED
+
+POST = {"topic": "Testing", "content": "Small, well-named functions are easier to test.", "hashtags": ["#Testing"]}
+
+
+class FakeManager:
+    """LinkedInManager double whose create_post outcomes are scripted per call"""
+
+    def __init__(self, outcomes=(), visible=()):
+        self.outcomes = list(outcomes)
+        self.visible = list(visible)
+        self.created = []
+
+    async def create_post(self, content, hashtags=None, replay_safe=True):
+        assert replay_safe is False
+        self.created.append(content)
+        outcome = self.outcomes.pop(0) if self.outcomes else {"id": f"urn:li:share:{len(self.created)}"}
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def find_post(self, content, hashtags=None):
+        return next((post for post in self.visible if post["content"] == content), None)
+
+
+class FakeDedup:
+    def __init__(self):
+        self.published, self.discarded = [], []
+
+    def mark_published(self, doc_id):
+        self.published.append(doc_id)
+
+    def discard(self, doc_id):
+        self.discarded.append(doc_id)
+
+
+class FakeAutomation:
+    def __init__(self, manager):
+        self.linkedin_manager = manager
+        self.dedup_index = FakeDedup()
+        self.recorded = []
+
+    def record_published(self, result, topic, content=None, hashtags=None):
+        self.recorded.append(result.get("id"))
+
+
+def test_add_is_idempotent_per_account():
+    outbox = Outbox(lease=60)
+    first = outbox.add(POST)
+    assert outbox.add(dict(POST))["id"] == first["id"]
+    assert outbox.add(POST, account="other")["id"] != first["id"]
+    assert outbox.counts() == {GENERATED: 2}
+
+
+def test_claim_has_a_single_winner():
+    outbox = Outbox(lease=60)
+    entry = outbox.add(POST)
+    assert outbox.claim(entry)
+    # A second publisher still holding the old snapshot loses the race
+    assert not outbox.claim(entry)
+    assert outbox.get(entry["id"])["attempts"] == 1
+
+
+def test_publishing_entry_is_pending_only_after_its_lease():
+    outbox = Outbox(lease=60)
+    entry = outbox.add(POST)
+    outbox.claim(entry)
+    claimed = outbox.get(entry["id"])
+    assert claimed["status"] == PUBLISHING
+    assert not outbox.is_pending(claimed)
+    assert outbox.pending() == []
+
+    outbox.lease = 0
+    time.sleep(0.01)
+    assert outbox.is_pending(claimed)
+    assert [e["id"] for e in outbox.pending()] == [entry["id"]]
+
+
+def test_publish_marks_published_and_records_bookkeeping():
+    outbox = Outbox(lease=60)
+    automation = FakeAutomation(FakeManager())
+    entry = outbox.add({**POST, "dedup_id": 7})
+    assert asyncio.run(OutboxPublisher(outbox, automation).publish(entry))
+    settled = outbox.get(entry["id"])
+    assert settled["status"] == PUBLISHED and settled["post_id"] == "urn:li:share:1"
+    assert automation.dedup_index.published == [7]
+    assert automation.recorded == ["urn:li:share:1"]
+
+
+def test_transient_failures_are_retried_then_fail_and_release_the_dedup_document():
+    outbox = Outbox(lease=60)
+    manager = FakeManager(outcomes=[Exception("503"), Exception("503")])
+    automation = FakeAutomation(manager)
+    publisher = OutboxPublisher(outbox, automation, max_attempts=2)
+    entry = outbox.add({**POST, "dedup_id": 3})
+
+    assert not asyncio.run(publisher.publish(entry))
+    assert outbox.get(entry["id"])["status"] == GENERATED
+    assert not asyncio.run(publisher.publish(outbox.get(entry["id"])))
+    assert outbox.get(entry["id"])["status"] == FAILED
+    assert automation.dedup_index.discarded == [3]
+
+
+def test_ambiguous_write_is_settled_without_posting_again():
+    outbox = Outbox(lease=0)
+    manager = FakeManager(outcomes=[AmbiguousWriteError("connection reset")])
+    publisher = OutboxPublisher(outbox, FakeAutomation(manager))
+    entry = outbox.add(POST)
+
+    assert not asyncio.run(publisher.publish(entry))
+    assert outbox.get(entry["id"])["status"] == PUBLISHING
+
+    # The post turns out to be live; the next drain reconciles instead of re-posting
+    manager.visible.append({"content": POST["content"], "id": "urn:li:share:42"})
+    time.sleep(0.01)
+    assert asyncio.run(publisher.drain()) == 1
+    assert outbox.get(entry["id"])["post_id"] == "urn:li:share:42"
+    assert len(manager.created) == 1
+
+
+def test_resumed_entry_that_never_landed_is_posted_once():
+    outbox = Outbox(lease=0)
+    manager = FakeManager()
+    entry = outbox.add(POST)
+    outbox.claim(entry)
+    time.sleep(0.01)
+
+    assert asyncio.run(OutboxPublisher(outbox, FakeAutomation(manager)).drain()) == 1
+    assert len(manager.created) == 1
+
+
+def test_unverifiable_entry_fails_instead_of_risking_a_duplicate():
+    outbox = Outbox(lease=0)
+    manager = FakeManager()
+
+    async def unreachable(content, hashtags=None):
+        raise Exception("listing not permitted")
+
+    manager.find_post = unreachable
+    entry = outbox.add(POST)
+    outbox.claim(entry)
+    time.sleep(0.01)
+
+    assert asyncio.run(OutboxPublisher(outbox, FakeAutomation(manager)).drain()) == 0
+    assert outbox.get(entry["id"])["status"] == FAILED
+    assert manager.created == []
+
+
+def test_find_post_without_the_read_scope_explains_itself():
+    manager = LinkedInManager(oauth_handler=None)
+    manager.user_info = {"sub": "member"}
+
+    async def forbidden(method, endpoint, **kwargs):
+        raise LinkedInAPIError(403, "ACCESS_DENIED")
+
+    manager._make_request = forbidden
+    with pytest.raises(LinkedInAPIError, match="r_member_social") as raised:
+        asyncio.run(manager.find_post(POST["content"]))
+    assert raised.value.retryable is False
+
+
+@pytest.fixture
+def lossy_linkedin(monkeypatch):
+    """Stand-in LinkedIn API that stores every post but drops half the responses"""
+    monkeypatch.setenv("TOKEN_KEY_PATH", "token.key")
+    monkeypatch.setenv("RETRY_BASE_DELAY", "0")
+    monkeypatch.setenv("RATE_LIMIT_POSTS_RPS", "100")
+    monkeypatch.setenv("RATE_LIMIT_POSTS_BURST", "100")
+    for name in ("LINKEDIN_CLIENT_ID", "LINKEDIN_CLIENT_SECRET", "LINKEDIN_USERNAME", "LINKEDIN_PASSWORD"):
+        monkeypatch.setenv(name, "test")
+    config = {"p_drop": 0.5, "seed": 3, "linkedin_median_ms": 1, "linkedin_p99_ms": 5}
+    return standins.StandIns(config)
+
+
+def test_drain_against_lossy_standin_publishes_each_post_exactly_once(lossy_linkedin, monkeypatch):
+    from oauth_handler import OAuthHandler
+    from linkedin_manager import LinkedInManager
+
+    async def scenario():
+        runner = web.AppRunner(lossy_linkedin.app(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        monkeypatch.setenv("LINKEDIN_API_BASE_URL", f"http://127.0.0.1:{port}/v2")
+        try:
+            oauth = OAuthHandler()
+            oauth.token_file = "tokens.enc"
+            await oauth.save_tokens(oauth._stamp_expiry({"access_token": standins.INITIAL_TOKEN,
+                                                         "expires_in": 3600}))
+            async with LinkedInManager(oauth) as manager:
+                outbox = Outbox(lease=0)
+                automation = FakeAutomation(manager)
+                for i in range(8):
+                    outbox.add({"topic": f"t{i}", "content": f"Post number {i} about testing", "hashtags": []})
+                publisher = OutboxPublisher(outbox, automation, max_attempts=5)
+                for _ in range(5):
+                    await publisher.drain()
+                    await asyncio.sleep(0.01)
+                return outbox.counts()
+        finally:
+            await runner.cleanup()
+
+    counts = asyncio.run(scenario())
+    assert counts == {PUBLISHED: 8}
+    assert lossy_linkedin.stats["dropped_responses"] > 0
+    assert lossy_linkedin.stats["duplicate_posts"] == 0
+    assert lossy_linkedin.stats["posts"] == 8
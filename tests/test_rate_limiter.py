@@ -0,0 +1,71 @@
+import asyncio
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+from metrics import registry
+from rate_limiter import RateLimiter, TokenBucket, parse_retry_after
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after("-3") == 0.0
+    http_date = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 <= parse_retry_after(http_date) <= 30
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_bucket_allows_a_burst_then_paces():
+    async def scenario():
+        bucket = TokenBucket(rate=20, capacity=2)
+        waits = [await bucket.acquire() for _ in range(3)]
+        return waits
+
+    waits = asyncio.run(scenario())
+    assert waits[:2] == [0.0, 0.0]
+    assert 0.03 <= waits[2] <= 0.1
+
+
+def test_429_pauses_the_bucket_for_retry_after_and_halves_its_rate():
+    limiter = RateLimiter(default_rate=10, default_burst=10)
+    pause = limiter.update_from_response("socialMetrics/urn:li:share:1", "m1", 429, {"Retry-After": "0.2"})
+    assert pause == 0.2
+    bucket = limiter.bucket("socialMetrics", "m1")
+    assert bucket.rate == 5 and bucket.tokens == 0
+    assert limiter.throttled == 1
+    assert registry.counter("rate_limited_total", endpoint="socialMetrics") == 1
+
+    started = time.monotonic()
+    asyncio.run(limiter.acquire("socialMetrics", "m1"))
+    assert time.monotonic() - started >= 0.15
+
+
+def test_429_without_retry_after_uses_the_default(monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_DEFAULT_RETRY_AFTER", "12")
+    limiter = RateLimiter()
+    assert limiter.update_from_response("userinfo", "m", 429, {}) == 12
+
+
+def test_buckets_are_independent_per_member_and_endpoint():
+    limiter = RateLimiter(default_rate=10, default_burst=10, endpoint_rates={"ugcPosts": (1, 2)})
+    limiter.update_from_response("ugcPosts", "m1", 429, {"Retry-After": "60"})
+    assert limiter.bucket("ugcPosts", "m2").blocked_until == 0
+    assert limiter.bucket("userinfo", "m1").blocked_until == 0
+    assert limiter.bucket("ugcPosts", "m2").rate == 1
+
+
+def test_exhausted_quota_headers_pause_until_reset():
+    limiter = RateLimiter(default_rate=10, default_burst=10)
+    pause = limiter.update_from_response("userinfo", "m", 200, {"X-RateLimit-Remaining": "0",
+                                                                 "X-RateLimit-Reset": "5"})
+    assert pause == 5
+    assert limiter.bucket("userinfo", "m").blocked_until > time.monotonic() + 4
+
+
+def test_successes_recover_the_rate_up_to_its_ceiling():
+    limiter = RateLimiter(default_rate=10, default_burst=10)
+    limiter.update_from_response("userinfo", "m", 429, {"Retry-After": "0"})
+    for _ in range(100):
+        limiter.update_from_response("userinfo", "m", 200, {})
+    assert limiter.bucket("userinfo", "m").rate == 20
@@ -0,0 +1,137 @@
+import asyncio
+import time
+
+import pytest
+
+from linkedin_manager import LinkedInAPIError
+from resilience import (CircuitBreaker, CircuitOpenError, NonRetryableError, Resilience, RetryPolicy,
+                        is_retryable)
+
+
+class StatusError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+def make(threshold=3, reset_timeout=60.0, attempts=3):
+    return Resilience("test", RetryPolicy(max_attempts=attempts, base_delay=0, max_delay=0),
+                      CircuitBreaker("test", failure_threshold=threshold, reset_timeout=reset_timeout))
+
+
+def failing(errors, result="ok"):
+    """An operation that raises each of `errors` in turn, then returns `result`"""
+    remaining = list(errors)
+    calls = []
+
+    async def operation():
+        calls.append(1)
+        if remaining:
+            raise remaining.pop(0)
+        return result
+
+    return operation, calls
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (StatusError(503), True),
+    (StatusError(429), True),
+    (StatusError(400), False),
+    (StatusError(404), False),
+    (LinkedInAPIError(401, "expired", retryable=True), True),
+    (LinkedInAPIError(500, "boom"), True),
+    (NonRetryableError("no token"), False),
+    (ValueError("bad input"), False),
+    (asyncio.TimeoutError(), True),
+    (ConnectionResetError(), True),
+])
+def test_classification(error, retryable):
+    assert is_retryable(error) is retryable
+
+
+def test_transient_errors_are_retried_until_success():
+    backend = make()
+    operation, calls = failing([StatusError(503), StatusError(502)])
+    assert asyncio.run(backend.call(operation)) == "ok"
+    assert len(calls) == 3 and backend.retries == 2 and backend.failures == 0
+    assert backend.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_permanent_errors_are_not_retried_and_do_not_trip_the_breaker():
+    backend = make(threshold=1)
+    operation, calls = failing([StatusError(400)])
+    with pytest.raises(StatusError):
+        asyncio.run(backend.call(operation))
+    assert len(calls) == 1
+    assert backend.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_retry_policy_honours_retry_after():
+    policy = RetryPolicy(max_attempts=3, base_delay=0.01, max_delay=0.01)
+    assert policy.delay(0, retry_after=2.5) == 2.5
+    assert 0 <= policy.delay(5) <= 0.01
+
+
+def test_breaker_opens_fails_fast_then_closes_after_a_successful_trial():
+    backend = make(threshold=2, reset_timeout=0.05, attempts=2)
+    operation, _ = failing([StatusError(503)] * 2)
+    with pytest.raises(StatusError):
+        asyncio.run(backend.call(operation))
+    assert backend.breaker.state == CircuitBreaker.OPEN
+
+    probe, calls = failing([])
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(backend.call(probe))
+    assert calls == [] and backend.short_circuited == 1
+
+    time.sleep(0.06)
+    assert asyncio.run(backend.call(probe)) == "ok"
+    assert backend.breaker.state == CircuitBreaker.CLOSED
+    assert backend.stats()["breaker_opened"] == 1 and backend.stats()["breaker_closed"] == 1
+
+
+def test_half_open_admits_one_trial_and_reopens_if_it_fails():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    time.sleep(0.02)
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and breaker.opened_count == 2
+
+
+def test_a_cancelled_trial_does_not_leave_the_breaker_stuck_open():
+    backend = make(threshold=1, reset_timeout=0.01, attempts=1)
+    operation, _ = failing([StatusError(503)])
+    with pytest.raises(StatusError):
+        asyncio.run(backend.call(operation))
+    time.sleep(0.02)
+
+    async def hangs():
+        await asyncio.sleep(10)
+
+    async def cancel_trial():
+        task = asyncio.create_task(backend.call(hangs))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(cancel_trial())
+    assert backend.breaker.state == CircuitBreaker.HALF_OPEN
+
+    probe, calls = failing([])
+    assert asyncio.run(backend.call(probe)) == "ok"
+    assert backend.breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.parametrize("error", [StatusError(429), LinkedInAPIError(401, "expired", retryable=True)])
+def test_throttling_and_expired_tokens_are_retried_without_tripping_the_breaker(error):
+    backend = make(threshold=2, attempts=3)
+    operation, calls = failing([error] * 3)
+    with pytest.raises(type(error)):
+        asyncio.run(backend.call(operation))
+    assert len(calls) == 3
+    assert backend.breaker.state == CircuitBreaker.CLOSED and backend.breaker.failures == 0
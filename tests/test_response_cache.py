@@ -0,0 +1,63 @@
+import time
+
+from metrics import registry
+from response_cache import ResponseCache
+
+
+def make(**kwargs):
+    return ResponseCache(path=".cache.db", **kwargs)
+
+
+def test_key_covers_model_prompt_and_params():
+    key = ResponseCache.make_key("m", "prompt", {"temperature": 0.7})
+    assert key == ResponseCache.make_key("m", "prompt", {"temperature": 0.7})
+    assert key != ResponseCache.make_key("m", "prompt", {"temperature": 0.8})
+    assert key != ResponseCache.make_key("other", "prompt", {"temperature": 0.7})
+    assert key != ResponseCache.make_key("m", "other prompt", {"temperature": 0.7})
+
+
+def test_hits_and_misses_are_counted():
+    cache = make()
+    assert cache.get("k") is None
+    cache.set("k", "response")
+    assert cache.get("k") == "response"
+    assert cache.stats() == {"hits": 1, "misses": 1, "evictions": 0, "entries": 1}
+    assert registry.counter("cache_requests_total", result="hit") == 1
+
+
+def test_expired_entries_miss_and_are_removed():
+    cache = make(ttl=60)
+    cache.set("k", "response")
+    cache._conn.execute("UPDATE responses SET created_at = ?", (time.time() - 120,))
+
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted_over_the_bound():
+    cache = make(max_entries=2)
+    cache.set("a", "1")
+    time.sleep(0.01)
+    cache.set("b", "2")
+    time.sleep(0.01)
+    cache.get("a")
+    time.sleep(0.01)
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_bypass_neither_reads_nor_writes():
+    cache = make(bypass=True)
+    cache.set("k", "response")
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_entries_survive_reopening():
+    cache = make()
+    cache.set("k", "response")
+    cache.close()
+    assert make().get("k") == "response"
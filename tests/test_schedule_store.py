@@ -0,0 +1,157 @@
+import asyncio
+import sqlite3
+import time
+
+from dedup_index import DedupIndex
+from outbox import Outbox, OutboxPublisher
+from schedule_store import ScheduleStore, ScheduleDispatcher, QUEUED, PUBLISHED, FAILED
+from test_outbox import FakeManager
+
+CONTENT = ("Our quarterly review showed that small, steady improvements to onboarding "
+           "did more for retention than any single launch this year.")
+
+
+class FakeGenerator:
+    def __init__(self):
+        self.calls = 0
+
+    async def create_content_batch(self, topics):
+        self.calls += 1
+        return [{"topic": topic, "content": f"{CONTENT} ({topic})", "hashtags": ["#Growth"]} for topic in topics]
+
+
+class Automation:
+    """Just enough of LinkedInPostAutomation for the dispatcher, with the real dedup check"""
+
+    def __init__(self, manager):
+        from main import LinkedInPostAutomation
+        self._ensure_unique = LinkedInPostAutomation.ensure_unique
+        self.linkedin_manager = manager
+        self.content_generator = FakeGenerator()
+        self.dedup_index = DedupIndex()
+        self.max_regenerations = 0
+        self.account = ''
+        self.outbox = Outbox(lease=0)
+        self.publisher = OutboxPublisher(self.outbox, self)
+
+    async def ensure_unique(self, post):
+        return await self._ensure_unique(self, post)
+
+    def record_published(self, result, topic, content=None, hashtags=None):
+        pass
+
+
+def dispatch(dispatcher):
+    time.sleep(0.01)
+    return asyncio.run(dispatcher.dispatch_due())
+
+
+def test_queued_entries_come_back_in_due_order():
+    store = ScheduleStore()
+    late = store.enqueue(2000, topic="late")
+    early = store.enqueue("1970-01-01T00:16:40+00:00", topic="early")
+    assert [entry_id for _, entry_id in store.queued()] == [early, late]
+    assert store.next_due() == 1000
+
+
+def test_recover_requeues_interrupted_entries():
+    store = ScheduleStore()
+    entry_id = store.enqueue(0, topic="t")
+    store.mark_publishing(entry_id)
+    assert store.recover() == 1
+    entry = store.get(entry_id)
+    assert entry["status"] == QUEUED and entry["attempts"] == 1
+    assert store.recover() == 0
+
+
+def test_existing_store_gains_dedup_column():
+    conn = sqlite3.connect(".schedule.db")
+    conn.execute("CREATE TABLE scheduled_posts (id INTEGER PRIMARY KEY AUTOINCREMENT, due_at REAL NOT NULL, "
+                 "topic TEXT, content TEXT, hashtags TEXT, status TEXT NOT NULL DEFAULT 'queued', "
+                 "attempts INTEGER NOT NULL DEFAULT 0, post_id TEXT, error TEXT, "
+                 "created_at REAL NOT NULL, updated_at REAL NOT NULL)")
+    conn.commit()
+    conn.close()
+    store = ScheduleStore()
+    assert store.get(store.enqueue(0, content="x"))["dedup_id"] is None
+
+
+def test_retry_after_transient_failure_is_not_its_own_duplicate():
+    store = ScheduleStore()
+    manager = FakeManager(outcomes=[Exception("503 Service Unavailable")])
+    automation = Automation(manager)
+    dispatcher = ScheduleDispatcher(store, automation, retry_delay=0)
+    entry_id = store.enqueue(0, content=CONTENT, hashtags=["#Growth"])
+    dispatcher.load()
+
+    dispatch(dispatcher)
+    assert store.get(entry_id)["status"] == QUEUED
+    dispatch(dispatcher)
+    entry = store.get(entry_id)
+    assert entry["status"] == PUBLISHED, entry["error"]
+    # The retry publishes the text stored by the first attempt
+    assert len(manager.created) == 2 and len(set(manager.created)) == 1
+
+
+def test_topic_entry_is_generated_once_across_retries():
+    store = ScheduleStore()
+    automation = Automation(FakeManager(outcomes=[Exception("503"), Exception("503")]))
+    dispatcher = ScheduleDispatcher(store, automation, retry_delay=0, max_attempts=5)
+    entry_id = store.enqueue(0, topic="Retention")
+    dispatcher.load()
+
+    for _ in range(3):
+        dispatch(dispatcher)
+    assert store.get(entry_id)["status"] == PUBLISHED
+    assert automation.content_generator.calls == 1
+
+
+def test_recovered_entry_is_reconciled_instead_of_reposted():
+    store = ScheduleStore()
+    manager = FakeManager()
+    automation = Automation(manager)
+    entry_id = store.enqueue(0, content=CONTENT)
+
+    # A previous run stored the post, claimed its outbox entry and crashed mid-request
+    post = {"topic": None, "content": CONTENT, "hashtags": [], "dedup_id": automation.dedup_index.add(CONTENT)}
+    store.mark_publishing(entry_id)
+    store.set_post(entry_id, post)
+    automation.outbox.claim(automation.outbox.add(post))
+    manager.visible.append({"content": CONTENT, "id": "urn:li:share:9"})
+
+    dispatcher = ScheduleDispatcher(store, automation)
+    dispatcher.load()
+    dispatch(dispatcher)
+    entry = store.get(entry_id)
+    assert entry["status"] == PUBLISHED and entry["post_id"] == "urn:li:share:9"
+    assert manager.created == []
+
+
+def test_entry_under_another_publishers_lease_waits():
+    store = ScheduleStore()
+    automation = Automation(FakeManager())
+    automation.outbox.lease = 300
+    entry_id = store.enqueue(0, content=CONTENT)
+    automation.outbox.claim(automation.outbox.add({"content": CONTENT, "hashtags": []}))
+
+    dispatcher = ScheduleDispatcher(store, automation)
+    dispatcher.load()
+    dispatch(dispatcher)
+    entry = store.get(entry_id)
+    assert entry["status"] == QUEUED and entry["due_at"] > time.time() + 200
+    assert automation.linkedin_manager.created == []
+
+
+def test_exhausted_entry_also_fails_its_outbox_entry():
+    store = ScheduleStore()
+    automation = Automation(FakeManager(outcomes=[Exception("503")] * 5))
+    automation.publisher.max_attempts = 10
+    dispatcher = ScheduleDispatcher(store, automation, retry_delay=0, max_attempts=2)
+    entry_id = store.enqueue(0, content=CONTENT)
+    dispatcher.load()
+
+    dispatch(dispatcher)
+    dispatch(dispatcher)
+    assert store.get(entry_id)["status"] == FAILED
+    assert automation.outbox.counts() == {FAILED: 1}
+    assert automation.outbox.pending() == []
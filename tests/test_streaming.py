@@ -0,0 +1,49 @@
+from streaming import AnyOf, HashtagBlockComplete, JsonObjectComplete, WordBudget
+
+
+def stream(condition, chunks):
+    """Feed `chunks` until the condition stops the stream; returns the text read"""
+    condition.reset()
+    text = ""
+    for chunk in chunks:
+        text += chunk
+        if condition.feed(chunk, text):
+            break
+    return text
+
+
+def test_json_object_stops_at_the_closing_brace():
+    chunks = ['Sure! {"content": "a {b}', ' c", "hashtags": ["#x"]}', ' trailing prose']
+    assert stream(JsonObjectComplete(), chunks) == 'Sure! {"content": "a {b} c", "hashtags": ["#x"]}'
+
+
+def test_json_object_ignores_escaped_quotes_and_nesting():
+    chunks = ['{"a": {"b": "say \\"}\\""}', ', "c": 1}', 'more']
+    assert stream(JsonObjectComplete(), chunks).endswith('"c": 1}')
+
+
+def test_word_budget_stops_once_exceeded():
+    condition = WordBudget(3)
+    assert stream(condition, ["one two", " thr", "ee four", " five"]) == "one two three four"
+    assert condition.words == 4
+
+
+def test_a_hashtag_is_complete_only_once_followed_by_a_separator():
+    condition = HashtagBlockComplete(2)
+    assert not condition.feed("", "#AI #Machine")
+    assert condition.feed("", "#AI #MachineLearning ")
+
+
+def test_any_of_keeps_every_condition_in_sync():
+    words = WordBudget(100)
+    condition = AnyOf(JsonObjectComplete(), words)
+    assert stream(condition, ['{"a": "one two', ' three"}', " after"]) == '{"a": "one two three"}'
+    # The budget counted every chunk, including the key: '{"a":', 'one', 'two', 'three"}'
+    assert words.words == 4
+    assert condition.key == "any(json_object,words:100)"
+
+
+def test_reset_clears_state_between_streams():
+    condition = JsonObjectComplete()
+    stream(condition, ['{"a": {'])
+    assert stream(condition, ['{"b": 1}']) == '{"b": 1}'
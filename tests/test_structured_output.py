@@ -0,0 +1,80 @@
+import pytest
+
+from structured_output import StructuredOutputError, StructuredOutputParser, normalize_hashtags, parse_stats
+
+
+def parse(*chunks):
+    parser = StructuredOutputParser()
+    for chunk in chunks:
+        if parser.feed(chunk):
+            break
+    return parser, parser.extract_post()
+
+
+def test_stops_as_soon_as_the_object_closes():
+    parser = StructuredOutputParser()
+    assert not parser.feed('Sure! Here it is:\n```json\n{"content": "Hello {world}",')
+    assert parser.feed(' "hashtags": ["#A", "#B"]}\n```\nAnything else?')
+    assert parser.extract_post() == {"content": "Hello {world}", "hashtags": ["#A", "#B"]}
+    assert parser.outcome == "json"
+
+
+def test_braces_in_leading_prose_are_skipped():
+    _, post = parse('Use {curly} braces wisely. {"content": "Real post", "hashtags": "#One, #Two"}')
+    assert post == {"content": "Real post", "hashtags": ["#One", "#Two"]}
+
+
+def test_truncated_object_is_repaired():
+    parser, post = parse('{"content": "Cut off mid', ' sentence')
+    assert post == {"content": "Cut off mid sentence", "hashtags": []}
+    assert parser.outcome == "repaired"
+
+
+def test_half_written_hashtag_and_dangling_key_are_dropped():
+    _, post = parse('{"content": "Post", "hashtags": ["#Done", "#Hal')
+    assert post == {"content": "Post", "hashtags": ["#Done"]}
+    _, post = parse('{"content": "Post", "hashtags": ["#Done"], "extra": ')
+    assert post == {"content": "Post", "hashtags": ["#Done"]}
+
+
+def test_trailing_commas_and_raw_newlines_are_tolerated():
+    _, post = parse('{"content": "Line one\nLine two", "hashtags": ["#A",],}')
+    assert post == {"content": "Line one\nLine two", "hashtags": ["#A"]}
+
+
+def test_tags_at_the_end_of_content_are_split_off():
+    _, post = parse('{"content": "Ship small changes. #DevOps #Testing"}')
+    assert post == {"content": "Ship small changes.", "hashtags": ["#DevOps", "#Testing"]}
+
+
+def test_alias_keys_are_accepted():
+    _, post = parse('{"post": "Aliased body", "tags": ["#X"]}')
+    assert post == {"content": "Aliased body", "hashtags": ["#X"]}
+
+
+@pytest.mark.parametrize("text", ['{"title": "No body here", "tags": ["#X"]}', '{"content": "  "}', ''])
+def test_a_response_without_usable_text_raises_instead_of_publishing_filler(text):
+    with pytest.raises(StructuredOutputError):
+        parse(text)
+    assert parse_stats()["failed"] == 1
+
+
+def test_prose_keeps_only_a_trailing_tag_block():
+    parser, post = parse("We tried #remote work for a year.\n\n#FutureOfWork #Remote")
+    assert post == {"content": "We tried #remote work for a year.", "hashtags": ["#FutureOfWork", "#Remote"]}
+    assert parser.outcome == "prose"
+
+
+def test_each_response_is_counted_once_in_the_metrics_registry():
+    parse('{"content": "a", "hashtags": []}')
+    parse('{"content": "b"')
+    parse('no json at all')
+    with pytest.raises(StructuredOutputError):
+        parse('')
+    assert parse_stats() == {"json": 1, "repaired": 1, "prose": 1, "failed": 1, "rejected": 0}
+
+
+def test_normalize_hashtags():
+    assert normalize_hashtags("#AI, ml #AI") == ["#AI", "#ml"]
+    assert normalize_hashtags(["#C++", 3, "#Data Science"]) == ["#C", "#DataScience"]
+    assert normalize_hashtags(None) == []
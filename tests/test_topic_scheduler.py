@@ -0,0 +1,75 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from topic_scheduler import TopicHistory, TopicLibrary, TopicScheduler
+
+TOPICS = ["Code review habits", "Testing in production", "On-call rotations", "API versioning",
+          "Feature flags", "Incident postmortems"]
+
+
+@pytest.fixture
+def topics_file(tmp_path):
+    path = tmp_path / "topics.txt"
+    path.write_text("\n".join(TOPICS[:3]) + "\n\n" + "\n".join(TOPICS[3:]) + "\n")
+    return path
+
+
+def make(topics_file, engagement=None, **kwargs):
+    return TopicScheduler(TopicLibrary(str(topics_file)), TopicHistory(),
+                          engagement=engagement if engagement is not None else {}, seed=7, **kwargs)
+
+
+def test_library_indexes_non_empty_lines_and_reads_them_on_demand(topics_file):
+    library = TopicLibrary(str(topics_file))
+    assert len(library) == len(TOPICS)
+    assert library.read([0, 3, 5]) == [TOPICS[0], TOPICS[3], TOPICS[5]]
+    assert library.contains([TOPICS[1], "Not a topic"]) == [True, False]
+
+
+def test_library_index_is_rebuilt_when_the_file_changes(topics_file):
+    TopicLibrary(str(topics_file))
+    time.sleep(0.01)
+    topics_file.write_text("Only topic\n")
+    library = TopicLibrary(str(topics_file))
+    assert len(library) == 1 and library.read([0]) == ["Only topic"]
+
+
+def test_picked_topics_cool_down(topics_file):
+    scheduler = make(topics_file, cooldown_days=1)
+    chosen = set()
+    for _ in range(len(TOPICS)):
+        chosen.update(scheduler.pick())
+    assert chosen == set(TOPICS)
+
+
+def test_when_everything_is_cooling_down_the_least_recently_used_is_picked(topics_file):
+    scheduler = make(topics_file, cooldown_days=1)
+    now = time.time()
+    for i, topic in enumerate(TOPICS):
+        scheduler.history.record([topic], chosen_at=now - 3600 + i)
+    assert scheduler.pick() == [TOPICS[0]]
+
+
+def test_pick_can_exclude_topics_and_skip_recording(topics_file):
+    scheduler = make(topics_file)
+    picked = scheduler.pick(len(TOPICS), record=False, exclude=TOPICS[:2])
+    assert set(picked) == set(TOPICS[2:])
+    assert scheduler.history.recent(0) == set()
+
+
+def test_high_engagement_topics_win_most_draws(topics_file):
+    engagement = {topic: (1.0, 50) for topic in TOPICS}
+    engagement[TOPICS[4]] = (10.0, 50)
+    scheduler = make(topics_file, engagement=engagement, cooldown_days=0)
+    wins = sum(scheduler.pick() == [TOPICS[4]] for _ in range(20))
+    assert wins >= 18
+
+
+def test_importing_the_module_does_not_import_numpy():
+    src = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+    code = "import sys, topic_scheduler; sys.exit('numpy' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code], env=dict(os.environ, PYTHONPATH=src)).returncode == 0